@@ -2,24 +2,29 @@ from __future__ import annotations
 
 import json
 import logging
+import tarfile
+import time
 import uuid
 from datetime import datetime, timezone
 from functools import wraps
-from typing import Any, Callable, Dict, Optional
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
 
-import bcrypt
-from flask import Flask, Response, make_response, request, g, session
+from flask import Flask, Request, Response, make_response, request, g, session, stream_with_context
 from flask_cors import CORS
 from pymongo import errors as pymongo_errors
 from pydantic import ValidationError
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+from werkzeug.datastructures import ETags
+from werkzeug.exceptions import RequestedRangeNotSatisfiable, RequestEntityTooLarge
+from werkzeug.http import parse_range_header
 
 from ai_infra_backend.config import settings
 from ai_infra_backend.models import (
     APIResponse,
+    BatchDetailPayload,
     BusinessErrorCode,
     Spec,
+    SpecHistoryItem,
     UploadPayload,
     UpdatePayload,
     User,
@@ -28,21 +33,106 @@ from ai_infra_backend.models import (
     spec_version_to_document,
 )
 from ai_infra_backend.mongo import (
+    add_recovery_listener,
     create_user_document,
     delete_spec_document,
     delete_spec_versions,
     find_user_document_by_id,
     find_user_document_by_username,
-    save_spec_document,
-    save_spec_version_document,
+    mongo_health,
+    SpecVersionConflict,
+    save_spec_with_version,
+    update_user_password_hash,
     update_user_timestamp,
 )
+from ai_infra_backend.exporter import EXPORT_BATCH_SIZE, iter_ndjson, iter_tar_gz
+from ai_infra_backend.importer import (
+    MAX_IMPORT_BATCH_SIZE,
+    RecordError,
+    SpecImporter,
+    iter_ndjson_records,
+    iter_tar_records,
+)
+from ai_infra_backend.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, render_metrics
+from ai_infra_backend.monitoring import begin_command_tally, end_command_tally
+from ai_infra_backend.outbox import spec_outbox
+from ai_infra_backend.passwords import PasswordHasherBusy, password_hasher
+from ai_infra_backend.profiling import should_profile, start_profile, stop_profile, write_profile
 from ai_infra_backend.repository import repository
+from ai_infra_backend.snapshot import FACET_FIELDS
+from ai_infra_backend.timing import format_server_timing, log_server_timing, span, start_request_timing
+from ai_infra_backend.uploads import (
+    UPLOAD_FORM_OVERHEAD,
+    UploadNotUtf8,
+    UploadTooLarge,
+    markdown_from_text,
+    read_markdown_upload,
+)
 from ai_infra_backend.utils import derive_short_id, generate_short_id
 
 
+SPEC_WRITE_ATTEMPTS = 3
+
+
+class BoundedRequest(Request):
+    """Request whose body limit can be tightened per endpoint before the body is read."""
+
+    body_limit: Optional[int] = None
+
+    @property
+    def max_content_length(self) -> Optional[int]:  # type: ignore[override]
+        if self.body_limit is not None:
+            return self.body_limit
+        return super().max_content_length
+
+
+def single_byte_range(header: Optional[str]) -> bool:
+    """Whether ``Range`` asks for one byte range; other units, bad syntax and multiple ranges are ignored (RFC 9110)."""
+
+    parsed = parse_range_header(header)
+    return parsed is not None and parsed.units == "bytes" and len(parsed.ranges) == 1
+
+
+def apply_outbox_entries(entries: List[Dict[str, Any]]) -> None:
+    """Re-apply acknowledged writes that MongoDB has not seen yet on top of the repository.
+
+    Entries can be old (a crashed worker's log claimed much later), so one only applies if
+    the spec has not moved past it since; the flush then settles it against MongoDB.
+    """
+
+    for entry in entries:
+        current = repository.get_spec(entry["shortId"])
+        if entry["op"] == "delete":
+            if current is not None and current.version <= entry.get("deletedVersion", current.version):
+                repository.delete_spec(entry["shortId"])
+        elif current is None or current.version < entry["version"]["version"]:
+            repository.refresh_from_document(entry["metadata"], entry["version"])
+
+
+def reload_dead_lettered(entries: List[Dict[str, Any]]) -> None:
+    """The repository already shows these writes; replace them with what MongoDB kept."""
+
+    for short_id in dict.fromkeys(entry["shortId"] for entry in entries):
+        repository.reload_spec(short_id)
+
+
+def start_outbox() -> None:
+    if spec_outbox is None or spec_outbox.path is not None:
+        return
+    spec_outbox.on_dead_letter = reload_dead_lettered
+    apply_outbox_entries(spec_outbox.open())
+    # A reload from MongoDB after an outage would otherwise roll back writes still in the outbox.
+    add_recovery_listener(lambda: apply_outbox_entries(spec_outbox.pending()))
+    spec_outbox.start()
+
+
+def start_related_index() -> None:
+    repository.related.start()
+
+
 def create_app() -> Flask:
     app = Flask(__name__)
+    app.request_class = BoundedRequest
     app.secret_key = settings.session_secret
     app.config.setdefault("SESSION_COOKIE_SAMESITE", "Lax")
     app.config.setdefault("SESSION_COOKIE_HTTPONLY", True)
@@ -58,13 +148,29 @@ def create_app() -> Flask:
     def assign_trace_id() -> None:
         g.trace_id = f"req-{uuid.uuid4()}"
         g.current_user = None
+        g.request_started_at = time.perf_counter()
+        g.in_flight = True
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        g.mongo_commands, g.mongo_commands_token = begin_command_tally(g.trace_id)
+        if settings.server_timing or settings.server_timing_log:
+            start_request_timing()
+
+    @app.before_request
+    def start_request_profile() -> None:
+        if should_profile(request, settings):
+            g.profiler = start_profile()
 
     @app.before_request
     def load_current_user() -> None:
         user_id = session.get("user_id")
         if not user_id:
             return
-        document = find_user_document_by_id(user_id)
+        try:
+            with span("auth"):
+                document = find_user_document_by_id(user_id)
+        except pymongo_errors.PyMongoError as exc:
+            logging.warning("Could not load session user %s: %s", user_id, exc)
+            return
         if not document:
             session.pop("user_id", None)
             return
@@ -80,6 +186,58 @@ def create_app() -> Flask:
         response.headers["X-Trace-Id"] = g.get("trace_id", "")
         return response
 
+    @app.after_request
+    def finish_request_profile(response: Response) -> Response:
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        stop_profile(profiler)
+        name = f"{request.endpoint or 'unmatched'}-{g.get('trace_id', '')}"
+        if write_profile(profiler, Path(settings.profile_dir), name, settings.profile_max_files):
+            response.headers["X-Profile-Id"] = name
+        return response
+
+    @app.after_request
+    def observe_request(response: Response) -> Response:
+        started_at = g.get("request_started_at")
+        if started_at is None:
+            return response
+        elapsed = time.perf_counter() - started_at
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        HTTP_REQUEST_DURATION.labels(request.method, route, str(response.status_code)).observe(elapsed)
+        commands = g.get("mongo_commands")
+        if commands is not None and settings.mongo_command_budget and commands.count > settings.mongo_command_budget:
+            logging.warning(
+                "Request %s %s issued %d MongoDB commands (budget %d) trace=%s: %s",
+                request.method,
+                route,
+                commands.count,
+                settings.mongo_command_budget,
+                g.get("trace_id", ""),
+                dict(commands.by_command),
+            )
+        timings = g.get("timings")
+        if timings is not None and commands is not None and commands.count:
+            timings["mongo"] = commands.duration * 1000
+        if timings is not None:
+            trace_id = g.get("trace_id", "")
+            if settings.server_timing:
+                response.headers["Server-Timing"] = format_server_timing(timings, elapsed * 1000, trace_id)
+            if settings.server_timing_log:
+                log_server_timing(timings, elapsed * 1000, trace_id, request.method, route, response.status_code)
+        return response
+
+    @app.teardown_request
+    def release_in_flight(_error: Optional[BaseException]) -> None:
+        if g.pop("in_flight", False):
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+        token = g.pop("mongo_commands_token", None)
+        if token is not None:
+            end_command_tally(token)
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            stop_profile(profiler)
+
     def _json_default(value: Any) -> Any:
         if isinstance(value, datetime):
             dt = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
@@ -90,8 +248,9 @@ def create_app() -> Flask:
         return str(value)
 
     def response_payload(data: Optional[Dict[str, Any]] = None, status: int = 200) -> Response:
-        payload = APIResponse.success(data=data).dict()
-        response = make_response(json.dumps(payload, default=_json_default), status)
+        with span("encode"):
+            body = json.dumps(APIResponse.success(data=data).dict(), default=_json_default)
+        response = make_response(body, status)
         response.headers["Content-Type"] = "application/json"
         return response
 
@@ -109,6 +268,11 @@ def create_app() -> Flask:
         response.headers["Content-Type"] = "application/json"
         return response
 
+    def retry_later(message: str, retry_after: int = 1) -> Response:
+        response = handle_error(BusinessErrorCode.UNAVAILABLE, message, 503)
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
     def require_login(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -129,12 +293,80 @@ def create_app() -> Flask:
         normalized_author = (spec.author or "").lstrip("@")
         return normalized_author == user.username
 
-    def serialize_spec(spec: Spec, *, latest: Spec | None = None) -> Dict[str, Any]:
+    def spec_etag(spec: Spec) -> str:
+        return f"{spec.shortId}.v{spec.version}"
+
+    def commit_spec_version(
+        short_id: str,
+        build: Callable[[Spec | None], Spec | Response],
+        if_match: ETags | None = None,
+    ) -> Spec | Response:
+        """Write the next version of ``short_id`` as a compare-and-set on the version it was built from.
+
+        When another worker got there first the spec is re-read and ``build`` runs again; with
+        ``If-Match`` the client's base version must still be current, otherwise it gets a 412.
+        """
+
+        for _ in range(SPEC_WRITE_ATTEMPTS):
+            existing = repository.get_spec(short_id)
+            if if_match and (existing is None or not if_match.contains(spec_etag(existing))):
+                return handle_error(
+                    BusinessErrorCode.CONFLICT,
+                    "Spec has changed since it was read",
+                    412,
+                    {"currentVersion": existing.version if existing else None},
+                )
+            spec = build(existing)
+            if isinstance(spec, Response):
+                return spec
+            metadata_document = spec_metadata_to_document(spec)
+            version_document = spec_version_to_document(spec)
+            if spec_outbox is not None:
+                # Write-behind: the compare-and-set is against this worker's repository, not MongoDB.
+                with spec_outbox.lock:
+                    current = repository.get_spec(short_id)
+                    if (current.version if current else None) != (existing.version if existing else None):
+                        continue
+                    spec_outbox.save(metadata_document, version_document)
+                    repository.refresh_from_document(metadata_document, version_document)
+                return spec
+            try:
+                save_spec_with_version(
+                    metadata_document,
+                    version_document,
+                    expected_version=existing.version if existing else None,
+                )
+            except SpecVersionConflict as exc:
+                logging.info("Version conflict on %s: %s", short_id, exc)
+                repository.reload_spec(short_id)
+                continue
+            repository.refresh_from_document(metadata_document, version_document)
+            return spec
+        return handle_error(
+            BusinessErrorCode.CONFLICT,
+            "Spec is being modified concurrently, please retry",
+            409,
+        )
+
+    def serialize_spec(
+        spec: Spec,
+        *,
+        latest: Spec | None = None,
+        history_items: List[SpecHistoryItem] | None = None,
+        include_history: bool = True,
+        include_content: bool = True,
+    ) -> Dict[str, Any]:
         latest_spec = latest or repository.get_spec(spec.shortId)
-        history_items = repository.get_spec_history(spec.shortId)
         payload = spec.dict(by_alias=True)
+        if not include_content:
+            payload.pop("contentMd", None)
         latest_version = latest_spec.version if latest_spec else spec.version
         payload["isLatest"] = latest_spec is None or spec.version == latest_version
+        if not include_history:
+            return payload
+        if history_items is None:
+            with span("history"):
+                history_items = repository.get_spec_history(spec.shortId)
         payload["history"] = {
             "latestVersion": latest_version,
             "items": [item.dict() for item in history_items],
@@ -150,7 +382,10 @@ def create_app() -> Flask:
         except ValidationError as exc:
             message = "; ".join(error["msg"] for error in exc.errors())
             return handle_error(BusinessErrorCode.INVALID_ARG, message or "Invalid payload", 400)
-        password_hash = bcrypt.hashpw(credentials.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        try:
+            password_hash = password_hasher.hash(credentials.password)
+        except PasswordHasherBusy:
+            return retry_later("Authentication is busy, please retry")
         try:
             document = create_user_document(credentials.username, password_hash)
         except pymongo_errors.DuplicateKeyError:
@@ -175,11 +410,24 @@ def create_app() -> Flask:
             return handle_error(BusinessErrorCode.INVALID_ARG, message or "Invalid payload", 400)
         document = find_user_document_by_username(credentials.username)
         password_hash = document.get("passwordHash") if document else None
-        if not password_hash or not bcrypt.checkpw(credentials.password.encode("utf-8"), password_hash.encode("utf-8")):
+        try:
+            verified = bool(password_hash) and password_hasher.verify(credentials.password, password_hash)
+        except PasswordHasherBusy:
+            return retry_later("Authentication is busy, please retry")
+        if not verified:
             return handle_error(BusinessErrorCode.UNAUTHORIZED, "Invalid username or password", 401)
         session["user_id"] = document["_id"]
         session.permanent = True
-        update_user_timestamp(document["_id"])
+        rehashed = None
+        if password_hasher.needs_rehash(password_hash):
+            try:
+                rehashed = password_hasher.hash(credentials.password)
+            except PasswordHasherBusy:
+                logging.info("Skipping password rehash for %s; bcrypt queue is busy", document["_id"])
+        if rehashed:
+            update_user_password_hash(document["_id"], rehashed)
+        else:
+            update_user_timestamp(document["_id"])
         refreshed = find_user_document_by_id(document["_id"])
         if refreshed:
             document = refreshed
@@ -212,6 +460,7 @@ def create_app() -> Flask:
         search = request.args.get("q")
         author = request.args.get("author")
         filter_key = request.args.get("filter")
+        fuzzy = request.args.get("fuzzy", "false").lower() in ("1", "true", "yes")
         updated_since_param = request.args.get("updatedSince")
         updated_since = None
         if updated_since_param:
@@ -226,27 +475,84 @@ def create_app() -> Flask:
         elif filter_key == "today":
             now = datetime.now(timezone.utc)
             updated_since = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        paginated = repository.list_specs(
-            page=page,
-            page_size=page_size,
-            tag=tag,
-            category=category,
-            order=order,
-            search=search,
-            author=author,
-            updated_since=updated_since,
-        )
-        return response_payload(json.loads(paginated.json()))
+        facets = list(dict.fromkeys(f.strip() for f in request.args.get("facets", "").split(",") if f.strip()))
+        if any(field not in FACET_FIELDS for field in facets):
+            return handle_error(
+                BusinessErrorCode.INVALID_ARG,
+                f"facets must be a comma separated subset of {','.join(FACET_FIELDS)}",
+                400,
+            )
+        with span("repo"):
+            paginated = repository.list_specs(
+                page=page,
+                page_size=page_size,
+                tag=tag,
+                category=category,
+                order=order,
+                search=search,
+                author=author,
+                updated_since=updated_since,
+                facets=facets,
+                fuzzy=fuzzy,
+            )
+        with span("encode"):
+            data = json.loads(paginated.json(exclude=None if facets else {"facets"}))
+        return response_payload(data)
+
+    @app.route("/specmarket/v1/bootstrap")
+    def bootstrap():
+        try:
+            page_size = min(max(int(request.args.get("pageSize", 10)), 1), 50)
+        except ValueError:
+            return handle_error(BusinessErrorCode.INVALID_ARG, "pageSize must be an integer", 400)
+        # The generation is known without touching the catalog, so revalidation costs nothing.
+        etag = f"{repository.instance_id}-{repository.generation}-{page_size}"
+        if request.if_none_match.contains_weak(etag):
+            response = make_response("", 304)
+        else:
+            with span("repo"):
+                generation, snapshot = repository.bootstrap(page_size)
+            etag = f"{repository.instance_id}-{generation}-{page_size}"
+            with span("encode"):
+                data = {
+                    "categories": [category.dict() for category in snapshot["categories"]],
+                    "tags": [tag.dict() for tag in snapshot["tags"]],
+                    "specs": json.loads(snapshot["specs"].json(exclude={"facets"})),
+                }
+            response = response_payload(data)
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
 
     @app.route("/specmarket/v1/getSpecDetail")
     def get_spec_detail():
         short_id = request.args.get("shortId")
         if not short_id:
             return handle_error(BusinessErrorCode.INVALID_ARG, "shortId is required", 400)
-        spec = repository.get_spec(short_id)
+        with span("repo"):
+            spec = repository.get_spec(short_id)
         if not spec:
             return handle_error(BusinessErrorCode.NOT_FOUND, "Spec not found", 404)
-        return response_payload(serialize_spec(spec, latest=spec))
+        response = response_payload(serialize_spec(spec, latest=spec))
+        response.set_etag(spec_etag(spec))
+        return response
+
+    @app.route("/specmarket/v1/getRelatedSpecs")
+    def get_related_specs():
+        short_id = request.args.get("shortId")
+        if not short_id:
+            return handle_error(BusinessErrorCode.INVALID_ARG, "shortId is required", 400)
+        try:
+            limit = min(max(int(request.args.get("limit", 5)), 1), settings.related_top_k)
+        except ValueError:
+            return handle_error(BusinessErrorCode.INVALID_ARG, "limit must be an integer", 400)
+        if repository.get_spec(short_id) is None:
+            return handle_error(BusinessErrorCode.NOT_FOUND, "Spec not found", 404)
+        with span("repo"):
+            related = repository.related_specs(short_id, limit)
+        if related is None:
+            return retry_later("Related specs are still being computed", retry_after=5)
+        return response_payload({"items": [json.loads(item.json()) for item in related]})
 
     @app.route("/specmarket/v1/getSpecVersion")
     def get_spec_version():
@@ -262,14 +568,62 @@ def create_app() -> Flask:
             return handle_error(BusinessErrorCode.INVALID_ARG, "version must be an integer", 400)
         if version < 1:
             return handle_error(BusinessErrorCode.INVALID_ARG, "version must be >= 1", 400)
-        latest = repository.get_spec(short_id)
+        with span("repo"):
+            latest = repository.get_spec(short_id)
+            spec = repository.get_spec_version(short_id, version) if latest else None
         if not latest:
             return handle_error(BusinessErrorCode.NOT_FOUND, "Spec not found", 404)
-        spec = repository.get_spec_version(short_id, version)
         if not spec:
             return handle_error(BusinessErrorCode.NOT_FOUND, "Spec version not found", 404)
         return response_payload(serialize_spec(spec, latest=latest))
 
+    @app.route("/specmarket/v1/getSpecDetails", methods=["POST"])
+    def get_spec_details():
+        payload_json = request.get_json(silent=True)
+        if not isinstance(payload_json, dict):
+            return handle_error(BusinessErrorCode.INVALID_ARG, "JSON body with items is required", 400)
+        try:
+            payload = BatchDetailPayload(**payload_json)
+        except ValidationError as exc:
+            message = "; ".join(error["msg"] for error in exc.errors())
+            return handle_error(BusinessErrorCode.INVALID_ARG, message or "Invalid payload", 400)
+        if len(payload.items) > settings.batch_detail_max_items:
+            return handle_error(
+                BusinessErrorCode.INVALID_ARG,
+                f"At most {settings.batch_detail_max_items} items per request",
+                400,
+            )
+        with span("repo"):
+            latest_by_id = {item.shortId: repository.get_spec(item.shortId) for item in payload.items}
+            wanted = [
+                (item.shortId, item.version or latest_by_id[item.shortId].version)
+                for item in payload.items
+                if latest_by_id[item.shortId] is not None
+            ]
+            specs = repository.get_spec_versions(wanted)
+        histories: Dict[str, List[SpecHistoryItem]] = {}
+        if payload.includeHistory:
+            with span("history"):
+                histories = repository.get_spec_histories(sorted({short_id for short_id, _ in wanted}))
+        items: List[Dict[str, Any]] = []
+        missing: List[Dict[str, Any]] = []
+        for item in payload.items:
+            latest = latest_by_id[item.shortId]
+            spec = specs.get((item.shortId, item.version or latest.version)) if latest else None
+            if spec is None:
+                missing.append({"shortId": item.shortId, "version": item.version})
+                continue
+            items.append(
+                serialize_spec(
+                    spec,
+                    latest=latest,
+                    history_items=histories.get(item.shortId),
+                    include_history=payload.includeHistory,
+                    include_content=payload.includeContent,
+                )
+            )
+        return response_payload({"items": items, "missing": missing})
+
     @app.route("/specmarket/v1/deleteSpec", methods=["DELETE"])
     @require_login
     def delete_spec():
@@ -293,6 +647,15 @@ def create_app() -> Flask:
                 403,
             )
 
+        if spec_outbox is not None:
+            with spec_outbox.lock:
+                # Re-read under the lock: a write that landed since the check above is the version being deleted.
+                current = repository.get_spec(short_id)
+                if current is None or not repository.delete_spec(short_id):
+                    return handle_error(BusinessErrorCode.NOT_FOUND, "Spec not found", 404)
+                spec_outbox.delete(short_id, version=current.version)
+            return response_payload({"shortId": short_id})
+
         removed = repository.delete_spec(short_id)
         if not removed:
             return handle_error(BusinessErrorCode.NOT_FOUND, "Spec not found", 404)
@@ -305,48 +668,71 @@ def create_app() -> Flask:
 
         return response_payload({"shortId": short_id})
 
-    @app.route("/specmarket/v1/getSpecRaw")
-    def get_spec_raw():
+    def serve_spec_body(content_type: str, attachment: bool) -> Response:
         short_id = request.args.get("shortId")
         if not short_id:
             return handle_error(BusinessErrorCode.INVALID_ARG, "shortId is required", 400)
-        spec = repository.get_spec(short_id)
-        if not spec:
+        with span("repo"):
+            encoded = repository.get_spec_bytes(short_id)
+        if encoded is None:
             return handle_error(BusinessErrorCode.NOT_FOUND, "Spec not found", 404)
-        response = make_response(spec.contentMd, 200)
-        response.headers["Content-Type"] = "text/plain; charset=utf-8"
-        return response
+        _, body, etag = encoded
+        # The cached bytes object is handed to the WSGI server as-is; ranges slice only what they return.
+        response = Response([body], status=200, content_type=content_type, direct_passthrough=True)
+        response.content_length = len(body)
+        response.set_etag(etag)
+        if attachment:
+            response.headers["Content-Disposition"] = f"attachment; filename={short_id}.md"
+        environ = request.environ
+        if "HTTP_RANGE" in environ and not single_byte_range(environ["HTTP_RANGE"]):
+            # Serve the full body instead of a 416; only a range past the end is unsatisfiable.
+            environ = {key: value for key, value in environ.items() if key != "HTTP_RANGE"}
+        try:
+            return response.make_conditional(environ, accept_ranges=True, complete_length=len(body))
+        except RequestedRangeNotSatisfiable:
+            error = handle_error(BusinessErrorCode.INVALID_ARG, "Requested range not satisfiable", 416)
+            error.headers["Content-Range"] = f"bytes */{len(body)}"
+            return error
+
+    @app.route("/specmarket/v1/getSpecRaw")
+    def get_spec_raw():
+        return serve_spec_body("text/plain; charset=utf-8", attachment=False)
 
     @app.route("/specmarket/v1/downloadSpec")
     def download_spec():
-        short_id = request.args.get("shortId")
-        if not short_id:
-            return handle_error(BusinessErrorCode.INVALID_ARG, "shortId is required", 400)
-        spec = repository.get_spec(short_id)
-        if not spec:
-            return handle_error(BusinessErrorCode.NOT_FOUND, "Spec not found", 404)
-        response = make_response(spec.contentMd)
-        response.headers["Content-Type"] = "text/markdown; charset=utf-8"
-        response.headers["Content-Disposition"] = f"attachment; filename={short_id}.md"
-        return response
+        return serve_spec_body("text/markdown; charset=utf-8", attachment=True)
 
     @app.route("/specmarket/v1/listCategories")
     def list_categories():
-        categories = repository.list_categories()
+        with span("repo"):
+            categories = repository.list_categories()
         return response_payload({"items": json.loads(json.dumps([c.dict() for c in categories]))})
 
     @app.route("/specmarket/v1/listTags")
     def list_tags():
-        tags = repository.list_tags()
+        with span("repo"):
+            tags = repository.list_tags()
         return response_payload({"items": json.loads(json.dumps([t.dict() for t in tags]))})
 
+    @app.route("/specmarket/v1/suggest")
+    def suggest():
+        try:
+            limit = int(request.args.get("limit", 8))
+        except ValueError:
+            return handle_error(BusinessErrorCode.INVALID_ARG, "limit must be an integer", 400)
+        if limit < 1:
+            return handle_error(BusinessErrorCode.INVALID_ARG, "limit must be positive", 400)
+        with span("repo"):
+            suggestions = repository.suggest(request.args.get("q", ""), min(limit, 20))
+        return response_payload({"items": [suggestion.dict() for suggestion in suggestions]})
+
     @app.route("/specmarket/v1/getCategorySpecs")
     def get_category_specs():
         slug = request.args.get("slug")
         if not slug:
             return handle_error(BusinessErrorCode.INVALID_ARG, "slug is required", 400)
         category_specs = repository.list_specs(category=slug)
-        return response_payload(json.loads(category_specs.json()))
+        return response_payload(json.loads(category_specs.json(exclude={"facets"})))
 
     @app.route("/specmarket/v1/getTagSpecs")
     def get_tag_specs():
@@ -354,23 +740,42 @@ def create_app() -> Flask:
         if not slug:
             return handle_error(BusinessErrorCode.INVALID_ARG, "slug is required", 400)
         tag_specs = repository.list_specs(tag=slug)
-        return response_payload(json.loads(tag_specs.json()))
+        return response_payload(json.loads(tag_specs.json(exclude={"facets"})))
 
     @app.route("/specmarket/v1/uploadSpec", methods=["POST"])
     @require_login
     def upload_spec():
-        form = request.form
         user: User | None = g.get("current_user")
         if user is None:
             return handle_error(BusinessErrorCode.UNAUTHORIZED, "Login required", 401)
-        file = request.files.get("file")
-        content_md = form.get("content") or (file.read().decode("utf-8") if file else None)
-        if not content_md:
+        limit = settings.upload_max_bytes
+        # Multipart file parts are spooled to disk by werkzeug; these caps bound the rest of the body.
+        request.body_limit = limit + UPLOAD_FORM_OVERHEAD
+        request.max_form_memory_size = limit + UPLOAD_FORM_OVERHEAD
+        try:
+            form = request.form
+            file = request.files.get("file")
+            if form.get("content"):
+                upload = markdown_from_text(form["content"], limit)
+            elif file:
+                upload = read_markdown_upload(file.stream, limit)
+            else:
+                upload = None
+        except (UploadTooLarge, RequestEntityTooLarge):
+            return handle_error(
+                BusinessErrorCode.INVALID_ARG,
+                f"Markdown content must be at most {limit} bytes",
+                413,
+            )
+        except UploadNotUtf8 as exc:
+            return handle_error(BusinessErrorCode.INVALID_ARG, str(exc), 400)
+        if upload is None or not upload.content:
             return handle_error(
                 BusinessErrorCode.INVALID_ARG,
                 "Markdown content is required",
                 400,
             )
+        content_md = upload.content
         tags_raw = form.get("tags", "")
         tags = [tag.strip() for tag in tags_raw.split(",") if tag.strip()]
         legacy_slug = (form.get("slug") or "").strip() or None
@@ -390,43 +795,49 @@ def create_app() -> Flask:
             tags=tags,
             shortId=short_id_candidate,
         )
-        now = datetime.now(timezone.utc)
         existing = existing or (repository.get_spec(payload.shortId) if payload.shortId else None)
-        if existing and not spec_owned_by_user(existing, user):
-            return handle_error(
-                BusinessErrorCode.UNAUTHORIZED,
-                "You do not have permission to modify this spec",
-                403,
-            )
-        created_at = existing.createdAt if existing else now
         if existing:
             short_id = existing.shortId
         else:
             short_id = payload.shortId or generate_short_id()
             while repository.get_spec(short_id):
                 short_id = generate_short_id()
-        owner_id = existing.ownerId if existing and existing.ownerId else user.id
-        author = f"@{user.username}"
-        version = existing.version + 1 if existing else 1
-        spec = Spec(
-            title=payload.title,
-            shortId=short_id,
-            summary=payload.summary,
-            category=payload.category,
-            tags=payload.tags,
-            author=author,
-            createdAt=created_at,
-            contentMd=content_md,
-            updatedAt=now,
-            ownerId=owner_id,
-            version=version,
-        )
-        metadata_document = spec_metadata_to_document(spec)
-        version_document = spec_version_to_document(spec)
+        # A new version of a spec is expected to resemble the previous one; only other specs count.
+        near_duplicates = [duplicate.dict() for duplicate in repository.near_duplicates(content_md, exclude=short_id)]
+        reject_duplicates = form.get("rejectDuplicates", "false").lower() in ("1", "true", "yes")
+        if near_duplicates and reject_duplicates:
+            return handle_error(
+                BusinessErrorCode.CONFLICT,
+                "Content is a near-duplicate of an existing spec",
+                409,
+                {"nearDuplicates": near_duplicates},
+            )
+
+        def build(current: Spec | None) -> Spec | Response:
+            if current and not spec_owned_by_user(current, user):
+                return handle_error(
+                    BusinessErrorCode.UNAUTHORIZED,
+                    "You do not have permission to modify this spec",
+                    403,
+                )
+            now = datetime.now(timezone.utc)
+            return Spec(
+                title=payload.title,
+                shortId=short_id,
+                summary=payload.summary,
+                category=payload.category,
+                tags=payload.tags,
+                author=f"@{user.username}",
+                createdAt=current.createdAt if current else now,
+                contentMd=content_md,
+                contentHash=upload.content_hash,
+                updatedAt=now,
+                ownerId=current.ownerId if current and current.ownerId else user.id,
+                version=current.version + 1 if current else 1,
+            )
+
         try:
-            save_spec_document(metadata_document)
-            save_spec_version_document(version_document)
-            repository.refresh_from_document(metadata_document, version_document)
+            result = commit_spec_version(short_id, build)
         except pymongo_errors.PyMongoError as exc:
             logging.exception("Failed to persist spec to MongoDB: %s", exc)
             return handle_error(
@@ -434,12 +845,27 @@ def create_app() -> Flask:
                 "Failed to persist spec",
                 500,
             )
-        return response_payload({"shortId": spec.shortId, "version": spec.version}, 201)
+        if isinstance(result, Response):
+            return result
+        data: Dict[str, Any] = {"shortId": result.shortId, "version": result.version}
+        if near_duplicates:
+            data["nearDuplicates"] = near_duplicates
+        response = response_payload(data, 201)
+        response.set_etag(spec_etag(result))
+        return response
 
     @app.route("/specmarket/v1/updateSpec", methods=["PUT"])
     @require_login
     def update_spec():
-        payload_json = request.get_json(silent=True)
+        request.body_limit = settings.upload_max_bytes + UPLOAD_FORM_OVERHEAD
+        try:
+            payload_json = request.get_json(silent=True)
+        except RequestEntityTooLarge:
+            return handle_error(
+                BusinessErrorCode.INVALID_ARG,
+                f"Markdown content must be at most {settings.upload_max_bytes} bytes",
+                413,
+            )
         if not payload_json:
             return handle_error(
                 BusinessErrorCode.INVALID_ARG,
@@ -454,37 +880,43 @@ def create_app() -> Flask:
         user: User | None = g.get("current_user")
         if user is None:
             return handle_error(BusinessErrorCode.UNAUTHORIZED, "Login required", 401)
-        existing = repository.get_spec(payload.shortId)
-        if not existing:
+        if not repository.get_spec(payload.shortId):
             return handle_error(BusinessErrorCode.NOT_FOUND, "Spec not found", 404)
-        if not spec_owned_by_user(existing, user):
+        try:
+            upload = markdown_from_text(payload.contentMd, settings.upload_max_bytes)
+        except UploadTooLarge:
             return handle_error(
-                BusinessErrorCode.UNAUTHORIZED,
-                "You do not have permission to modify this spec",
-                403,
+                BusinessErrorCode.INVALID_ARG,
+                f"Markdown content must be at most {settings.upload_max_bytes} bytes",
+                413,
             )
-        now = datetime.now(timezone.utc)
-        content_md = payload.contentMd
-        version = existing.version + 1
-        spec = Spec(
-            title=payload.title,
-            shortId=existing.shortId,
-            summary=payload.summary,
-            category=payload.category,
-            tags=payload.tags,
-            author=f"@{user.username}",
-            createdAt=existing.createdAt,
-            contentMd=content_md,
-            updatedAt=now,
-            ownerId=existing.ownerId or user.id,
-            version=version,
-        )
-        metadata_document = spec_metadata_to_document(spec)
-        version_document = spec_version_to_document(spec)
+
+        def build(existing: Spec | None) -> Spec | Response:
+            if existing is None:
+                return handle_error(BusinessErrorCode.NOT_FOUND, "Spec not found", 404)
+            if not spec_owned_by_user(existing, user):
+                return handle_error(
+                    BusinessErrorCode.UNAUTHORIZED,
+                    "You do not have permission to modify this spec",
+                    403,
+                )
+            return Spec(
+                title=payload.title,
+                shortId=existing.shortId,
+                summary=payload.summary,
+                category=payload.category,
+                tags=payload.tags,
+                author=f"@{user.username}",
+                createdAt=existing.createdAt,
+                contentMd=upload.content,
+                contentHash=upload.content_hash,
+                updatedAt=datetime.now(timezone.utc),
+                ownerId=existing.ownerId or user.id,
+                version=existing.version + 1,
+            )
+
         try:
-            save_spec_document(metadata_document)
-            save_spec_version_document(version_document)
-            repository.refresh_from_document(metadata_document, version_document)
+            result = commit_spec_version(payload.shortId, build, if_match=request.if_match)
         except pymongo_errors.PyMongoError as exc:
             logging.exception("Failed to persist spec update to MongoDB: %s", exc)
             return handle_error(
@@ -492,34 +924,133 @@ def create_app() -> Flask:
                 "Failed to persist spec",
                 500,
             )
-        return response_payload(
-            {"shortId": spec.shortId, "updatedAt": spec.updatedAt, "version": spec.version},
+        if isinstance(result, Response):
+            return result
+        response = response_payload(
+            {"shortId": result.shortId, "updatedAt": result.updatedAt, "version": result.version},
             200,
         )
+        response.set_etag(spec_etag(result))
+        return response
+
+    @app.route("/specmarket/v1/importSpecs", methods=["POST"])
+    @require_login
+    def import_specs():
+        user: User | None = g.get("current_user")
+        if user is None:
+            return handle_error(BusinessErrorCode.UNAUTHORIZED, "Login required", 401)
+        try:
+            batch_size = int(request.args.get("batchSize", settings.import_batch_size))
+        except ValueError:
+            return handle_error(BusinessErrorCode.INVALID_ARG, "batchSize must be an integer", 400)
+        if batch_size < 1 or batch_size > MAX_IMPORT_BATCH_SIZE:
+            return handle_error(
+                BusinessErrorCode.INVALID_ARG,
+                f"batchSize must be between 1 and {MAX_IMPORT_BATCH_SIZE}",
+                400,
+            )
+        mimetype = request.mimetype
+        if mimetype in ("application/x-ndjson", "application/jsonl"):
+            records = iter_ndjson_records(request.stream, settings.import_max_record_bytes)
+        elif mimetype in ("application/x-tar", "application/gzip", "application/x-gzip"):
+            records = iter_tar_records(request.stream, settings.import_max_record_bytes)
+        else:
+            return handle_error(
+                BusinessErrorCode.INVALID_ARG,
+                "Content-Type must be application/x-ndjson or application/x-tar",
+                415,
+            )
+        importer = SpecImporter(repository, user, batch_size, outbox=spec_outbox)
+        try:
+            for index, record in records:
+                if isinstance(record, RecordError):
+                    importer.fail(index, str(record))
+                else:
+                    importer.add(index, record)
+        except tarfile.TarError as exc:
+            # Batches flushed before the archive broke stay imported; report them with the error.
+            importer.flush()
+            logging.warning("Aborted spec import on a malformed archive: %s", exc)
+            summary = importer.summary()
+            summary["aborted"] = f"Malformed archive: {exc}"
+            return response_payload(summary, 400)
+        importer.flush()
+        return response_payload(importer.summary(), 200)
+
+    @app.route("/specmarket/v1/exportSpecs")
+    def export_specs():
+        export_format = request.args.get("format", "ndjson")
+        if export_format not in ("ndjson", "tar"):
+            return handle_error(BusinessErrorCode.INVALID_ARG, "format must be ndjson or tar", 400)
+        include_versions = request.args.get("includeVersions", "false").lower() in ("1", "true", "yes")
+        updated_since = None
+        updated_since_param = request.args.get("updatedSince")
+        if updated_since_param:
+            try:
+                updated_since = datetime.fromisoformat(updated_since_param.replace("Z", "+00:00"))
+            except ValueError:
+                return handle_error(
+                    BusinessErrorCode.INVALID_ARG,
+                    "updatedSince must be ISO format",
+                    400,
+                )
+            if updated_since.tzinfo is None:
+                updated_since = updated_since.replace(tzinfo=timezone.utc)
+        with span("repo"):
+            short_ids = repository.export_short_ids(
+                tag=request.args.get("tag"),
+                category=request.args.get("category"),
+                updated_since=updated_since,
+            )
+        # Only the id list is materialized up front; bodies are read and encoded one batch at a time.
+        records = repository.iter_export(short_ids, include_versions=include_versions, batch_size=EXPORT_BATCH_SIZE)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        if export_format == "tar":
+            response = Response(stream_with_context(iter_tar_gz(records)), mimetype="application/gzip")
+            response.headers["Content-Disposition"] = f"attachment; filename=specs-{stamp}.tar.gz"
+        else:
+            response = Response(stream_with_context(iter_ndjson(records)), mimetype="application/x-ndjson")
+            response.headers["Content-Disposition"] = f"attachment; filename=specs-{stamp}.ndjson"
+        response.headers["X-Export-Count"] = str(len(short_ids))
+        return response
+
+    @app.route("/specmarket/v1/admin/outbox", methods=["GET"])
+    def outbox_stats():
+        token = request.headers.get("X-Admin-Token")
+        if not token or token != settings.admin_token:
+            return handle_error(BusinessErrorCode.UNAUTHORIZED, "Admin token required", 403)
+        if spec_outbox is None:
+            return response_payload({"enabled": False, "depth": 0, "lagSeconds": 0.0})
+        return response_payload(spec_outbox.stats())
+
+    @app.route("/metrics")
+    def metrics():
+        body, content_type = render_metrics()
+        return Response(body, status=200, content_type=content_type)
 
     @app.route("/healthz")
     def healthz():
         uptime_seconds = (datetime.now(timezone.utc) - datetime.fromtimestamp(app.start_time, tz=timezone.utc)).total_seconds()
-        return response_payload({"ok": True, "mongo": False, "uptime": uptime_seconds})
-    
+        health = mongo_health()
+        return response_payload({"ok": True, "mongo": health["connected"], "uptime": uptime_seconds})
+
     @app.route("/readiness")
     def readiness():
         # 计算启动到现在的时间
         uptime_seconds = (datetime.now(timezone.utc) - datetime.fromtimestamp(app.start_time, tz=timezone.utc)).total_seconds()
 
-        mongo_ready = False
-        try:
-            client = MongoClient(settings.mongo_uri, serverSelectionTimeoutMS=500)
-            client.admin.command("ping")  # 尝试连接
-            mongo_ready = True
-        except PyMongoError:
-            mongo_ready = False
-        finally:
-            if 'client' in locals():
-                client.close()
-
-        ok = mongo_ready
-        return response_payload({"ok": ok, "mongo": mongo_ready, "uptime": uptime_seconds})
+        # 只读取后台探活线程缓存的状态，不在探针里新建连接
+        health = mongo_health()
+        mongo_ready = health["connected"]
+        return response_payload(
+            {
+                "ok": mongo_ready,
+                "mongo": mongo_ready,
+                "breaker": health["breaker"],
+                "lastCheckedAt": health.get("lastCheckedAt"),
+                "uptime": uptime_seconds,
+            }
+        )
 
     @app.errorhandler(404)
     def not_found(error):  # type: ignore[override]
@@ -531,6 +1062,8 @@ def create_app() -> Flask:
         return handle_error(BusinessErrorCode.INTERNAL, "Internal server error", 500)
 
     app.start_time = datetime.now(timezone.utc).timestamp()
+    start_outbox()
+    start_related_index()
 
     return app
 
@@ -13,10 +13,47 @@ load_dotenv()
 class Settings:
     mongo_uri: str = os.getenv("MONGODB_URI", "mongodb://localhost:27017/specdb")
     mongo_db: str = os.getenv("MONGODB_DB", "specdb")
+    mongo_memory_fallback: bool = os.getenv("MONGO_MEMORY_FALLBACK", "true").lower() in ("1", "true", "yes")
+    mongo_health_interval: float = float(os.getenv("MONGO_HEALTH_INTERVAL", "5"))
+    mongo_breaker_threshold: int = int(os.getenv("MONGO_BREAKER_THRESHOLD", "3"))
+    mongo_breaker_reset: float = float(os.getenv("MONGO_BREAKER_RESET", "10"))
+    mongo_server_selection_timeout_ms: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000"))
+    mongo_max_pool_size: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    mongo_min_pool_size: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    mongo_max_idle_time_ms: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0"))
+    mongo_wait_queue_timeout_ms: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))
+    mongo_compressors: str = os.getenv("MONGO_COMPRESSORS", "")
+    mongo_slow_command_ms: float = float(os.getenv("MONGO_SLOW_COMMAND_MS", "100"))
+    mongo_write_transactions: bool = os.getenv("MONGO_WRITE_TRANSACTIONS", "true").lower() in ("1", "true", "yes")
+    mongo_command_budget: int = int(os.getenv("MONGO_COMMAND_BUDGET", "0"))
     admin_token: str = os.getenv("ADMIN_TOKEN", "dev-admin-token")
     cors_origins: List[str] = None
     port: int = int(os.getenv("PORT", "5000"))
     session_secret: str = os.getenv("SESSION_SECRET", "dev-session-secret")
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    auth_hash_workers: int = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+    auth_hash_queue_limit: int = int(os.getenv("AUTH_HASH_QUEUE_LIMIT", "8"))
+    auth_hash_timeout: float = float(os.getenv("AUTH_HASH_TIMEOUT", "5"))
+    server_timing: bool = os.getenv("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+    server_timing_log: bool = os.getenv("SERVER_TIMING_LOG", "false").lower() in ("1", "true", "yes")
+    profile_endpoints: List[str] = None
+    profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    profile_dir: str = os.getenv("PROFILE_DIR", "/tmp/specmarket-profiles")
+    profile_max_files: int = int(os.getenv("PROFILE_MAX_FILES", "50"))
+    import_batch_size: int = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+    import_max_record_bytes: int = int(os.getenv("IMPORT_MAX_RECORD_BYTES", str(5 * 1024 * 1024)))
+    upload_max_bytes: int = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024)))
+    batch_detail_max_items: int = int(os.getenv("BATCH_DETAIL_MAX_ITEMS", "100"))
+    write_behind: bool = os.getenv("WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+    outbox_dir: str = os.getenv("OUTBOX_DIR", "/tmp/specmarket-outbox")
+    outbox_batch_size: int = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+    outbox_flush_interval: float = float(os.getenv("OUTBOX_FLUSH_INTERVAL", "0.5"))
+    outbox_max_backoff: float = float(os.getenv("OUTBOX_MAX_BACKOFF", "30"))
+    outbox_fsync: bool = os.getenv("OUTBOX_FSYNC", "true").lower() in ("1", "true", "yes")
+    related_top_k: int = int(os.getenv("RELATED_TOP_K", "10"))
+    related_max_features: int = int(os.getenv("RELATED_MAX_FEATURES", "1024"))
+    related_refresh_interval: float = float(os.getenv("RELATED_REFRESH_INTERVAL", "5"))
+    duplicate_threshold: float = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
 
     def __post_init__(self) -> None:
         origins = os.getenv("CORS_ORIGINS", "*")
@@ -24,6 +61,8 @@ class Settings:
             self.cors_origins = ["*"]
         else:
             self.cors_origins = [o.strip() for o in origins.split(",") if o.strip()]
+        endpoints = os.getenv("PROFILE_ENDPOINTS", "list_specs,get_spec_detail,get_spec_version")
+        self.profile_endpoints = [e.strip() for e in endpoints.split(",") if e.strip()]
 
 
 settings = Settings()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import threading
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NUM_PERM = 64
+# 16 bands of 4 rows: a pair at 0.8 similarity shares a bucket with probability ~0.9998, one at 0.2 with ~0.025.
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Texts signed per vectorized batch; bounds the temporaries to a few MB for typical spec bodies.
+SIGN_BATCH = 256
+_BIN_BITS = 6  # log2(NUM_PERM)
+_MASK32 = np.uint64(0xFFFFFFFF)
+_MIX = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F), np.uint64(0x165667B19E3779F9))
+_SLOTS = np.arange(NUM_PERM)
+
+
+def signature(text: str) -> Optional[bytes]:
+    """MinHash signature of ``text``; ``None`` when it has no words. See :func:`signatures`."""
+
+    return signatures([text])[0]
+
+
+def signatures(texts: Sequence[str]) -> List[Optional[bytes]]:
+    """One-permutation MinHash of the word 3-gram shingles of each text.
+
+    Each shingle is hashed once; its top bits pick one of ``NUM_PERM`` bins and the smallest
+    hash per bin is kept, so a text costs one sort rather than ``NUM_PERM`` hash passes.
+    Bins no shingle fell into borrow from the next filled bin (rotation densification), so
+    short texts still compare slot by slot. Texts are signed together in batches, with the
+    batch position packed above the bin and hash bits, which keeps NumPy call overhead off
+    the per-text cost when the whole catalog is loaded.
+
+    Words are hashed with :func:`hash`, so signatures are only comparable within one
+    process; they are never persisted.
+    """
+
+    found: List[Optional[bytes]] = []
+    for start in range(0, len(texts), SIGN_BATCH):
+        found.extend(_sign_batch(texts[start : start + SIGN_BATCH]))
+    return found
+
+
+def _sign_batch(texts: Sequence[str]) -> List[Optional[bytes]]:
+    documents = [text.casefold().split() for text in texts]
+    lengths = np.fromiter(map(len, documents), dtype=np.intp, count=len(documents))
+    total = int(lengths.sum())
+    if not total:
+        return [None] * len(texts)
+    hashes = np.zeros(total + 2, dtype=np.uint64)
+    hashes[:total] = np.fromiter(map(hash, chain.from_iterable(documents)), dtype=np.int64, count=total).view(np.uint64)
+    owner = np.repeat(np.arange(len(texts)), lengths)
+    offset = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    short = lengths[owner] < 3
+    # Wrapping uint64 arithmetic mixes three neighbouring word hashes into one shingle hash; texts of one
+    # or two words use the words themselves, and windows running into the next text are dropped.
+    shingles = hashes[:-2] * _MIX[0] + hashes[1:-1] * _MIX[1] + hashes[2:]
+    shingles = np.where(short, hashes[:total], shingles)
+    keep = short | (offset <= lengths[owner] - 3)
+    # Text index above bin (6 bits) above the 32 hash bits below the bin: one sort groups every
+    # (text, bin) pair with its minimum first.
+    packed = (shingles[keep] * _MIX[2]) >> np.uint64(64 - _BIN_BITS - 32)
+    packed |= owner[keep].astype(np.uint64) << np.uint64(_BIN_BITS + 32)
+    packed.sort()
+    groups = packed >> np.uint64(32)
+    first = np.flatnonzero(np.diff(groups, prepend=np.uint64(1 << 63)))
+    rows = (groups[first] >> np.uint64(_BIN_BITS)).astype(np.intp)
+    bins = (groups[first] & np.uint64(NUM_PERM - 1)).astype(np.intp)
+    values = np.zeros((len(texts), 2 * NUM_PERM), dtype=np.uint64)
+    filled = np.zeros((len(texts), 2 * NUM_PERM), dtype=bool)
+    for shift in (0, NUM_PERM):
+        values[rows, bins + shift] = packed[first] & _MASK32
+        filled[rows, bins + shift] = True
+    # Nearest filled bin at or after each slot, wrapping around through the doubled columns.
+    position = np.where(filled, np.arange(2 * NUM_PERM), 2 * NUM_PERM)
+    source = np.minimum.accumulate(position[:, ::-1], axis=1)[:, ::-1][:, :NUM_PERM]
+    source = np.minimum(source, 2 * NUM_PERM - 1)
+    distance = (source - _SLOTS).astype(np.uint64)
+    slots = ((np.take_along_axis(values, source, axis=1) + distance * _MIX[0]) & _MASK32).astype(np.uint32)
+    return [row.tobytes() if length else None for row, length in zip(slots, lengths.tolist())]
+
+
+def similarity(left: bytes, right: bytes) -> float:
+    """Share of agreeing MinHash slots, an estimate of the shingle sets' Jaccard similarity."""
+
+    return float(np.mean(np.frombuffer(left, dtype=np.uint32) == np.frombuffer(right, dtype=np.uint32)))
+
+
+def _band_keys(sig: bytes) -> List[Tuple[int, bytes]]:
+    width = ROWS * 4
+    return [(band, sig[band * width : (band + 1) * width]) for band in range(BANDS)]
+
+
+class DuplicateIndex:
+    """Banded LSH over MinHash signatures of spec bodies.
+
+    Two specs land in a shared bucket when all rows of at least one band agree, so pairs
+    well above ~0.5 Jaccard similarity are almost always candidates and unrelated bodies
+    rarely are. Candidates are then checked against the full signature, so a lookup
+    touches a handful of buckets instead of every stored body.
+
+    Like :class:`~ai_infra_backend.fuzzy.DeletionIndex`, buckets are tuples replaced on
+    update, so lookups can run concurrently with the single writer.
+    """
+
+    def __init__(self) -> None:
+        self._signatures: Dict[str, bytes] = {}
+        # hash(contentMd) per spec; a write that leaves the body alone is not re-signed.
+        self._digests: Dict[str, int] = {}
+        self._buckets: Dict[Tuple[int, bytes], Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _unlink(self, short_id: str) -> None:
+        previous = self._signatures.pop(short_id, None)
+        self._digests.pop(short_id, None)
+        if previous is None:
+            return
+        for key in _band_keys(previous):
+            bucket = tuple(member for member in self._buckets.get(key, ()) if member != short_id)
+            if bucket:
+                self._buckets[key] = bucket
+            else:
+                self._buckets.pop(key, None)
+
+    def update(self, upserts: Iterable[Tuple[str, str]] = (), removals: Iterable[str] = ()) -> None:
+        """Index ``(shortId, contentMd)`` pairs and forget ``removals``."""
+
+        with self._lock:
+            for short_id in removals:
+                self._unlink(short_id)
+            changed = [
+                (short_id, content, hash(content))
+                for short_id, content in upserts
+                if self._digests.get(short_id) != hash(content)
+            ]
+            for (short_id, _, digest), sig in zip(changed, signatures([content for _, content, _ in changed])):
+                self._unlink(short_id)
+                if sig is None:
+                    continue
+                self._signatures[short_id] = sig
+                self._digests[short_id] = digest
+                for key in _band_keys(sig):
+                    self._buckets[key] = self._buckets.get(key, ()) + (short_id,)
+
+    def find(self, content: str, threshold: float, exclude: str | None = None) -> List[Tuple[str, float]]:
+        """Indexed specs whose estimated similarity to ``content`` is at least ``threshold``, most similar first."""
+
+        sig = signature(content)
+        if sig is None:
+            return []
+        candidates = {member for key in _band_keys(sig) for member in self._buckets.get(key, ())}
+        candidates.discard(exclude)  # type: ignore[arg-type]
+        matches = []
+        for short_id in candidates:
+            stored = self._signatures.get(short_id)
+            if stored is None:
+                continue
+            score = similarity(sig, stored)
+            if score >= threshold:
+                matches.append((short_id, round(score, 4)))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches
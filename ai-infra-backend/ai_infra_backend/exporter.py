@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import io
+import json
+import tarfile
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Iterator, List, Tuple
+
+from ai_infra_backend.metrics import EXPORT_RECORDS
+from ai_infra_backend.models import Spec
+
+EXPORT_BATCH_SIZE = 100
+# The manifest is spooled to disk past this size so large exports keep a flat footprint.
+MANIFEST_SPOOL_BYTES = 1024 * 1024
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        dt = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        return dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+    return str(value)
+
+
+def _front_matter_value(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(item) for item in value)
+    elif isinstance(value, datetime):
+        value = _json_default(value)
+    return " ".join(str(value).splitlines())
+
+
+def render_markdown_file(spec: Spec) -> bytes:
+    """Markdown body prefixed with the ``---`` front matter the importer understands."""
+
+    lines = ["---"]
+    for key in ("title", "shortId", "summary", "category", "tags", "author", "version", "updatedAt"):
+        lines.append(f"{key}: {_front_matter_value(getattr(spec, key))}")
+    lines.append("---")
+    return ("\n".join(lines) + "\n" + spec.contentMd).encode("utf-8")
+
+
+def iter_ndjson(records: Iterator[Tuple[Spec, bool]]) -> Iterator[bytes]:
+    for spec, latest in records:
+        record = spec.dict()
+        record["latest"] = latest
+        EXPORT_RECORDS.labels("ndjson").inc()
+        yield json.dumps(record, default=_json_default, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+class _ChunkSink:
+    """Write-only file object handing tarfile's output back to the response generator."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _member_path(spec: Spec, latest: bool) -> str:
+    if latest:
+        return f"specs/{spec.shortId}.md"
+    return f"specs/{spec.shortId}/v{spec.version}.md"
+
+
+def _add_member(archive: tarfile.TarFile, name: str, payload: bytes, mtime: float) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(payload)
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    archive.addfile(info, io.BytesIO(payload))
+
+
+def iter_tar_gz(records: Iterator[Tuple[Spec, bool]]) -> Iterator[bytes]:
+    """Stream a gzip'd tar of ``specs/<shortId>.md`` files followed by ``manifest.json``."""
+
+    exported_at = datetime.now(timezone.utc)
+    sink = _ChunkSink()
+    with tempfile.SpooledTemporaryFile(max_size=MANIFEST_SPOOL_BYTES) as manifest:
+        manifest.write(b'{"exportedAt": ' + json.dumps(_json_default(exported_at)).encode("utf-8") + b', "entries": [')
+        count = 0
+        with tarfile.open(fileobj=sink, mode="w|gz") as archive:  # type: ignore[call-overload]
+            for spec, latest in records:
+                path = _member_path(spec, latest)
+                _add_member(archive, path, render_markdown_file(spec), spec.updatedAt.timestamp())
+                entry = {
+                    "path": path,
+                    "shortId": spec.shortId,
+                    "version": spec.version,
+                    "latest": latest,
+                    "title": spec.title,
+                    "updatedAt": spec.updatedAt,
+                }
+                if count:
+                    manifest.write(b", ")
+                manifest.write(json.dumps(entry, default=_json_default, ensure_ascii=False).encode("utf-8"))
+                count += 1
+                EXPORT_RECORDS.labels("tar").inc()
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            manifest.write(b'], "count": ' + str(count).encode("ascii") + b"}")
+            info = tarfile.TarInfo("manifest.json")
+            info.size = manifest.tell()
+            info.mtime = int(exported_at.timestamp())
+            info.mode = 0o644
+            manifest.seek(0)
+            archive.addfile(info, manifest)
+        yield sink.drain()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import re
+import threading
+from collections import defaultdict
+from itertools import combinations
+from typing import Dict, Iterable, List, Mapping, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+# Longer tokens are hashes and identifiers; they match exactly and stay out of the deletion index.
+MAX_FUZZY_TERM_LENGTH = 32
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded word tokens; the unit of the fuzzy search vocabulary."""
+
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def max_edits(length: int) -> int:
+    """Typos tolerated in a term of ``length`` characters: none up to 2, one up to 5, two beyond."""
+
+    if length <= 2 or length > MAX_FUZZY_TERM_LENGTH:
+        return 0
+    return 1 if length <= 5 else 2
+
+
+def deletes(term: str, depth: int) -> Set[str]:
+    """``term`` with every combination of up to ``depth`` characters removed, ``term`` itself included."""
+
+    variants = {term}
+    for removed in range(1, min(depth, len(term)) + 1):
+        for positions in combinations(range(len(term)), len(term) - removed):
+            variants.add("".join(term[index] for index in positions))
+    return variants
+
+
+def edit_distance(left: str, right: str, limit: int) -> int:
+    """Optimal string alignment distance (a swap of adjacent characters is one edit), capped at ``limit + 1``."""
+
+    if abs(len(left) - len(right)) > limit:
+        return limit + 1
+    previous_row: List[int] = []
+    row = list(range(len(right) + 1))
+    for i in range(1, len(left) + 1):
+        before, previous_row, row = previous_row, row, [i] + [0] * len(right)
+        for j in range(1, len(right) + 1):
+            cost = left[i - 1] != right[j - 1]
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and left[i - 1] == right[j - 2] and left[i - 2] == right[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+    return min(row[-1], limit + 1)
+
+
+class DeletionIndex:
+    """Symmetric-delete index from deletion variants to vocabulary terms.
+
+    Every term is stored under each string obtained by deleting up to :func:`max_edits`
+    characters from it. A query generates its own deletion variants and looks them up,
+    so candidates within the edit budget are found without walking the vocabulary.
+
+    The index is shared by all snapshots and updated in place by the repository's writer.
+    Buckets are tuples that are replaced rather than mutated, so readers never see one
+    change under them; :meth:`lookup` checks candidates against the caller's snapshot
+    vocabulary, which hides terms that were added or dropped by newer writes.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, Tuple[str, ...]] = {}
+        self._terms: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._terms
+
+    def update(self, added: Iterable[str] = (), removed: Iterable[str] = ()) -> None:
+        with self._lock:
+            additions: Dict[str, List[str]] = defaultdict(list)
+            for term in added:
+                if term not in self._terms:
+                    self._terms.add(term)
+                    for variant in deletes(term, max_edits(len(term))):
+                        additions[variant].append(term)
+            removals: Dict[str, Set[str]] = defaultdict(set)
+            for term in removed:
+                if term in self._terms:
+                    self._terms.discard(term)
+                    for variant in deletes(term, max_edits(len(term))):
+                        removals[variant].add(term)
+            buckets = self._buckets
+            for variant in additions.keys() | removals.keys():
+                gone = removals.get(variant, ())
+                bucket = tuple(term for term in buckets.get(variant, ()) if term not in gone)
+                bucket += tuple(additions.get(variant, ()))
+                if bucket:
+                    buckets[variant] = bucket
+                else:
+                    buckets.pop(variant, None)
+
+    def lookup(self, query: str, vocabulary: Mapping[str, int]) -> Dict[str, int]:
+        """Vocabulary terms within the edit budget of ``query``, mapped to their distance.
+
+        The budget is the smaller of the query's and the term's :func:`max_edits`, so a
+        short word never reaches a long one (or the reverse) through deletions alone.
+        """
+
+        query = query.casefold()
+        allowed = max_edits(len(query))
+        found: Dict[str, int] = {}
+        seen: Set[str] = set()
+        buckets = self._buckets
+        for variant in deletes(query, allowed):
+            for term in buckets.get(variant, ()):
+                if term in seen:
+                    continue
+                seen.add(term)
+                if term not in vocabulary:
+                    continue
+                limit = min(allowed, max_edits(len(term)))
+                distance = edit_distance(query, term, limit)
+                if distance <= limit:
+                    found[term] = distance
+        return found
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import json
+import logging
+import tarfile
+import time
+from datetime import datetime, timezone
+from pathlib import PurePosixPath
+from typing import IO, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from pymongo import errors as pymongo_errors
+
+from ai_infra_backend.metrics import IMPORT_BATCH_DURATION, IMPORT_RECORDS
+from ai_infra_backend.models import ImportRecord, Spec, User, spec_metadata_to_document, spec_version_to_document
+from ai_infra_backend.mongo import bulk_save_spec_versions
+from ai_infra_backend.outbox import SpecOutbox
+from ai_infra_backend.repository import SpecRepository
+from ai_infra_backend.uploads import content_hash
+from ai_infra_backend.utils import generate_short_id
+
+MAX_REPORTED_ERRORS = 100
+MAX_IMPORT_BATCH_SIZE = 5000
+
+
+class RecordError(ValueError):
+    """A single import record could not be parsed; the stream continues with the next one."""
+
+
+def iter_ndjson_records(stream: IO[bytes], max_record_bytes: int) -> Iterator[Tuple[int, Dict[str, Any] | RecordError]]:
+    index = 0
+    while True:
+        line = stream.readline(max_record_bytes + 1)
+        if not line:
+            return
+        if len(line) > max_record_bytes and not line.endswith(b"\n"):
+            # Drain the rest of the oversized line so the next record starts cleanly.
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(max_record_bytes + 1)
+            index += 1
+            yield index, RecordError(f"record exceeds {max_record_bytes} bytes")
+            continue
+        if not line.strip():
+            continue
+        index += 1
+        try:
+            value = json.loads(line)
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            yield index, RecordError(f"invalid JSON: {exc}")
+            continue
+        if not isinstance(value, dict):
+            yield index, RecordError("record must be a JSON object")
+            continue
+        yield index, value
+
+
+def parse_front_matter(text: str) -> Tuple[Dict[str, str], str]:
+    """Split an optional ``---`` block of ``key: value`` lines off the top of a Markdown file."""
+
+    if not text.startswith("---\n"):
+        return {}, text
+    end = text.find("\n---", 4)
+    if end == -1:
+        return {}, text
+    fields: Dict[str, str] = {}
+    for line in text[4:end].splitlines():
+        key, sep, value = line.partition(":")
+        if sep and key.strip():
+            fields[key.strip()] = value.strip().strip('"')
+    body_start = text.find("\n", end + 4)
+    return fields, text[body_start + 1 :] if body_start != -1 else ""
+
+
+def _markdown_record(name: str, text: str) -> Dict[str, Any]:
+    fields, body = parse_front_matter(text)
+    title = fields.get("title")
+    if not title:
+        heading = next((line[2:].strip() for line in body.splitlines() if line.startswith("# ")), "")
+        title = heading or PurePosixPath(name).stem
+    record: Dict[str, Any] = {"title": title, "contentMd": body}
+    for key in ("summary", "category", "tags", "shortId"):
+        if fields.get(key):
+            record[key] = fields[key]
+    return record
+
+
+def iter_tar_records(stream: IO[bytes], max_record_bytes: int) -> Iterator[Tuple[int, Dict[str, Any] | RecordError]]:
+    index = 0
+    with tarfile.open(fileobj=stream, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile() or not member.name.endswith(".md"):
+                continue
+            index += 1
+            if member.size > max_record_bytes:
+                yield index, RecordError(f"{member.name} exceeds {max_record_bytes} bytes")
+                continue
+            handle = archive.extractfile(member)
+            if handle is None:
+                yield index, RecordError(f"{member.name} could not be read")
+                continue
+            try:
+                text = handle.read().decode("utf-8")
+            except UnicodeDecodeError:
+                yield index, RecordError(f"{member.name} is not valid UTF-8")
+                continue
+            yield index, _markdown_record(member.name, text)
+
+
+def _owned_by(spec: Spec, user: User) -> bool:
+    if spec.ownerId:
+        return spec.ownerId == user.id
+    return (spec.author or "").lstrip("@") == user.username
+
+
+class SpecImporter:
+    """Validates import records one by one and persists them in ``bulk_write`` batches.
+
+    Each record becomes the next version of its spec as a compare-and-set against MongoDB, like
+    a single upload: a record whose base version another writer has moved past fails with 409.
+    With write-behind the compare-and-set is against the repository under ``outbox.lock`` and
+    accepted records are queued in the outbox, so imports stay ordered with uploads and deletes.
+    """
+
+    def __init__(
+        self,
+        repository: SpecRepository,
+        user: User,
+        batch_size: int,
+        outbox: Optional[SpecOutbox] = None,
+    ) -> None:
+        self.repository = repository
+        self.user = user
+        self.outbox = outbox
+        self.batch_size = max(batch_size, 1)
+        self.imported = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._batch: List[Tuple[int, Dict[str, Any], Dict[str, Any], Optional[int]]] = []
+        self._versions: Dict[str, int] = {}
+        self._started_at = time.perf_counter()
+
+    def fail(self, index: int, message: str, short_id: Optional[str] = None, status: Optional[int] = None) -> None:
+        self.failed += 1
+        IMPORT_RECORDS.labels("failed").inc()
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            error: Dict[str, Any] = {"record": index, "message": message}
+            if short_id:
+                error["shortId"] = short_id
+            if status:
+                error["status"] = status
+            self.errors.append(error)
+
+    def add(self, index: int, raw: Dict[str, Any]) -> None:
+        try:
+            record = ImportRecord(**raw)
+        except ValidationError as exc:
+            self.fail(index, "; ".join(error["msg"] for error in exc.errors()), raw.get("shortId"))
+            return
+        existing = self.repository.get_spec(record.shortId) if record.shortId else None
+        if existing is not None and not _owned_by(existing, self.user):
+            self.fail(index, "You do not have permission to modify this spec", record.shortId)
+            return
+        if record.shortId:
+            short_id = record.shortId
+        else:
+            short_id = generate_short_id()
+            while self.repository.get_spec(short_id) or short_id in self._versions:
+                short_id = generate_short_id()
+        previous = self._versions.get(short_id) or (existing.version if existing else 0)
+        now = datetime.now(timezone.utc)
+        spec = Spec(
+            title=record.title,
+            shortId=short_id,
+            summary=record.summary,
+            category=record.category,
+            tags=record.tags,
+            author=f"@{self.user.username}",
+            ownerId=existing.ownerId if existing and existing.ownerId else self.user.id,
+            createdAt=existing.createdAt if existing else now,
+            updatedAt=now,
+            version=previous + 1,
+            contentMd=record.contentMd,
+            contentHash=content_hash(record.contentMd),
+        )
+        self._versions[short_id] = spec.version
+        self._batch.append((index, spec_metadata_to_document(spec), spec_version_to_document(spec), previous or None))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        started = time.perf_counter()
+        if self.outbox is not None:
+            conflicts = self._enqueue(batch)
+        else:
+            try:
+                conflicts = bulk_save_spec_versions([entry[1:] for entry in batch])
+            except pymongo_errors.PyMongoError as exc:
+                logging.warning("Bulk import batch of %d records failed: %s", len(batch), exc)
+                for index, metadata, _, _ in batch:
+                    self._versions.pop(metadata["shortId"], None)
+                    self.fail(index, "Failed to persist spec", metadata["shortId"])
+                return
+        stale: Set[str] = set()
+        for position in sorted(conflicts):
+            index, metadata, _, _ = batch[position]
+            stale.add(metadata["shortId"])
+            self.fail(index, "Spec was modified concurrently, please retry", metadata["shortId"], status=409)
+        for short_id in stale:
+            # The next record for this spec builds on whatever the other writer left.
+            self._versions.pop(short_id, None)
+            if self.outbox is None:
+                self.repository.reload_spec(short_id)
+        pairs = [
+            (metadata, version) for position, (_, metadata, version, _) in enumerate(batch) if position not in conflicts
+        ]
+        if self.outbox is None:
+            self.repository.refresh_from_documents(pairs)
+        IMPORT_BATCH_DURATION.observe(time.perf_counter() - started)
+        IMPORT_RECORDS.labels("imported").inc(len(pairs))
+        self.batches += 1
+        self.imported += len(pairs)
+
+    def _enqueue(self, batch: List[Tuple[int, Dict[str, Any], Dict[str, Any], Optional[int]]]) -> Set[int]:
+        """Queue the records whose base version is still the repository's; returns the positions that conflict."""
+
+        conflicts: Set[int] = set()
+        accepted: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        current: Dict[str, Optional[int]] = {}
+        with self.outbox.lock:  # type: ignore[union-attr]
+            for position, (_, metadata, version, previous) in enumerate(batch):
+                short_id = metadata["shortId"]
+                if short_id not in current:
+                    spec = self.repository.get_spec(short_id)
+                    current[short_id] = spec.version if spec else None
+                if current[short_id] != previous:
+                    conflicts.add(position)
+                    continue
+                current[short_id] = metadata["version"]
+                accepted.append((metadata, version))
+            if accepted:
+                self.outbox.save_many(accepted)  # type: ignore[union-attr]
+                self.repository.refresh_from_documents(accepted)
+        return conflicts
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self._started_at
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "durationSeconds": round(elapsed, 3),
+            "recordsPerSecond": round(self.imported / elapsed, 1) if elapsed > 0 else 0.0,
+        }
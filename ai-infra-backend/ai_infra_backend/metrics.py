@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import os
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+HTTP_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REPOSITORY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "specmarket_http_request_duration_seconds",
+    "HTTP request latency by route and status (the _count series is the request count)",
+    ["method", "route", "status"],
+    buckets=HTTP_LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "specmarket_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    multiprocess_mode="livesum",
+)
+REPOSITORY_OPERATION_DURATION = Histogram(
+    "specmarket_repository_operation_seconds",
+    "Time spent in SpecRepository operations",
+    ["operation"],
+    buckets=REPOSITORY_BUCKETS,
+)
+REPOSITORY_CACHE_LOOKUPS = Counter(
+    "specmarket_repository_cache_lookups_total",
+    "SpecRepository lookups answered from memory (hit) or from MongoDB (miss)",
+    ["cache", "result"],
+)
+
+AUTH_HASH_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+AUTH_HASH_QUEUE_WAIT = Histogram(
+    "specmarket_auth_hash_queue_wait_seconds",
+    "Time password hashing jobs spend waiting for a bcrypt worker",
+    ["operation"],
+    buckets=AUTH_HASH_BUCKETS,
+)
+AUTH_HASH_DURATION = Histogram(
+    "specmarket_auth_hash_duration_seconds",
+    "Time spent inside bcrypt hash/verify calls",
+    ["operation"],
+    buckets=AUTH_HASH_BUCKETS,
+)
+AUTH_HASH_REJECTED = Counter(
+    "specmarket_auth_hash_rejected_total",
+    "Password hashing jobs rejected because the bcrypt queue was saturated",
+    ["operation"],
+)
+AUTH_HASH_PENDING = Gauge(
+    "specmarket_auth_hash_pending",
+    "Password hashing jobs admitted and not yet finished",
+    multiprocess_mode="livesum",
+)
+
+MONGO_CHECKOUT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+MONGO_POOL_CHECKOUT = Histogram(
+    "specmarket_mongo_pool_checkout_seconds",
+    "Time spent waiting to check a connection out of the MongoDB pool",
+    buckets=MONGO_CHECKOUT_BUCKETS,
+)
+MONGO_POOL_CHECKOUT_FAILED = Counter(
+    "specmarket_mongo_pool_checkout_failed_total",
+    "Failed MongoDB pool checkouts",
+    ["reason"],
+)
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "specmarket_mongo_pool_checked_out",
+    "MongoDB connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+MONGO_POOL_OPEN = Gauge(
+    "specmarket_mongo_pool_connections",
+    "MongoDB connections currently open in the pool",
+    multiprocess_mode="livesum",
+)
+MONGO_POOL_MAX_SIZE = Gauge(
+    "specmarket_mongo_pool_max_size",
+    "Configured maxPoolSize; checked_out / max_size is the pool saturation",
+    multiprocess_mode="livesum",
+)
+MONGO_POOL_CLEARED = Counter(
+    "specmarket_mongo_pool_cleared_total",
+    "Times the MongoDB pool was cleared after a network error",
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "specmarket_mongo_command_duration_seconds",
+    "MongoDB command round-trip time as reported by the driver",
+    ["command", "outcome"],
+    buckets=MONGO_CHECKOUT_BUCKETS,
+)
+
+IMPORT_RECORDS = Counter(
+    "specmarket_import_records_total",
+    "Records processed by bulk imports",
+    ["result"],
+)
+IMPORT_BATCH_DURATION = Histogram(
+    "specmarket_import_batch_seconds",
+    "Time to persist one bulk import batch",
+    buckets=HTTP_LATENCY_BUCKETS,
+)
+
+EXPORT_RECORDS = Counter(
+    "specmarket_export_records_total",
+    "Spec versions streamed by catalog exports",
+    ["format"],
+)
+
+OUTBOX_DEPTH = Gauge(
+    "specmarket_outbox_depth",
+    "Spec writes acknowledged but not yet flushed to MongoDB",
+    multiprocess_mode="livesum",
+)
+OUTBOX_FLUSHED = Counter(
+    "specmarket_outbox_flushed_total",
+    "Outbox entries applied to MongoDB",
+)
+OUTBOX_FLUSH_FAILURES = Counter(
+    "specmarket_outbox_flush_failures_total",
+    "Outbox flush attempts that failed and were retried",
+)
+OUTBOX_DEAD_LETTERS = Counter(
+    "specmarket_outbox_dead_letters_total",
+    "Outbox entries MongoDB rejected for good or that lost a version race, moved to the dead-letter file",
+)
+
+
+def repository_timer(operation: str):
+    """Decorator/context manager timing a repository operation."""
+
+    return REPOSITORY_OPERATION_DURATION.labels(operation).time()
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    REPOSITORY_CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    # Under gunicorn every worker writes to PROMETHEUS_MULTIPROC_DIR; aggregate them per scrape.
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
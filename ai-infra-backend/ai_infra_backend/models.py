@@ -15,7 +15,9 @@ class BusinessErrorCode(IntEnum):
     INVALID_ARG = 1001
     NOT_FOUND = 1004
     UNAUTHORIZED = 1003
+    CONFLICT = 1009
     INTERNAL = 1500
+    UNAVAILABLE = 1503
 
     @property
     def default_message(self) -> str:
@@ -27,7 +29,9 @@ _ERROR_MESSAGES = {
     BusinessErrorCode.INVALID_ARG: "Invalid argument",
     BusinessErrorCode.NOT_FOUND: "Resource not found",
     BusinessErrorCode.UNAUTHORIZED: "Unauthorized",
+    BusinessErrorCode.CONFLICT: "Resource was modified concurrently",
     BusinessErrorCode.INTERNAL: "Internal server error",
+    BusinessErrorCode.UNAVAILABLE: "Service temporarily unavailable",
 }
 
 
@@ -48,6 +52,7 @@ class Spec(BaseModel):
     updatedAt: datetime
     version: int = Field(default=1, ge=1)
     contentMd: str = Field(..., alias="contentMd")
+    contentHash: Optional[str] = None
 
     class Config:
         allow_population_by_field_name = True
@@ -78,11 +83,34 @@ class SpecSummary(BaseModel):
         return value
 
 
+class RelatedSpec(SpecSummary):
+    score: float
+
+
+class NearDuplicate(BaseModel):
+    shortId: str
+    title: str
+    author: str
+    similarity: float
+
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+
+class Suggestion(BaseModel):
+    value: str
+    field: str
+    count: int
+
+
 class PaginatedSpecs(BaseModel):
     total: int
     page: int
     pageSize: int
     items: List[SpecSummary]
+    facets: Optional[Dict[str, List[FacetValue]]] = None
 
     @validator("page", "pageSize", pre=True)
     def positive(cls, v: int) -> int:
@@ -144,6 +172,7 @@ class SpecVersion(BaseModel):
     tags: List[str]
     author: str
     contentMd: str
+    contentHash: Optional[str] = None
     createdAt: datetime
     updatedAt: datetime
 
@@ -197,6 +226,60 @@ class UpdatePayload(BaseModel):
         return value
 
 
+class BatchDetailItem(BaseModel):
+    shortId: str
+    version: Optional[int] = Field(default=None, ge=1)
+
+    @validator("shortId")
+    def validate_short_id(cls, value: str) -> str:
+        if not SHORT_ID_REGEX.fullmatch(value):
+            raise ValueError(SHORT_ID_ERROR)
+        return value
+
+
+class BatchDetailPayload(BaseModel):
+    items: List[BatchDetailItem]
+    includeContent: bool = True
+    includeHistory: bool = False
+
+    @validator("items", pre=True)
+    def accept_bare_short_ids(cls, value: Any) -> Any:
+        if isinstance(value, list):
+            return [{"shortId": item} if isinstance(item, str) else item for item in value]
+        return value
+
+
+class ImportRecord(BaseModel):
+    title: str
+    summary: str = ""
+    category: str = "uncategorized"
+    tags: List[str] = Field(default_factory=list)
+    contentMd: str
+    shortId: Optional[str] = None
+
+    @validator("tags", pre=True)
+    def split_tags(cls, value: Any) -> List[str]:
+        if value is None:
+            return []
+        if isinstance(value, str):
+            value = value.split(",")
+        return [str(tag).strip() for tag in value if str(tag).strip()]
+
+    @validator("shortId")
+    def validate_optional_short_id(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return value
+        if not SHORT_ID_REGEX.fullmatch(value):
+            raise ValueError(SHORT_ID_ERROR)
+        return value
+
+    @validator("contentMd")
+    def validate_content(cls, value: str) -> str:
+        if not value or not value.strip():
+            raise ValueError("contentMd must not be empty")
+        return value
+
+
 class APIResponse(BaseModel):
     status_code: int
     status_msg: str
@@ -269,6 +352,8 @@ def spec_version_to_document(spec: Spec | SpecVersion) -> Dict[str, Any]:
         "createdAt": source["createdAt"],
         "updatedAt": source["updatedAt"],
     }
+    if source.get("contentHash"):
+        document["contentHash"] = source["contentHash"]
     return document
 
 
@@ -3,52 +3,274 @@ from __future__ import annotations
 from __future__ import annotations
 
 import logging
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from functools import wraps
 from types import SimpleNamespace
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 from bson import ObjectId
 from bson.errors import InvalidId
-from pymongo import MongoClient, errors
+from pymongo import MongoClient, UpdateOne, errors
 from pymongo.collection import Collection
 
 from ai_infra_backend.config import settings
+from ai_infra_backend.monitoring import client_options, record_command
 
 _client: MongoClient | None = None
 _collection: Collection | "_InMemorySpecCollection" | None = None
 _history_collection: Collection | "_InMemorySpecHistoryCollection" | None = None
 _user_collection: Collection | "_InMemoryUserCollection" | None = None
+_monitor: "MongoHealthMonitor" | None = None
+_init_lock = threading.Lock()
+# Serializes paired spec/version writes against the in-memory fallback.
+_memory_write_lock = threading.Lock()
+_TRANSACTION_TOPOLOGIES = {"ReplicaSetWithPrimary", "Sharded", "LoadBalanced"}
+DUPLICATE_KEY_ERROR = 11000
+
+
+class MongoUnavailableError(errors.ConnectionFailure):
+    """Raised without touching the network while the circuit breaker is open."""
+
+
+class SpecVersionConflict(RuntimeError):
+    """Another writer already moved the spec past the version this write was based on."""
+
+    def __init__(self, short_id: str, expected_version: Optional[int]) -> None:
+        super().__init__(f"spec {short_id} is no longer at version {expected_version}")
+        self.short_id = short_id
+        self.expected_version = expected_version
+
+
+class CircuitBreaker:
+    """Fails Mongo calls fast after repeated connection errors.
+
+    ``closed`` lets everything through, ``open`` rejects calls until ``reset_timeout``
+    elapses, after which a single ``half_open`` trial call decides the next state.
+    The health monitor also closes or trips the breaker on every ping.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = "half_open"
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                self._open()
+
+    def trip(self) -> None:
+        with self._lock:
+            self._failures = max(self._failures, self.failure_threshold)
+            self._open()
+
+    def _open(self) -> None:
+        if self._state != "open":
+            logging.warning("MongoDB circuit breaker opened")
+        self._state = "open"
+        self._opened_at = time.monotonic()
+
+
+circuit_breaker = CircuitBreaker(settings.mongo_breaker_threshold, settings.mongo_breaker_reset)
+
+
+class MongoHealthMonitor:
+    """Pings the shared client in the background and caches the result for probes."""
+
+    def __init__(self, client: MongoClient, breaker: CircuitBreaker, interval: float) -> None:
+        self.client = client
+        self.breaker = breaker
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._healthy: Optional[bool] = None
+        self._last_checked_at: Optional[datetime] = None
+        self._last_error: Optional[str] = None
+        self._latency_ms: Optional[float] = None
+        self._recovery_listeners: List[Callable[[], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        started = time.perf_counter()
+        error: Optional[str] = None
+        try:
+            self.client.admin.command("ping")
+            healthy = True
+        except errors.PyMongoError as exc:
+            healthy = False
+            error = str(exc)
+        with self._lock:
+            recovered = healthy and self._healthy is False
+            if not healthy and self._healthy is not False:
+                logging.warning("MongoDB health check failed: %s", error)
+            self._healthy = healthy
+            self._last_checked_at = datetime.now(timezone.utc)
+            self._last_error = error
+            self._latency_ms = (time.perf_counter() - started) * 1000
+            listeners = list(self._recovery_listeners) if recovered else []
+        if healthy:
+            self.breaker.record_success()
+        else:
+            self.breaker.trip()
+        if recovered:
+            logging.info("MongoDB connection recovered")
+        for listener in listeners:
+            try:
+                listener()
+            except Exception as exc:  # pragma: no cover - defensive
+                logging.warning("MongoDB recovery listener failed: %s", exc)
+        return healthy
+
+    def add_recovery_listener(self, listener: Callable[[], None]) -> None:
+        with self._lock:
+            self._recovery_listeners.append(listener)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="mongo-health", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "healthy": bool(self._healthy),
+                "lastCheckedAt": self._last_checked_at,
+                "lastError": self._last_error,
+                "latencyMs": self._latency_ms,
+            }
+
+
+def _counted(command: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Report in-memory operations like driver commands so budgets hold for both backends."""
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(func)
+        def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                record_command(command, time.perf_counter() - started, f"memory.{self.name}")
+
+        return wrapper
+
+    return decorator
+
+
+def _field_matches(value: Any, condition: Any) -> bool:
+    # Plain equality, plus the ``$lte`` bound version-conditioned deletes use.
+    if isinstance(condition, dict) and "$lte" in condition:
+        return value is not None and value <= condition["$lte"]
+    return value == condition
+
+
+class _InMemoryCursor(list):
+    def sort(self, key: str, direction: int = 1) -> "_InMemoryCursor":  # type: ignore[override]
+        return _InMemoryCursor(sorted(self, key=lambda doc: doc.get(key), reverse=direction < 0))
+
+    def limit(self, count: int) -> "_InMemoryCursor":
+        return _InMemoryCursor(self[:count] if count else self)
 
 
 class _InMemorySpecCollection:
+    name = "specs"
+
     def __init__(self) -> None:
         self.store: Dict[str, Dict[str, Any]] = {}
 
-    def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> None:
+    @_counted("update")
+    def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> SimpleNamespace:
+        return SimpleNamespace(matched_count=self._update(filter, update, upsert))
+
+    @_counted("update")
+    def bulk_write(self, requests: Sequence[UpdateOne], ordered: bool = True) -> None:
+        for request in requests:
+            self._update(request._filter, request._doc, request._upsert)
+
+    def _update(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool) -> int:
         short_id = filter.get("shortId")
         if short_id is None:
             raise ValueError("shortId filter is required for in-memory fallback")
         if "$set" not in update:
             raise ValueError("$set update is required for in-memory fallback")
-        if not upsert and short_id not in self.store:
-            return
-        self.store[short_id] = dict(update["$set"])
-
-    def find(self, filter: Dict[str, Any] | None = None) -> Iterable[Dict[str, Any]]:
-        return [dict(value) for value in self.store.values()]
+        current = self.store.get(short_id)
+        # Other filter fields (e.g. the expected version) must match, as they would in MongoDB.
+        matched = current is not None and all(current.get(key) == value for key, value in filter.items())
+        if matched or (upsert and current is None):
+            self.store[short_id] = dict(update["$set"])
+        return int(matched)
+
+    @_counted("find")
+    def find(self, filter: Dict[str, Any] | None = None) -> _InMemoryCursor:
+        return _InMemoryCursor(dict(value) for value in self.store.values())
+
+    @_counted("find")
+    def find_one(self, filter: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        document = self.store.get(filter.get("shortId"))  # type: ignore[arg-type]
+        return dict(document) if document else None
 
-    def delete_one(self, filter: Dict[str, Any]) -> None:
+    @_counted("delete")
+    def delete_one(self, filter: Dict[str, Any]) -> SimpleNamespace:
         short_id = filter.get("shortId")
         if short_id is None:
             raise ValueError("shortId filter is required for in-memory fallback")
-        self.store.pop(short_id, None)
+        current = self.store.get(short_id)
+        if current is None or not all(_field_matches(current.get(key), value) for key, value in filter.items()):
+            return SimpleNamespace(deleted_count=0)
+        del self.store[short_id]
+        return SimpleNamespace(deleted_count=1)
 
 
 class _InMemorySpecHistoryCollection:
+    name = "spec_versions"
+
     def __init__(self) -> None:
         self.store: Dict[str, Dict[int, Dict[str, Any]]] = {}
 
+    @_counted("update")
     def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> None:
+        self._update(filter, update, upsert)
+
+    @_counted("update")
+    def bulk_write(self, requests: Sequence[UpdateOne], ordered: bool = True) -> None:
+        for request in requests:
+            self._update(request._filter, request._doc, request._upsert)
+
+    def _update(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool) -> None:
         short_id = filter.get("shortId")
         version = filter.get("version")
         if short_id is None or version is None:
@@ -58,12 +280,26 @@ class _InMemorySpecHistoryCollection:
         versions = self.store.setdefault(short_id, {})
         versions[int(version)] = dict(update["$set"])
 
-    def find(self, filter: Dict[str, Any] | None = None) -> Iterable[Dict[str, Any]]:
+    @_counted("find")
+    def find(
+        self,
+        filter: Dict[str, Any] | None = None,
+        projection: Dict[str, int] | None = None,
+    ) -> _InMemoryCursor:
         if not filter or "shortId" not in filter:
-            return [dict(doc) for versions in self.store.values() for doc in versions.values()]
-        versions = self.store.get(filter["shortId"], {})
-        return [dict(doc) for doc in versions.values()]
-
+            documents = [doc for versions in self.store.values() for doc in versions.values()]
+        else:
+            short_id = filter["shortId"]
+            keys = short_id["$in"] if isinstance(short_id, dict) else [short_id]
+            documents = [doc for key in keys for doc in self.store.get(key, {}).values()]
+        version = (filter or {}).get("version")
+        if isinstance(version, dict) and "$in" in version:
+            wanted = {int(value) for value in version["$in"]}
+            documents = [doc for doc in documents if int(doc.get("version", 0)) in wanted]
+        excluded = {key for key, value in (projection or {}).items() if not value}
+        return _InMemoryCursor({k: v for k, v in doc.items() if k not in excluded} for doc in documents)
+
+    @_counted("find")
     def find_one(self, filter: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         short_id = filter.get("shortId")
         version = filter.get("version")
@@ -72,17 +308,58 @@ class _InMemorySpecHistoryCollection:
         doc = self.store.get(short_id, {}).get(int(version))
         return dict(doc) if doc else None
 
+    @_counted("insert")
+    def insert_one(self, document: Dict[str, Any]) -> SimpleNamespace:
+        versions = self.store.setdefault(document["shortId"], {})
+        version = int(document["version"])
+        # Mirrors the unique (shortId, version) index.
+        if version in versions:
+            raise errors.DuplicateKeyError(f"version {version} of {document['shortId']} already exists")
+        versions[version] = dict(document)
+        return SimpleNamespace(inserted_id=None)
+
+    @_counted("insert")
+    def insert_many(self, documents: Sequence[Dict[str, Any]], ordered: bool = True) -> SimpleNamespace:
+        write_errors = []
+        for index, document in enumerate(documents):
+            versions = self.store.setdefault(document["shortId"], {})
+            version = int(document["version"])
+            if version in versions:
+                write_errors.append({"index": index, "code": DUPLICATE_KEY_ERROR, "errmsg": "duplicate key"})
+                if ordered:
+                    break
+                continue
+            versions[version] = dict(document)
+        if write_errors:
+            raise errors.BulkWriteError({"writeErrors": write_errors, "nInserted": len(documents) - len(write_errors)})
+        return SimpleNamespace(inserted_ids=[None] * len(documents))
+
+    @_counted("delete")
+    def delete_one(self, filter: Dict[str, Any]) -> None:
+        self.store.get(filter.get("shortId"), {}).pop(int(filter.get("version", 0)), None)  # type: ignore[arg-type]
+
+    @_counted("delete")
     def delete_many(self, filter: Dict[str, Any]) -> None:
         short_id = filter.get("shortId")
         if short_id is None:
             return
-        self.store.pop(short_id, None)
+        if "version" not in filter:
+            self.store.pop(short_id, None)
+            return
+        versions = self.store.get(short_id, {})
+        for version in [version for version in versions if _field_matches(version, filter["version"])]:
+            del versions[version]
+        if not versions:
+            self.store.pop(short_id, None)
 
 
 class _InMemoryUserCollection:
+    name = "users"
+
     def __init__(self) -> None:
         self.store: Dict[str, Dict[str, Any]] = {}
 
+    @_counted("insert")
     def insert_one(self, document: Dict[str, Any]) -> SimpleNamespace:
         username = document.get("username")
         for existing in self.store.values():
@@ -94,7 +371,7 @@ class _InMemoryUserCollection:
         self.store[str(identifier)] = doc
         return SimpleNamespace(inserted_id=identifier)
 
-    def find_one(self, filter: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def _find_one(self, filter: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         if not filter:
             return None
         if "_id" in filter:
@@ -110,8 +387,13 @@ class _InMemoryUserCollection:
                 return dict(stored)
         return None
 
+    @_counted("find")
+    def find_one(self, filter: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self._find_one(filter)
+
+    @_counted("update")
     def update_one(self, filter: Dict[str, Any], update: Dict[str, Any]) -> None:
-        document = self.find_one(filter)
+        document = self._find_one(filter)
         if not document:
             return
         if "$set" in update:
@@ -146,26 +428,98 @@ def _normalize_user_document(document: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def _init_client() -> None:
-    global _client, _collection, _history_collection, _user_collection
-    if _collection is not None and _user_collection is not None and _history_collection is not None:
-        return
-    try:
-        _client = MongoClient(settings.mongo_uri, serverSelectionTimeoutMS=2000)
-        _client.admin.command("ping")
-        db = _client[settings.mongo_db]
+    global _client, _collection, _history_collection, _user_collection, _monitor
+    with _init_lock:
+        if _collection is not None and _user_collection is not None and _history_collection is not None:
+            return
+        client = MongoClient(settings.mongo_uri, **client_options(settings))
+        monitor = MongoHealthMonitor(client, circuit_breaker, settings.mongo_health_interval)
+        if not monitor.check() and settings.mongo_memory_fallback:
+            logging.warning("MongoDB unavailable, using in-memory fallback: %s", monitor.snapshot()["lastError"])
+            client.close()
+            circuit_breaker.record_success()
+            _client = None
+            _collection = _InMemorySpecCollection()
+            _history_collection = _InMemorySpecHistoryCollection()
+            _user_collection = _InMemoryUserCollection()
+            return
+        db = client[settings.mongo_db]
+        _client = client
+        _monitor = monitor
         _collection = db["specs"]
         _history_collection = db["spec_versions"]
         _user_collection = db["users"]
-        try:
-            _user_collection.create_index("username", unique=True)
-        except errors.PyMongoError as exc:
-            logging.warning("Failed to ensure username index: %s", exc)
+        monitor.add_recovery_listener(_ensure_indexes)
+        if monitor.snapshot()["healthy"]:
+            _ensure_indexes()
+        monitor.start()
+
+
+def _ensure_indexes() -> None:
+    try:
+        _user_collection.create_index("username", unique=True)  # type: ignore[union-attr]
+    except errors.PyMongoError as exc:
+        logging.warning("Failed to ensure username index: %s", exc)
+    try:
+        # Backstop for optimistic concurrency: two writers can never both create version N.
+        _history_collection.create_index([("shortId", 1), ("version", 1)], unique=True)  # type: ignore[union-attr]
     except errors.PyMongoError as exc:
-        logging.warning("MongoDB unavailable, using in-memory fallback: %s", exc)
-        _client = None
-        _collection = _InMemorySpecCollection()
-        _history_collection = _InMemorySpecHistoryCollection()
-        _user_collection = _InMemoryUserCollection()
+        logging.warning("Failed to ensure spec version index: %s", exc)
+
+
+@contextmanager
+def _guard() -> Iterator[None]:
+    """Short-circuit while the breaker is open and feed connection errors back into it.
+
+    Any other server error (a duplicate key, a failed validation, a lost version race) still
+    means MongoDB answered, so it counts as a success; otherwise a half-open trial call that
+    fails that way would leave the breaker half open and rejecting every later call.
+    """
+
+    if not circuit_breaker.allow_request():
+        raise MongoUnavailableError("MongoDB is unavailable (circuit breaker open)")
+    try:
+        yield
+    except MongoUnavailableError:
+        raise
+    except errors.ConnectionFailure:
+        circuit_breaker.record_failure()
+        raise
+    except (errors.PyMongoError, SpecVersionConflict):
+        circuit_breaker.record_success()
+        raise
+    circuit_breaker.record_success()
+
+
+def mongo_available() -> bool:
+    """Whether spec reads should reach the backing store (always true for the in-memory fallback)."""
+
+    if _collection is None:
+        _init_client()
+    return circuit_breaker.state != "open"
+
+
+def mongo_health() -> Dict[str, Any]:
+    if _collection is None:
+        _init_client()
+    if _monitor is None:
+        return {"backend": "memory", "connected": False, "breaker": circuit_breaker.state}
+    snapshot = _monitor.snapshot()
+    return {
+        "backend": "mongo",
+        "connected": snapshot["healthy"],
+        "breaker": circuit_breaker.state,
+        **snapshot,
+    }
+
+
+def add_recovery_listener(listener: Callable[[], None]) -> None:
+    """Run ``listener`` whenever the health monitor sees MongoDB come back."""
+
+    if _collection is None:
+        _init_client()
+    if _monitor is not None:
+        _monitor.add_recovery_listener(listener)
 
 
 def get_spec_collection() -> Collection | _InMemorySpecCollection:
@@ -182,7 +536,199 @@ def get_user_collection() -> Collection | _InMemoryUserCollection:
 
 def save_spec_document(document: Dict[str, Any]) -> None:
     collection = get_spec_collection()
-    collection.update_one({"shortId": document["shortId"]}, {"$set": document}, upsert=True)
+    with _guard():
+        collection.update_one({"shortId": document["shortId"]}, {"$set": document}, upsert=True)
+
+
+def _to_millisecond(value: Any) -> datetime:
+    moment = _normalize_datetime(value)
+    return moment.replace(microsecond=moment.microsecond // 1000 * 1000)
+
+
+def _same_write(stored: Dict[str, Any], document: Dict[str, Any]) -> bool:
+    """Whether ``stored`` is ``document`` persisted earlier; MongoDB keeps datetimes to the millisecond."""
+
+    for key, value in document.items():
+        current = stored.get(key)
+        if isinstance(value, datetime) and isinstance(current, datetime):
+            value, current = _to_millisecond(value), _to_millisecond(current)
+        if current != value:
+            return False
+    return True
+
+
+def _bulk_write_spec_versions(
+    history: Any,
+    collection: Any,
+    items: Sequence[Tuple[Dict[str, Any], Dict[str, Any], Optional[int]]],
+) -> Set[int]:
+    duplicates: Set[int] = set()
+    try:
+        history.insert_many([dict(version) for _, version, _ in items], ordered=False)
+    except errors.BulkWriteError as exc:
+        write_errors = exc.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in write_errors):
+            raise
+        duplicates = {error["index"] for error in write_errors}
+    conflicts: Set[int] = set()
+    if duplicates:
+        # A replayed write (an outbox batch retried after a dropped connection) finds its own versions
+        # already stored; only versions another writer created are conflicts.
+        versions = [items[index][1] for index in duplicates]
+        stored = {
+            (document["shortId"], int(document["version"])): document
+            for document in history.find(
+                {
+                    "shortId": {"$in": sorted({version["shortId"] for version in versions})},
+                    "version": {"$in": sorted({int(version["version"]) for version in versions})},
+                }
+            )
+        }
+        for index in duplicates:
+            version = items[index][1]
+            if not _same_write(stored.get((version["shortId"], int(version["version"])), {}), version):
+                conflicts.add(index)
+    chains: Dict[str, List[int]] = {}
+    for index, (metadata, _, _) in enumerate(items):
+        chains.setdefault(metadata["shortId"], []).append(index)
+    # Versions of one spec build on each other: once one conflicts, the rest of its chain does too.
+    applied: Dict[str, List[int]] = {}
+    for short_id, chain in chains.items():
+        cut = next((position for position, index in enumerate(chain) if index in conflicts), len(chain))
+        conflicts.update(chain[cut:])
+        if cut:
+            applied[short_id] = chain[:cut]
+    if applied:
+        requests = []
+        for short_id, chain in applied.items():
+            latest, expected_version = items[chain[-1]][0], items[chain[0]][2]
+            if expected_version is None:
+                requests.append(UpdateOne({"shortId": short_id}, {"$set": latest}, upsert=True))
+            else:
+                requests.append(UpdateOne({"shortId": short_id, "version": expected_version}, {"$set": latest}))
+        collection.bulk_write(requests, ordered=False)
+        current = {
+            document["shortId"]: int(document.get("version") or 0)
+            for document in collection.find({"shortId": {"$in": sorted(applied)}})
+            if document["shortId"] in applied
+        }
+        seeded = []
+        for short_id, chain in applied.items():
+            latest = items[chain[-1]][0]
+            if short_id not in current:
+                # Seeded from the bundled data file: no metadata document yet, and the version inserts
+                # above already serialized concurrent writers, as in _write_spec_version.
+                seeded.append(UpdateOne({"shortId": short_id}, {"$set": latest}, upsert=True))
+            elif current[short_id] < int(latest["version"]):
+                conflicts.update(chain)
+        if seeded:
+            collection.bulk_write(seeded, ordered=False)
+    for index in sorted(conflicts - duplicates):
+        version = items[index][1]
+        history.delete_one({"shortId": version["shortId"], "version": version["version"]})
+    return conflicts
+
+
+def bulk_save_spec_versions(items: Sequence[Tuple[Dict[str, Any], Dict[str, Any], Optional[int]]]) -> Set[int]:
+    """Compare-and-set many ``(metadata, version, expected_version)`` writes in a few bulk calls.
+
+    The bulk counterpart of :func:`save_spec_with_version`: version documents go through one
+    unordered ``insert_many``, so the unique ``(shortId, version)`` index rejects versions another
+    writer already created, and each spec's metadata only moves if it is still at the version
+    its first write in the batch expected. Writes of one spec are expected in version order.
+
+    Returns the positions in ``items`` that conflicted; their version documents are removed again
+    and nothing of them is visible in MongoDB. Errors other than duplicate keys are raised.
+    """
+
+    if not items:
+        return set()
+    history = get_history_collection()
+    collection = get_spec_collection()
+    if isinstance(collection, _InMemorySpecCollection):
+        with _memory_write_lock, _guard():
+            return _bulk_write_spec_versions(history, collection, items)
+    with _guard():
+        return _bulk_write_spec_versions(history, collection, items)
+
+
+def _supports_transactions() -> bool:
+    if _client is None or not settings.mongo_write_transactions:
+        return False
+    return _client.topology_description.topology_type_name in _TRANSACTION_TOPOLOGIES
+
+
+def _write_spec_version(
+    history: Any,
+    collection: Any,
+    metadata: Dict[str, Any],
+    version: Dict[str, Any],
+    expected_version: Optional[int],
+    session: Any = None,
+) -> None:
+    kwargs = {"session": session} if session is not None else {}
+    short_id = metadata["shortId"]
+    try:
+        history.insert_one(dict(version), **kwargs)
+    except errors.DuplicateKeyError as exc:
+        raise SpecVersionConflict(short_id, expected_version) from exc
+    if expected_version is None:
+        collection.update_one({"shortId": short_id}, {"$set": metadata}, upsert=True, **kwargs)
+        return
+    result = collection.update_one(
+        {"shortId": short_id, "version": expected_version}, {"$set": metadata}, **kwargs
+    )
+    if result.matched_count:
+        return
+    if collection.find_one({"shortId": short_id}, **kwargs) is None:
+        # Specs seeded from the bundled data file have no metadata document yet; the version insert above
+        # already serialized concurrent writers, so the first persisted write can simply create it.
+        collection.update_one({"shortId": short_id}, {"$set": metadata}, upsert=True, **kwargs)
+        return
+    if session is None:
+        history.delete_one({"shortId": short_id, "version": version["version"]})
+    raise SpecVersionConflict(short_id, expected_version)
+
+
+def save_spec_with_version(
+    metadata: Dict[str, Any],
+    version: Dict[str, Any],
+    expected_version: Optional[int] = None,
+) -> None:
+    """Persist a spec's metadata and its new version as one unit, compare-and-set on the version.
+
+    ``expected_version`` is the version the write was based on (``None`` for a new spec).
+    The version document is inserted, so the unique ``(shortId, version)`` index rejects a
+    second writer of the same version, and the metadata only moves if it is still at
+    ``expected_version``; either failure raises :class:`SpecVersionConflict`.
+
+    On a replica set or sharded cluster both writes run in a single transaction. A
+    standalone server cannot do that, so the version is written first and removed again
+    if the metadata check fails; metadata never points at a missing version. The
+    in-memory fallback applies both under one lock.
+    """
+
+    history = get_history_collection()
+    collection = get_spec_collection()
+    if isinstance(collection, _InMemorySpecCollection):
+        with _memory_write_lock, _guard():
+            _write_spec_version(history, collection, metadata, version, expected_version)
+        return
+    if _supports_transactions():
+        with _guard(), _client.start_session() as session:  # type: ignore[union-attr]
+            session.with_transaction(
+                lambda s: _write_spec_version(history, collection, metadata, version, expected_version, s)
+            )
+        return
+    with _guard():
+        _write_spec_version(history, collection, metadata, version, expected_version)
+
+
+def find_spec_document(short_id: str) -> Optional[Dict[str, Any]]:
+    collection = get_spec_collection()
+    with _guard():
+        document = collection.find_one({"shortId": short_id})  # type: ignore[attr-defined]
+    return dict(document) if document else None
 
 
 def get_history_collection() -> Collection | _InMemorySpecHistoryCollection:
@@ -193,40 +739,85 @@ def get_history_collection() -> Collection | _InMemorySpecHistoryCollection:
 
 def save_spec_version_document(document: Dict[str, Any]) -> None:
     history = get_history_collection()
-    history.update_one(
-        {"shortId": document["shortId"], "version": document["version"]},
-        {"$set": document},
-        upsert=True,
-    )
+    with _guard():
+        history.update_one(
+            {"shortId": document["shortId"], "version": document["version"]},
+            {"$set": document},
+            upsert=True,
+        )
 
 
 def list_spec_documents() -> List[Dict[str, Any]]:
     collection = get_spec_collection()
     try:
-        cursor = collection.find({})  # type: ignore[attr-defined]
+        with _guard():
+            return [dict(doc) for doc in collection.find({})]  # type: ignore[attr-defined]
     except AttributeError:
         logging.warning("Mongo collection does not support find(); returning empty list")
         return []
-    return [dict(doc) for doc in cursor]
 
 
 def list_spec_version_documents(short_id: str) -> List[Dict[str, Any]]:
     history = get_history_collection()
     try:
-        cursor = history.find({"shortId": short_id})  # type: ignore[attr-defined]
+        with _guard():
+            return [dict(doc) for doc in history.find({"shortId": short_id})]  # type: ignore[attr-defined]
     except AttributeError:
         logging.warning("History collection does not support find(); returning empty list")
         return []
-    return [dict(doc) for doc in cursor]
+
+
+def iter_spec_version_documents(short_ids: Sequence[str], batch_size: int = 100) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the version documents of ``short_ids`` one ``$in`` batch at a time.
+
+    Each yielded list holds every version of up to ``batch_size`` specs, so callers
+    never hold more than one batch of bodies in memory.
+    """
+
+    history = get_history_collection()
+    for start in range(0, len(short_ids), batch_size):
+        chunk = list(short_ids[start : start + batch_size])
+        with _guard():
+            documents = [dict(doc) for doc in history.find({"shortId": {"$in": chunk}})]  # type: ignore[attr-defined]
+        yield documents
+
+
+def find_spec_version_documents(pairs: Sequence[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    """Fetch specific (shortId, version) documents with a single ``$in`` query."""
+
+    if not pairs:
+        return []
+    history = get_history_collection()
+    wanted = {(short_id, int(version)) for short_id, version in pairs}
+    query = {
+        "shortId": {"$in": sorted({short_id for short_id, _ in wanted})},
+        "version": {"$in": sorted({version for _, version in wanted})},
+    }
+    with _guard():
+        documents = [dict(doc) for doc in history.find(query)]  # type: ignore[attr-defined]
+    # The two $in lists form a cross product; keep only the pairs that were asked for.
+    return [doc for doc in documents if (doc.get("shortId"), int(doc.get("version", 0))) in wanted]
+
+
+def list_spec_history_documents(short_ids: Sequence[str]) -> List[Dict[str, Any]]:
+    """Version metadata (without bodies) for every spec in ``short_ids`` in one query."""
+
+    if not short_ids:
+        return []
+    history = get_history_collection()
+    with _guard():
+        cursor = history.find({"shortId": {"$in": list(short_ids)}}, {"contentMd": 0})  # type: ignore[attr-defined]
+        return [dict(doc) for doc in cursor]
 
 
 def find_latest_spec_version_document(short_id: str) -> Optional[Dict[str, Any]]:
     history = get_history_collection()
     try:
-        cursor = history.find({"shortId": short_id}).sort("version", -1).limit(1)  # type: ignore[attr-defined]
-        for doc in cursor:
-            return dict(doc)
-        return None
+        with _guard():
+            cursor = history.find({"shortId": short_id}).sort("version", -1).limit(1)  # type: ignore[attr-defined]
+            for doc in cursor:
+                return dict(doc)
+            return None
     except AttributeError:
         documents = list_spec_version_documents(short_id)
         if not documents:
@@ -238,7 +829,8 @@ def find_latest_spec_version_document(short_id: str) -> Optional[Dict[str, Any]]
 def find_spec_version_document(short_id: str, version: int) -> Optional[Dict[str, Any]]:
     history = get_history_collection()
     try:
-        document = history.find_one({"shortId": short_id, "version": version})  # type: ignore[attr-defined]
+        with _guard():
+            document = history.find_one({"shortId": short_id, "version": version})  # type: ignore[attr-defined]
     except AttributeError:
         logging.warning("History collection does not support find_one(); returning None")
         return None
@@ -248,7 +840,8 @@ def find_spec_version_document(short_id: str, version: int) -> Optional[Dict[str
 def delete_spec_document(short_id: str) -> None:
     collection = get_spec_collection()
     try:
-        collection.delete_one({"shortId": short_id})  # type: ignore[attr-defined]
+        with _guard():
+            collection.delete_one({"shortId": short_id})  # type: ignore[attr-defined]
     except AttributeError:
         logging.warning("Mongo collection does not support delete_one(); skipping delete")
 
@@ -256,11 +849,38 @@ def delete_spec_document(short_id: str) -> None:
 def delete_spec_versions(short_id: str) -> None:
     history = get_history_collection()
     try:
-        history.delete_many({"shortId": short_id})  # type: ignore[attr-defined]
+        with _guard():
+            history.delete_many({"shortId": short_id})  # type: ignore[attr-defined]
     except AttributeError:
         logging.warning("History collection does not support delete_many(); skipping delete")
 
 
+def _delete_spec_through_version(history: Any, collection: Any, short_id: str, version: int) -> bool:
+    bound = {"$lte": version}
+    result = collection.delete_one({"shortId": short_id, "version": bound})
+    if not result.deleted_count and collection.find_one({"shortId": short_id}) is not None:
+        return False
+    history.delete_many({"shortId": short_id, "version": bound})
+    return True
+
+
+def delete_spec_through_version(short_id: str, version: int) -> bool:
+    """Delete a spec unless it has moved past ``version``; returns whether it was deleted.
+
+    The metadata delete is conditioned on the version, so a delete queued before another
+    process saved a newer version leaves that version in place. History is only trimmed
+    up to ``version``, and only once the metadata is gone (or was never persisted).
+    """
+
+    history = get_history_collection()
+    collection = get_spec_collection()
+    if isinstance(collection, _InMemorySpecCollection):
+        with _memory_write_lock, _guard():
+            return _delete_spec_through_version(history, collection, short_id, version)
+    with _guard():
+        return _delete_spec_through_version(history, collection, short_id, version)
+
+
 def create_user_document(username: str, password_hash: str) -> Dict[str, Any]:
     collection = get_user_collection()
     now = datetime.now(timezone.utc)
@@ -270,7 +890,8 @@ def create_user_document(username: str, password_hash: str) -> Dict[str, Any]:
         "createdAt": now,
         "updatedAt": now,
     }
-    result = collection.insert_one(document)  # type: ignore[attr-defined]
+    with _guard():
+        result = collection.insert_one(document)  # type: ignore[attr-defined]
     inserted_id = getattr(result, "inserted_id", None)
     if inserted_id is None:
         inserted_id = document.get("_id") or ObjectId()
@@ -284,7 +905,8 @@ def create_user_document(username: str, password_hash: str) -> Dict[str, Any]:
 
 def find_user_document_by_username(username: str) -> Optional[Dict[str, Any]]:
     collection = get_user_collection()
-    document = collection.find_one({"username": username})  # type: ignore[attr-defined]
+    with _guard():
+        document = collection.find_one({"username": username})  # type: ignore[attr-defined]
     if not document:
         return None
     return _normalize_user_document(document)
@@ -297,10 +919,11 @@ def find_user_document_by_id(user_id: str) -> Optional[Dict[str, Any]]:
         object_id = ObjectId(user_id)
     except (InvalidId, TypeError):
         object_id = None
-    if object_id is not None:
-        document = collection.find_one({"_id": object_id})  # type: ignore[attr-defined]
-    if document is None:
-        document = collection.find_one({"_id": user_id})  # type: ignore[attr-defined]
+    with _guard():
+        if object_id is not None:
+            document = collection.find_one({"_id": object_id})  # type: ignore[attr-defined]
+        if document is None:
+            document = collection.find_one({"_id": user_id})  # type: ignore[attr-defined]
     if not document:
         return None
     return _normalize_user_document(document)
@@ -313,6 +936,19 @@ def update_user_timestamp(user_id: str) -> None:
         object_id = ObjectId(user_id)
     except (InvalidId, TypeError):
         object_id = user_id
-    collection.update_one({"_id": object_id}, {"$set": {"updatedAt": now}})  # type: ignore[attr-defined]
+    with _guard():
+        collection.update_one({"_id": object_id}, {"$set": {"updatedAt": now}})  # type: ignore[attr-defined]
 
 
+def update_user_password_hash(user_id: str, password_hash: str) -> None:
+    collection = get_user_collection()
+    now = datetime.now(timezone.utc)
+    try:
+        object_id = ObjectId(user_id)
+    except (InvalidId, TypeError):
+        object_id = user_id
+    with _guard():
+        collection.update_one(  # type: ignore[attr-defined]
+            {"_id": object_id},
+            {"$set": {"passwordHash": password_hash, "updatedAt": now}},
+        )
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from pymongo import monitoring
+
+from ai_infra_backend.config import settings
+from ai_infra_backend.metrics import (
+    MONGO_COMMAND_DURATION,
+    MONGO_POOL_CHECKED_OUT,
+    MONGO_POOL_CHECKOUT,
+    MONGO_POOL_CHECKOUT_FAILED,
+    MONGO_POOL_CLEARED,
+    MONGO_POOL_MAX_SIZE,
+    MONGO_POOL_OPEN,
+)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Feeds pymongo CMAP events into the pool checkout/saturation metrics."""
+
+    def __init__(self) -> None:
+        # Checkout started/finished events are published on the requesting thread.
+        self._checkout = threading.local()
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        max_pool_size = event.options.get("maxPoolSize")
+        if max_pool_size:
+            MONGO_POOL_MAX_SIZE.set(max_pool_size)
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        MONGO_POOL_CLEARED.inc()
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        MONGO_POOL_OPEN.inc()
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        MONGO_POOL_OPEN.dec()
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        self._checkout.started_at = time.perf_counter()
+
+    def _observe_checkout(self) -> None:
+        started_at = getattr(self._checkout, "started_at", None)
+        if started_at is not None:
+            MONGO_POOL_CHECKOUT.observe(time.perf_counter() - started_at)
+            self._checkout.started_at = None
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        self._observe_checkout()
+        MONGO_POOL_CHECKOUT_FAILED.labels(str(event.reason)).inc()
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        self._observe_checkout()
+        MONGO_POOL_CHECKED_OUT.inc()
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        MONGO_POOL_CHECKED_OUT.dec()
+
+
+@dataclass
+class CommandTally:
+    """Mongo commands issued while a tally is active (one per request, or around a test block)."""
+
+    trace_id: str = ""
+    count: int = 0
+    duration: float = 0.0
+    by_command: Counter = field(default_factory=Counter)
+    parent: Optional["CommandTally"] = None
+
+
+_current_tally: ContextVar[Optional[CommandTally]] = ContextVar("mongo_command_tally", default=None)
+
+
+def begin_command_tally(trace_id: str = "") -> Tuple[CommandTally, Token]:
+    tally = CommandTally(trace_id=trace_id, parent=_current_tally.get())
+    return tally, _current_tally.set(tally)
+
+
+def end_command_tally(token: Token) -> None:
+    _current_tally.reset(token)
+
+
+@contextmanager
+def command_tally(trace_id: str = "") -> Iterator[CommandTally]:
+    """Count commands issued in this context; nested tallies also count towards their parents."""
+
+    tally, token = begin_command_tally(trace_id)
+    try:
+        yield tally
+    finally:
+        end_command_tally(token)
+
+
+def current_trace_id() -> str:
+    tally = _current_tally.get()
+    while tally is not None:
+        if tally.trace_id:
+            return tally.trace_id
+        tally = tally.parent
+    return ""
+
+
+def record_command(name: str, duration: float, detail: str = "") -> None:
+    tally = _current_tally.get()
+    while tally is not None:
+        tally.count += 1
+        tally.duration += duration
+        tally.by_command[name] += 1
+        tally = tally.parent
+    if settings.mongo_slow_command_ms and duration * 1000 >= settings.mongo_slow_command_ms:
+        logging.warning(
+            "Slow MongoDB command %s%s took %.1fms trace=%s",
+            name,
+            f" on {detail}" if detail else "",
+            duration * 1000,
+            current_trace_id() or "-",
+        )
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Records per-command round-trip time and feeds the per-request tally / slow-command log."""
+
+    def __init__(self) -> None:
+        self._targets: Dict[Tuple[int, Any], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        target = event.command.get(event.command_name)
+        if isinstance(target, str):
+            self._targets[(event.request_id, event.connection_id)] = f"{event.database_name}.{target}"
+
+    def _finish(self, event: Any, outcome: str) -> None:
+        duration = event.duration_micros / 1_000_000
+        MONGO_COMMAND_DURATION.labels(event.command_name, outcome).observe(duration)
+        detail = self._targets.pop((event.request_id, event.connection_id), "")
+        record_command(event.command_name, duration, detail)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, "success")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, "failure")
+
+
+def client_options(config: Any) -> Dict[str, Any]:
+    """MongoClient keyword arguments derived from ``Settings`` (unset values keep driver defaults)."""
+
+    options: Dict[str, Any] = {
+        "serverSelectionTimeoutMS": config.mongo_server_selection_timeout_ms,
+        "maxPoolSize": config.mongo_max_pool_size,
+        "minPoolSize": config.mongo_min_pool_size,
+        "event_listeners": [PoolMetricsListener(), CommandMetricsListener()],
+    }
+    if config.mongo_max_idle_time_ms > 0:
+        options["maxIdleTimeMS"] = config.mongo_max_idle_time_ms
+    if config.mongo_wait_queue_timeout_ms > 0:
+        options["waitQueueTimeoutMS"] = config.mongo_wait_queue_timeout_ms
+    compressors = [name.strip() for name in config.mongo_compressors.split(",") if name.strip()]
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+import fcntl
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from itertools import count
+from pathlib import Path
+from typing import IO, Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from bson import json_util
+from pymongo import errors as pymongo_errors
+
+from ai_infra_backend.config import settings
+from ai_infra_backend.metrics import OUTBOX_DEAD_LETTERS, OUTBOX_DEPTH, OUTBOX_FLUSHED, OUTBOX_FLUSH_FAILURES
+from ai_infra_backend.mongo import (
+    bulk_save_spec_versions,
+    delete_spec_document,
+    delete_spec_through_version,
+    delete_spec_versions,
+)
+
+# Applied entries left at the head of the log before it is rewritten with only the pending ones.
+COMPACT_AFTER = 1000
+SLOT_FILE = re.compile(r"outbox-\d+\.jsonl")
+
+
+def expected_version(entry: Dict[str, Any]) -> Optional[int]:
+    """Version a queued save was built on; writers always save the next version (``None`` for a new spec)."""
+
+    return entry["version"]["version"] - 1 or None
+
+
+class SpecOutbox:
+    """Durable write-behind queue for spec writes.
+
+    Each entry is appended as one JSON line and fsync'ed before the write is
+    acknowledged; a background thread applies pending entries to MongoDB in order,
+    batching consecutive saves into one compare-and-set bulk write and backing off
+    while Mongo is unreachable. The last applied sequence number lives in a sidecar
+    file, so a restarted process replays exactly what was never flushed.
+
+    Every process claims its own ``outbox-<n>.jsonl`` through an exclusive ``flock``;
+    a worker that is restarted picks up the slot (and the backlog) its predecessor left,
+    and on startup any other slot file nobody holds (e.g. after the worker count went
+    down) is adopted into the claimed one. Saves that lost a version race, deletes of a
+    spec that has since moved past the deleted version, and saves MongoDB rejects for good
+    are moved to ``outbox-<n>.dead`` instead of blocking the queue.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        batch_size: int = 100,
+        interval: float = 0.5,
+        max_backoff: float = 30.0,
+        fsync: bool = True,
+    ) -> None:
+        self.directory = directory
+        self.batch_size = max(batch_size, 1)
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.fsync = fsync
+        # Held by writers across "check version, append, apply to repository" so they stay ordered.
+        self.lock = threading.RLock()
+        # Called with dead-lettered entries, e.g. to re-read the specs they would have written.
+        self.on_dead_letter: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._file: Optional[IO[bytes]] = None
+        self._path: Optional[Path] = None
+        self._seq = count(1)
+        self._applied_seq = 0
+        self._applied_in_log = 0
+        self._dead_letters = 0
+        self._failures = 0
+        self._retry_at = 0.0
+        self._last_flush_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def path(self) -> Optional[Path]:
+        return self._path
+
+    def open(self) -> List[Dict[str, Any]]:
+        """Claim an outbox file and return the entries that were never flushed, oldest first."""
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for slot in count():
+            path = self.directory / f"outbox-{slot}.jsonl"
+            handle = open(path, "a+b")
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                continue
+            self._file, self._path = handle, path
+            break
+        self._applied_seq = _read_offset(self._path)  # type: ignore[arg-type]
+        interrupted = _compact_path(self._path).exists()  # type: ignore[arg-type]
+        entries = _read_entries(self._path)  # type: ignore[arg-type]
+        last_seq = max([self._applied_seq, *(entry["seq"] for entry in entries)])
+        for entry in entries:
+            if entry["seq"] > self._applied_seq:
+                self._pending.append(entry)
+            else:
+                self._applied_in_log += 1
+        self._seq = count(last_seq + 1)
+        with self.lock:
+            if interrupted:
+                self._compact()
+            self._adopt_orphans()
+        OUTBOX_DEPTH.set(len(self._pending))
+        if self._pending:
+            logging.warning("Replaying %d unflushed spec writes from %s", len(self._pending), self._path)
+        return list(self._pending)
+
+    def _adopt_orphans(self) -> None:
+        """Move the backlog of every slot file no running process holds into this one."""
+
+        for path in sorted(self.directory.iterdir()):
+            if path == self._path or not SLOT_FILE.fullmatch(path.name):
+                continue
+            handle = open(path, "a+b")
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                continue
+            with handle:
+                applied = _read_offset(path)
+                adopted = [entry for entry in _read_entries(path) if entry["seq"] > applied]
+                for entry in adopted:
+                    self._write(dict(entry, seq=next(self._seq)))
+                self._sync()
+                # Our copies are durable now; a crash before this truncate only means a harmless replay twice.
+                handle.truncate(0)
+                _compact_path(path).unlink(missing_ok=True)
+            if adopted:
+                logging.warning("Adopted %d unflushed spec writes from %s", len(adopted), path)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        self._file.write(json_util.dumps(entry).encode("utf-8") + b"\n")  # type: ignore[union-attr]
+        self._pending.append(entry)
+
+    def _sync(self) -> None:
+        self._file.flush()  # type: ignore[union-attr]
+        if self.fsync:
+            os.fsync(self._file.fileno())  # type: ignore[union-attr]
+
+    def _compact(self) -> None:
+        """Rewrite the log with only the pending entries; the caller holds ``lock``.
+
+        The pending entries are first written to a side file, so a crash while the log is
+        being rewritten loses nothing: :meth:`open` reads both and drops the duplicates.
+        """
+
+        data = b"".join(json_util.dumps(entry).encode("utf-8") + b"\n" for entry in self._pending)
+        side = _compact_path(self._path)  # type: ignore[arg-type]
+        with open(side, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+        self._file.truncate(0)  # type: ignore[union-attr]
+        self._file.write(data)  # type: ignore[union-attr]
+        self._sync()
+        side.unlink()
+        self._applied_in_log = 0
+
+    def append(self, op: str, short_id: str, **documents: Any) -> Dict[str, Any]:
+        entry = {"seq": 0, "op": op, "shortId": short_id, "enqueuedAt": time.time(), **documents}
+        with self.lock:
+            entry["seq"] = next(self._seq)
+            self._write(entry)
+            self._sync()
+            OUTBOX_DEPTH.set(len(self._pending))
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+        return entry
+
+    def save(self, metadata: Dict[str, Any], version: Dict[str, Any]) -> Dict[str, Any]:
+        return self.append("save", metadata["shortId"], metadata=metadata, version=version)
+
+    def save_many(self, documents: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+        """Append several saves with one fsync, e.g. an import batch."""
+
+        enqueued_at = time.time()
+        with self.lock:
+            for metadata, version in documents:
+                self._write(
+                    {
+                        "seq": next(self._seq),
+                        "op": "save",
+                        "shortId": metadata["shortId"],
+                        "enqueuedAt": enqueued_at,
+                        "metadata": metadata,
+                        "version": version,
+                    }
+                )
+            self._sync()
+            OUTBOX_DEPTH.set(len(self._pending))
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def delete(self, short_id: str, version: Optional[int] = None) -> Dict[str, Any]:
+        if version is None:
+            return self.append("delete", short_id)
+        return self.append("delete", short_id, deletedVersion=version)
+
+    def pending(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return list(self._pending)
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            if not self._pending:
+                return []
+            first = self._pending[0]
+            if first["op"] != "save":
+                return [first]
+            batch: List[Dict[str, Any]] = []
+            for entry in self._pending:
+                if entry["op"] != "save" or len(batch) >= self.batch_size:
+                    break
+                batch.append(entry)
+            return batch
+
+    def _save(self, batch: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], str]]:
+        """Compare-and-set the batch; returns the entries to dead-letter with the reason."""
+
+        items = [(entry["metadata"], entry["version"], expected_version(entry)) for entry in batch]
+        try:
+            conflicts = bulk_save_spec_versions(items)
+        except pymongo_errors.BulkWriteError:
+            # Some document is rejected for good (validation, size, ...); retrying the batch would block the
+            # queue forever, so find it one entry at a time. Entries already written count as applied.
+            rejected: List[Tuple[Dict[str, Any], str]] = []
+            for entry, item in zip(batch, items):
+                try:
+                    if bulk_save_spec_versions([item]):
+                        rejected.append((entry, "version conflict"))
+                except pymongo_errors.BulkWriteError as exc:
+                    rejected.append((entry, str(exc.details.get("writeErrors") or exc)))
+            return rejected
+        return [(batch[index], "version conflict") for index in sorted(conflicts)]
+
+    def _dead_letter(self, rejected: List[Tuple[Dict[str, Any], str]]) -> None:
+        with open(self._path.with_suffix(".dead"), "ab") as handle:  # type: ignore[union-attr]
+            for entry, reason in rejected:
+                handle.write(json_util.dumps({**entry, "error": reason}).encode("utf-8") + b"\n")
+            handle.flush()
+            if self.fsync:
+                os.fsync(handle.fileno())
+        self._dead_letters += len(rejected)
+        OUTBOX_DEAD_LETTERS.inc(len(rejected))
+        logging.error(
+            "Moved %d outbox entries to %s: %s",
+            len(rejected),
+            self._path.with_suffix(".dead"),  # type: ignore[union-attr]
+            "; ".join(f"{entry['shortId']}: {reason}" for entry, reason in rejected),
+        )
+        if self.on_dead_letter is not None:
+            self.on_dead_letter([entry for entry, _ in rejected])
+
+    def flush_once(self) -> int:
+        """Apply the next batch to MongoDB; returns how many entries left the queue."""
+
+        batch = self._next_batch()
+        if not batch:
+            return 0
+        rejected: List[Tuple[Dict[str, Any], str]] = []
+        try:
+            if batch[0]["op"] == "save":
+                rejected = self._save(batch)
+            elif "deletedVersion" not in batch[0]:
+                # Logged before deletes recorded their version.
+                delete_spec_document(batch[0]["shortId"])
+                delete_spec_versions(batch[0]["shortId"])
+            elif not delete_spec_through_version(batch[0]["shortId"], batch[0]["deletedVersion"]):
+                # Another process saved a newer version after this delete was queued; keep it.
+                rejected = [(batch[0], "version conflict")]
+        except pymongo_errors.PyMongoError as exc:
+            self._failures += 1
+            self._last_error = str(exc)
+            backoff = min(self.max_backoff, self.interval * 2 ** self._failures)
+            self._retry_at = time.monotonic() + backoff * random.uniform(0.5, 1.0)
+            OUTBOX_FLUSH_FAILURES.inc()
+            logging.warning("Outbox flush of %d entries failed (attempt %d): %s", len(batch), self._failures, exc)
+            return 0
+        if rejected:
+            self._dead_letter(rejected)
+        with self.lock:
+            for _ in batch:
+                self._pending.popleft()
+            self._applied_seq = batch[-1]["seq"]
+            _write_offset(self._path, self._applied_seq)  # type: ignore[arg-type]
+            self._applied_in_log += len(batch)
+            if not self._pending:
+                # Everything is in MongoDB, so the log can start over; sequence numbers keep counting.
+                self._file.truncate(0)  # type: ignore[union-attr]
+                self._applied_in_log = 0
+            elif self._applied_in_log >= COMPACT_AFTER:
+                # Under steady traffic the queue is rarely empty; drop the applied head anyway.
+                self._compact()
+            OUTBOX_DEPTH.set(len(self._pending))
+        self._failures = 0
+        self._retry_at = 0.0
+        self._last_error = None
+        self._last_flush_at = time.time()
+        OUTBOX_FLUSHED.inc(len(batch) - len(rejected))
+        return len(batch)
+
+    def drain(self) -> int:
+        flushed = 0
+        while True:
+            step = self.flush_once()
+            if not step:
+                return flushed
+            flushed += step
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if time.monotonic() < self._retry_at:
+                continue
+            while self.flush_once():
+                pass
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="spec-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 4)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            oldest = self._pending[0]["enqueuedAt"] if self._pending else None
+            depth = len(self._pending)
+        return {
+            "enabled": True,
+            "path": str(self._path) if self._path else None,
+            "depth": depth,
+            "lagSeconds": round(time.time() - oldest, 3) if oldest is not None else 0.0,
+            "appliedSeq": self._applied_seq,
+            "consecutiveFailures": self._failures,
+            "lastError": self._last_error,
+            "lastFlushAt": self._last_flush_at,
+            "deadLettered": self._dead_letters,
+        }
+
+
+def _offset_path(path: Path) -> Path:
+    return path.with_suffix(".offset")
+
+
+def _compact_path(path: Path) -> Path:
+    return path.with_suffix(".compact")
+
+
+def _read_offset(path: Path) -> int:
+    try:
+        return int(_offset_path(path).read_text().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_offset(path: Path, seq: int) -> None:
+    temporary = _offset_path(path).with_suffix(".offset.tmp")
+    temporary.write_text(str(seq))
+    os.replace(temporary, _offset_path(path))
+
+
+def _read_entries(path: Path) -> List[Dict[str, Any]]:
+    """Entries of a slot's log plus those of an interrupted compaction, by sequence number."""
+
+    entries: Dict[int, Dict[str, Any]] = {}
+    for source in (path, _compact_path(path)):
+        try:
+            handle = open(source, "rb")
+        except FileNotFoundError:
+            continue
+        with handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json_util.loads(line)
+                except ValueError:
+                    # A torn final line means the write was never acknowledged; drop it.
+                    logging.warning("Skipping unreadable outbox entry in %s", source)
+                    continue
+                entries.setdefault(entry["seq"], entry)
+    return [entries[seq] for seq in sorted(entries)]
+
+
+spec_outbox: Optional[SpecOutbox] = None
+if settings.write_behind:
+    spec_outbox = SpecOutbox(
+        Path(settings.outbox_dir),
+        batch_size=settings.outbox_batch_size,
+        interval=settings.outbox_flush_interval,
+        max_backoff=settings.outbox_max_backoff,
+        fsync=settings.outbox_fsync,
+    )
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable
+
+import bcrypt
+
+from ai_infra_backend.config import settings
+from ai_infra_backend.metrics import (
+    AUTH_HASH_DURATION,
+    AUTH_HASH_PENDING,
+    AUTH_HASH_QUEUE_WAIT,
+    AUTH_HASH_REJECTED,
+)
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the bcrypt queue is saturated; the caller should retry later."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated pool so auth bursts can't occupy every request thread.
+
+    At most ``max_workers + queue_limit`` jobs are admitted at once; anything beyond
+    that is rejected immediately with :class:`PasswordHasherBusy`.
+    """
+
+    def __init__(self, rounds: int, max_workers: int, queue_limit: int, timeout: float) -> None:
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="bcrypt")
+        self._admission = threading.BoundedSemaphore(max(max_workers, 1) + max(queue_limit, 0))
+
+    def _release(self, _future: Any) -> None:
+        AUTH_HASH_PENDING.dec()
+        self._admission.release()
+
+    def _run(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        if not self._admission.acquire(blocking=False):
+            AUTH_HASH_REJECTED.labels(operation).inc()
+            raise PasswordHasherBusy(f"bcrypt queue saturated ({operation})")
+        AUTH_HASH_PENDING.inc()
+        enqueued_at = time.perf_counter()
+
+        def job() -> Any:
+            started_at = time.perf_counter()
+            AUTH_HASH_QUEUE_WAIT.labels(operation).observe(started_at - enqueued_at)
+            try:
+                return func(*args)
+            finally:
+                AUTH_HASH_DURATION.labels(operation).observe(time.perf_counter() - started_at)
+
+        try:
+            future = self._executor.submit(job)
+        except RuntimeError:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as exc:
+            # The job keeps its slot until bcrypt returns, so admission still reflects real load.
+            AUTH_HASH_REJECTED.labels(operation).inc()
+            raise PasswordHasherBusy(f"bcrypt {operation} timed out") from exc
+
+    def hash(self, password: str) -> str:
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        hashed = self._run("hash", bcrypt.hashpw, password.encode("utf-8"), salt)
+        return hashed.decode("utf-8")
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        return bool(self._run("verify", bcrypt.checkpw, password.encode("utf-8"), password_hash.encode("utf-8")))
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        parts = password_hash.split("$")
+        if len(parts) < 4:
+            return True
+        try:
+            return int(parts[2]) != self.rounds
+        except ValueError:
+            return True
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.bcrypt_rounds,
+    max_workers=settings.auth_hash_workers,
+    queue_limit=settings.auth_hash_queue_limit,
+    timeout=settings.auth_hash_timeout,
+)
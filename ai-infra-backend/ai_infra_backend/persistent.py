@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from collections.abc import ItemsView, ValuesView
+from itertools import chain
+from typing import Any, Dict, Generic, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+# Average entries per bucket before a map doubles its bucket count.
+BUCKET_LOAD = 32
+# Entries per chunk of a PersistentList; a power of two, so an index splits into chunk and offset with shifts.
+LIST_CHUNK_BITS = 8
+# Sorted lists keep chunks of about this many keys; one that grows past twice the size is split in two.
+SORTED_CHUNK = 256
+
+
+class _Items(ItemsView):
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(bucket.items() for bucket in self._mapping._buckets)
+
+
+class _Values(ValuesView):
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(bucket.values() for bucket in self._mapping._buckets)
+
+
+class PersistentMap(Mapping[K, V]):
+    """Read-only hash map that shares its unchanged buckets with the maps derived from it.
+
+    Keys are spread over a power-of-two number of ``dict`` buckets by ``hash(key)``. A
+    :class:`MapEditor` copies the bucket list and only the buckets it writes to, so a map
+    with a few changes costs a few small dict copies instead of a copy of every entry.
+    """
+
+    __slots__ = ("_buckets", "_mask", "_size")
+
+    def __init__(self, buckets: Optional[List[Dict[K, V]]] = None, size: int = 0) -> None:
+        self._buckets: List[Dict[K, V]] = buckets if buckets is not None else [{}]
+        self._mask = len(self._buckets) - 1
+        self._size = size
+
+    def __getitem__(self, key: K) -> V:
+        return self._buckets[hash(key) & self._mask][key]
+
+    def get(self, key: K, default: Any = None) -> Any:
+        return self._buckets[hash(key) & self._mask].get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._buckets[hash(key) & self._mask]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[K]:
+        return chain.from_iterable(self._buckets)
+
+    def pick(self, keys: Iterable[K]) -> List[V]:
+        """``[self[key] for key in keys]`` without a method call per key."""
+
+        buckets, mask = self._buckets, self._mask
+        return [buckets[hash(key) & mask][key] for key in keys]
+
+    def items(self) -> _Items:  # type: ignore[override]
+        return _Items(self)
+
+    def values(self) -> _Values:  # type: ignore[override]
+        return _Values(self)
+
+    def edit(self) -> "MapEditor[K, V]":
+        return MapEditor(self)
+
+
+class MapEditor(Generic[K, V]):
+    """Pending changes to a :class:`PersistentMap`; :meth:`freeze` returns the changed map."""
+
+    __slots__ = ("_buckets", "_mask", "_size", "_owned")
+
+    def __init__(self, base: PersistentMap[K, V]) -> None:
+        self._buckets = list(base._buckets)
+        self._mask = base._mask
+        self._size = base._size
+        # Buckets copied by this editor, which it may modify in place.
+        self._owned: Set[int] = set()
+
+    def _writable(self, key: K) -> Dict[K, V]:
+        index = hash(key) & self._mask
+        if index not in self._owned:
+            self._buckets[index] = dict(self._buckets[index])
+            self._owned.add(index)
+        return self._buckets[index]
+
+    def __getitem__(self, key: K) -> V:
+        return self._buckets[hash(key) & self._mask][key]
+
+    def get(self, key: K, default: Any = None) -> Any:
+        return self._buckets[hash(key) & self._mask].get(key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._buckets[hash(key) & self._mask]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __setitem__(self, key: K, value: V) -> None:
+        bucket = self._writable(key)
+        if key not in bucket:
+            self._size += 1
+        bucket[key] = value
+        if self._size > len(self._buckets) * BUCKET_LOAD:
+            self._grow()
+
+    def __delitem__(self, key: K) -> None:
+        del self._writable(key)[key]
+        self._size -= 1
+
+    def pop(self, key: K, *default: Any) -> Any:
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+    def _grow(self) -> None:
+        # Rehashes everything, but only when the map has doubled, like a dict resize.
+        mask = len(self._buckets) * 2 - 1
+        buckets: List[Dict[K, V]] = [{} for _ in range(mask + 1)]
+        for bucket in self._buckets:
+            for key, value in bucket.items():
+                buckets[hash(key) & mask][key] = value
+        self._buckets, self._mask = buckets, mask
+        self._owned = set(range(mask + 1))
+
+    def freeze(self) -> PersistentMap[K, V]:
+        frozen = PersistentMap(self._buckets, self._size)
+        # Later edits must not reach into the buckets the frozen map now owns.
+        self._buckets = list(self._buckets)
+        self._owned = set()
+        return frozen
+
+
+class PersistentList(Sequence[V]):
+    """Read-only list of fixed-size chunks, shared with the lists derived from it.
+
+    Only non-negative indexes are supported; :meth:`pick` reads many positions without a
+    method call per element.
+    """
+
+    __slots__ = ("_chunks", "_size")
+
+    def __init__(self, chunks: Optional[List[List[V]]] = None, size: int = 0) -> None:
+        self._chunks: List[List[V]] = chunks if chunks is not None else []
+        self._size = size
+
+    def __getitem__(self, index: int) -> V:  # type: ignore[override]
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        return self._chunks[index >> LIST_CHUNK_BITS][index & ((1 << LIST_CHUNK_BITS) - 1)]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[V]:
+        return chain.from_iterable(self._chunks)
+
+    def pick(self, indexes: Iterable[int]) -> List[V]:
+        chunks, mask = self._chunks, (1 << LIST_CHUNK_BITS) - 1
+        return [chunks[index >> LIST_CHUNK_BITS][index & mask] for index in indexes]
+
+    def edit(self) -> "ListEditor[V]":
+        return ListEditor(self)
+
+
+class ListEditor(Generic[V]):
+    """Pending changes to a :class:`PersistentList`; :meth:`freeze` returns the changed list."""
+
+    __slots__ = ("_chunks", "_size", "_owned")
+
+    def __init__(self, base: PersistentList[V]) -> None:
+        self._chunks = list(base._chunks)
+        self._size = base._size
+        self._owned: Set[int] = set()
+
+    def _writable(self, chunk: int) -> List[V]:
+        if chunk not in self._owned:
+            self._chunks[chunk] = list(self._chunks[chunk])
+            self._owned.add(chunk)
+        return self._chunks[chunk]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int) -> V:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        return self._chunks[index >> LIST_CHUNK_BITS][index & ((1 << LIST_CHUNK_BITS) - 1)]
+
+    def __setitem__(self, index: int, value: V) -> None:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        self._writable(index >> LIST_CHUNK_BITS)[index & ((1 << LIST_CHUNK_BITS) - 1)] = value
+
+    def append(self, value: V) -> None:
+        chunk = self._size >> LIST_CHUNK_BITS
+        if chunk == len(self._chunks):
+            self._chunks.append([value])
+            self._owned.add(chunk)
+        else:
+            self._writable(chunk).append(value)
+        self._size += 1
+
+    def freeze(self) -> PersistentList[V]:
+        frozen = PersistentList(self._chunks, self._size)
+        self._chunks = list(self._chunks)
+        self._owned = set()
+        return frozen
+
+
+class PersistentSortedList(Generic[K]):
+    """Read-only sorted sequence of chunks, shared with the lists derived from it.
+
+    Each chunk is a sorted ``list`` and ``_maxes`` holds every chunk's largest key, so a key
+    is found with two bisects and an insert or delete copies one chunk of about
+    :data:`SORTED_CHUNK` keys plus the two short top-level lists.
+    """
+
+    __slots__ = ("_chunks", "_maxes", "_size")
+
+    def __init__(self, keys: Iterable[K] = ()) -> None:
+        ordered = list(keys)
+        self._chunks: List[List[K]] = [ordered[i : i + SORTED_CHUNK] for i in range(0, len(ordered), SORTED_CHUNK)]
+        self._maxes: List[K] = [chunk[-1] for chunk in self._chunks]
+        self._size = len(ordered)
+
+    @classmethod
+    def _from_chunks(cls, chunks: List[List[K]], maxes: List[K], size: int) -> "PersistentSortedList[K]":
+        instance = cls.__new__(cls)
+        instance._chunks, instance._maxes, instance._size = chunks, maxes, size
+        return instance
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[K]:
+        return chain.from_iterable(self._chunks)
+
+    def __reversed__(self) -> Iterator[K]:
+        for chunk in reversed(self._chunks):
+            yield from reversed(chunk)
+
+    def chunks(self, reverse: bool = False) -> Iterator[Sequence[K]]:
+        """The sorted chunks, for callers that batch work per chunk; they must not be modified."""
+
+        return reversed(self._chunks) if reverse else iter(self._chunks)
+
+    def irange(self, low: K, high: K) -> List[K]:
+        """Keys ``k`` with ``low <= k < high``, ascending."""
+
+        found: List[K] = []
+        chunks = self._chunks
+        index = bisect_left(self._maxes, low)
+        start = bisect_left(chunks[index], low) if index < len(chunks) else 0
+        while index < len(chunks):
+            chunk = chunks[index]
+            stop = bisect_left(chunk, high, start)
+            found.extend(chunk[start:stop])
+            if stop < len(chunk):
+                break
+            index, start = index + 1, 0
+        return found
+
+    def edit(self) -> "SortedListEditor[K]":
+        return SortedListEditor(self)
+
+
+class SortedListEditor(Generic[K]):
+    """Pending inserts and deletes on a :class:`PersistentSortedList`."""
+
+    __slots__ = ("_chunks", "_maxes", "_size", "_owned", "_created")
+
+    def __init__(self, base: PersistentSortedList[K]) -> None:
+        self._chunks = list(base._chunks)
+        self._maxes = list(base._maxes)
+        self._size = base._size
+        # Chunks created by this editor, by identity; they stay referenced from ``_chunks`` or the
+        # list below, so their ids cannot be reused while the editor lives.
+        self._owned: Set[int] = set()
+        self._created: List[List[K]] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[K]:
+        return chain.from_iterable(self._chunks)
+
+    def _own(self, chunk: List[K]) -> List[K]:
+        self._owned.add(id(chunk))
+        self._created.append(chunk)
+        return chunk
+
+    def _writable(self, index: int) -> List[K]:
+        chunk = self._chunks[index]
+        if id(chunk) not in self._owned:
+            chunk = self._chunks[index] = self._own(list(chunk))
+        return chunk
+
+    def add(self, key: K) -> None:
+        if not self._chunks:
+            self._chunks.append(self._own([key]))
+            self._maxes.append(key)
+            self._size = 1
+            return
+        index = min(bisect_left(self._maxes, key), len(self._chunks) - 1)
+        chunk = self._writable(index)
+        insort(chunk, key)
+        self._maxes[index] = chunk[-1]
+        if len(chunk) > 2 * SORTED_CHUNK:
+            tail = self._own(chunk[SORTED_CHUNK:])
+            del chunk[SORTED_CHUNK:]
+            self._chunks.insert(index + 1, tail)
+            self._maxes[index] = chunk[-1]
+            self._maxes.insert(index + 1, tail[-1])
+        self._size += 1
+
+    def update(self, keys: Iterable[K]) -> None:
+        """Add ``keys``; a batch that is large next to the list is merged with one sort instead."""
+
+        keys = list(keys)
+        if len(keys) * 8 <= self._size:
+            for key in keys:
+                self.add(key)
+            return
+        # Two sorted runs, which timsort merges in linear time.
+        merged = PersistentSortedList(sorted(chain(self, sorted(keys))))
+        self._chunks, self._maxes, self._size = merged._chunks, merged._maxes, merged._size
+        self._owned = {id(chunk) for chunk in self._chunks}
+        self._created = list(self._chunks)
+
+    def remove(self, key: K) -> None:
+        index = bisect_left(self._maxes, key)
+        if index == len(self._chunks):
+            raise ValueError(key)
+        position = bisect_left(self._chunks[index], key)
+        if self._chunks[index][position] != key:
+            raise ValueError(key)
+        chunk = self._writable(index)
+        del chunk[position]
+        if chunk:
+            self._maxes[index] = chunk[-1]
+        else:
+            del self._chunks[index]
+            del self._maxes[index]
+        self._size -= 1
+
+    def freeze(self) -> PersistentSortedList[K]:
+        frozen = PersistentSortedList._from_chunks(self._chunks, self._maxes, self._size)
+        self._chunks, self._maxes = list(self._chunks), list(self._maxes)
+        self._owned, self._created = set(), []
+        return frozen
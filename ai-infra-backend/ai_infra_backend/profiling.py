@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import cProfile
+import logging
+import os
+import random
+import threading
+from pathlib import Path
+from typing import Optional
+
+from flask import Request
+
+from ai_infra_backend.config import Settings
+
+# lsprof hooks are process-wide on recent Pythons, so only one request is profiled at a time.
+_active = threading.Lock()
+
+
+def should_profile(request: Request, settings: Settings) -> bool:
+    if request.headers.get("X-Profile") == "1":
+        token = request.headers.get("X-Admin-Token")
+        return bool(token) and token == settings.admin_token
+    if settings.profile_sample_rate <= 0 or request.endpoint not in settings.profile_endpoints:
+        return False
+    return random.random() < settings.profile_sample_rate
+
+
+def start_profile() -> Optional[cProfile.Profile]:
+    if not _active.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as exc:
+        _active.release()
+        logging.warning("Could not start request profiler: %s", exc)
+        return None
+    return profiler
+
+
+def stop_profile(profiler: cProfile.Profile) -> None:
+    try:
+        profiler.disable()
+    finally:
+        _active.release()
+
+
+def write_profile(profiler: cProfile.Profile, directory: Path, name: str, max_files: int) -> Optional[Path]:
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name}.pstats"
+        profiler.dump_stats(str(path))
+        _rotate(directory, max_files)
+    except OSError as exc:
+        logging.warning("Failed to write request profile %s: %s", name, exc)
+        return None
+    return path
+
+
+def _rotate(directory: Path, max_files: int) -> None:
+    profiles = sorted(directory.glob("*.pstats"), key=lambda path: path.stat().st_mtime)
+    for stale in profiles[: max(len(profiles) - max_files, 0)]:
+        try:
+            os.remove(stale)
+        except OSError:  # pragma: no cover - removed concurrently
+            pass
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from ai_infra_backend.models import Spec
+from ai_infra_backend.snapshot import CatalogSnapshot
+
+# Rows scored per matrix product; bounds the temporary score block to BLOCK_ROWS x catalog size floats.
+BLOCK_ROWS = 256
+# Incremental updates reuse the features and IDF of the last rebuild; rebuild once this share of specs changed.
+REBUILD_FRACTION = 0.2
+
+# Same words as the fuzzy search vocabulary, minus single characters.
+TOKEN_PATTERN = re.compile(r"[^\W_]{2,}")
+
+Neighbors = Tuple[Tuple[str, float], ...]
+
+
+def term_counts(spec: Spec) -> Counter:
+    """Token counts of a spec's text; title and tags count twice, they say more than any one sentence of the body."""
+
+    text = "\n".join((spec.title, spec.title, spec.summary, *spec.tags, *spec.tags, spec.contentMd))
+    return Counter(TOKEN_PATTERN.findall(text.casefold()))
+
+
+class RelatedIndex:
+    """Top-k most similar specs per spec, by cosine similarity of TF-IDF vectors.
+
+    A rebuild fits the vocabulary (the ``max_features`` most common terms found in at least two
+    specs and, for catalogs of ten or more, in at most half of them) and the IDF weights, stores
+    the L2-normalized vectors as rows of a float32 matrix and scores all rows against each other
+    in blocks of matrix products. Later changes reuse that vocabulary: changed specs get new rows,
+    and only the rows whose neighbor lists can change are scored again. Once ``REBUILD_FRACTION``
+    of the catalog has changed, the next refresh rebuilds from scratch.
+
+    All of this runs on the background thread (or whoever calls :meth:`refresh`); requests only
+    read the published ``shortId -> neighbors`` dict.
+    """
+
+    def __init__(
+        self,
+        source: Callable[[], CatalogSnapshot],
+        top_k: int = 10,
+        max_features: int = 1024,
+        interval: float = 5.0,
+    ) -> None:
+        self._source = source
+        self.top_k = max(top_k, 1)
+        self.max_features = max(max_features, 1)
+        self.interval = interval
+        # Serializes refreshes; the state below is only touched while holding it.
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._features: Optional[Dict[str, int]] = None
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self._indexed: Dict[str, Spec] = {}
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._live = np.zeros(0, dtype=bool)
+        self._neighbors = np.zeros((0, self.top_k), dtype=np.int32)
+        self._scores = np.zeros((0, self.top_k), dtype=np.float32)
+        self._changes_since_rebuild = 0
+        self._related: Dict[str, Neighbors] = {}
+        self._ready = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def neighbors(self, short_id: str) -> Optional[Neighbors]:
+        """``(shortId, score)`` pairs, most similar first; ``None`` until the first build finished."""
+
+        if not self.ready:
+            return None
+        return self._related.get(short_id, ())
+
+    def mark_changed(self, short_ids: Iterable[str]) -> None:
+        with self._pending_lock:
+            self._pending.update(short_ids)
+
+    def refresh(self) -> None:
+        """Apply pending changes, rebuilding from scratch on first use or after enough drift."""
+
+        with self._lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, set()
+            # Read after taking the pending set, so a write in between is seen here or queued again.
+            snapshot = self._source()
+            threshold = REBUILD_FRACTION * max(len(snapshot), 1)
+            if self._features is None or self._changes_since_rebuild + len(pending) > threshold:
+                self._rebuild(snapshot)
+            elif pending:
+                self._update(snapshot, pending)
+
+    def _fit(self, counts: Sequence[Counter]) -> None:
+        document_frequency: Counter = Counter()
+        for spec_counts in counts:
+            document_frequency.update(spec_counts.keys())
+        total = len(counts)
+        ceiling = total // 2 if total >= 10 else total
+        eligible = [(frequency, term) for term, frequency in document_frequency.items() if 2 <= frequency <= ceiling]
+        chosen = sorted(term for _, term in heapq.nlargest(self.max_features, eligible))
+        self._features = {term: column for column, term in enumerate(chosen)}
+        self._idf = np.array(
+            [math.log((1 + total) / (1 + document_frequency[term])) + 1 for term in chosen], dtype=np.float32
+        )
+
+    def _vectors(self, counts: Sequence[Counter]) -> np.ndarray:
+        features = self._features or {}
+        rows: List[int] = []
+        columns: List[int] = []
+        values: List[int] = []
+        for row, spec_counts in enumerate(counts):
+            for term, count in spec_counts.items():
+                column = features.get(term)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    values.append(count)
+        vectors = np.zeros((len(counts), len(features)), dtype=np.float32)
+        vectors[rows, columns] = 1 + np.log(np.asarray(values, dtype=np.float32))
+        vectors *= self._idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def _rebuild(self, snapshot: CatalogSnapshot) -> None:
+        started = time.perf_counter()
+        specs = list(snapshot.specs.values())
+        counts = [term_counts(spec) for spec in specs]
+        self._fit(counts)
+        self._ids = [spec.shortId for spec in specs]
+        self._rows = {short_id: row for row, short_id in enumerate(self._ids)}
+        self._free_rows = []
+        self._indexed = {spec.shortId: spec for spec in specs}
+        self._matrix = self._vectors(counts)
+        self._live = np.ones(len(specs), dtype=bool)
+        self._neighbors = np.full((len(specs), self.top_k), -1, dtype=np.int32)
+        self._scores = np.full((len(specs), self.top_k), -np.inf, dtype=np.float32)
+        self._changes_since_rebuild = 0
+        related: Dict[str, Neighbors] = {}
+        self._score_rows(np.arange(len(specs)), related)
+        self._related = related
+        self._ready = True
+        logging.info(
+            "Rebuilt related-spec index: %d specs, %d features in %.2fs",
+            len(specs),
+            len(self._features or {}),
+            time.perf_counter() - started,
+        )
+
+    def _allocate(self, short_id: str) -> int:
+        if self._free_rows:
+            row = self._free_rows.pop()
+            self._ids[row] = short_id
+        else:
+            row = len(self._ids)
+            self._ids.append(short_id)
+            if row >= len(self._matrix):
+                self._grow(max(2 * len(self._matrix), 64))
+        self._rows[short_id] = row
+        return row
+
+    def _grow(self, capacity: int) -> None:
+        def grown(array: np.ndarray, fill: float) -> np.ndarray:
+            bigger = np.full((capacity, *array.shape[1:]), fill, dtype=array.dtype)
+            bigger[: len(array)] = array
+            return bigger
+
+        self._matrix = grown(self._matrix, 0)
+        self._live = grown(self._live, False)
+        self._neighbors = grown(self._neighbors, -1)
+        self._scores = grown(self._scores, -np.inf)
+
+    def _update(self, snapshot: CatalogSnapshot, short_ids: Set[str]) -> None:
+        specs = snapshot.specs
+        upserts = [specs[short_id] for short_id in short_ids if short_id in specs]
+        upserts = [spec for spec in upserts if self._indexed.get(spec.shortId) is not spec]
+        removals = [short_id for short_id in short_ids if short_id not in specs and short_id in self._rows]
+        if not upserts and not removals:
+            return
+        related = self._related
+        touched: List[int] = []
+        for short_id in removals:
+            row = self._rows.pop(short_id)
+            self._ids[row] = None
+            self._free_rows.append(row)
+            self._indexed.pop(short_id, None)
+            self._live[row] = False
+            self._matrix[row] = 0
+            self._neighbors[row] = -1
+            self._scores[row] = -np.inf
+            related.pop(short_id, None)
+            touched.append(row)
+        upserted = [
+            self._rows[spec.shortId] if spec.shortId in self._rows else self._allocate(spec.shortId) for spec in upserts
+        ]
+        if upserts:
+            self._matrix[upserted] = self._vectors([term_counts(spec) for spec in upserts])
+            self._live[upserted] = True
+            for spec in upserts:
+                self._indexed[spec.shortId] = spec
+        touched.extend(upserted)
+        count = len(self._ids)
+        live = self._live[:count]
+        # Rows listing a changed spec may lose it, rows it now beats gain it; nobody else is affected.
+        affected = np.isin(self._neighbors[:count], touched).any(axis=1)
+        if upserted:
+            similarity = self._matrix[upserted] @ self._matrix[:count].T
+            affected |= (similarity > np.maximum(self._scores[:count, -1], 0)).any(axis=0)
+            affected[upserted] = True
+        self._score_rows(np.flatnonzero(affected & live), related)
+        self._changes_since_rebuild += len(upserts) + len(removals)
+
+    def _score_rows(self, rows: np.ndarray, related: Dict[str, Neighbors]) -> None:
+        count = len(self._ids)
+        dead = ~self._live[:count]
+        k = min(self.top_k, count - 1)
+        corpus = self._matrix[:count].T
+        for start in range(0, len(rows), BLOCK_ROWS):
+            block = rows[start : start + BLOCK_ROWS]
+            self._neighbors[block] = -1
+            self._scores[block] = -np.inf
+            if k <= 0:
+                for row in block:
+                    related[self._ids[row]] = ()  # type: ignore[index]
+                continue
+            scores = self._matrix[block] @ corpus
+            if dead.any():
+                scores[:, dead] = -np.inf
+            scores[np.arange(len(block)), block] = -np.inf
+            # Partitioning for the k smallest of the negated scores copes far better with the many
+            # tied zeros of unrelated specs than partitioning for the k largest.
+            np.negative(scores, out=scores)
+            top = np.argpartition(scores, k - 1, axis=1)[:, :k]
+            top_scores = -np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            self._neighbors[block, :k] = top
+            self._scores[block, :k] = top_scores
+            for row, columns, values in zip(block, top.tolist(), top_scores.tolist()):
+                # A zero score shares no vocabulary term; that is no relation at all.
+                related[self._ids[row]] = tuple(  # type: ignore[index]
+                    (self._ids[column], round(value, 4))  # type: ignore[misc]
+                    for column, value in zip(columns, values)
+                    if value > 0
+                )
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception:  # pragma: no cover - keep the worker alive
+                logging.exception("Refreshing the related-spec index failed")
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="related-specs", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
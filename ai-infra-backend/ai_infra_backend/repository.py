@@ -1,34 +1,64 @@
 from __future__ import annotations
 
+import hashlib
+import heapq
+import itertools
 import json
 import os
+import threading
+import uuid
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple
 
 import logging
 
 from pymongo import errors as pymongo_errors
 
+from ai_infra_backend.config import settings
+from ai_infra_backend.duplicates import DuplicateIndex
+from ai_infra_backend.fuzzy import DeletionIndex, tokenize
+from ai_infra_backend.metrics import record_cache_lookup, repository_timer
 from ai_infra_backend.models import (
     Category,
+    FacetValue,
+    NearDuplicate,
     PaginatedSpecs,
+    RelatedSpec,
     Spec,
     SpecHistoryItem,
     SpecMetadata,
     SpecSummary,
     SpecVersion,
+    Suggestion,
     Tag,
 )
 from ai_infra_backend.mongo import (
+    add_recovery_listener,
     find_latest_spec_version_document,
+    find_spec_document,
     find_spec_version_document,
+    find_spec_version_documents,
+    iter_spec_version_documents,
     list_spec_documents,
+    list_spec_history_documents,
     list_spec_version_documents,
+    mongo_available,
+)
+from ai_infra_backend.related import RelatedIndex
+from ai_infra_backend.snapshot import (
+    SUGGEST_FIELDS,
+    CatalogSnapshot,
+    author_key,
+    iter_slots,
+    normalize_term,
+    search_terms,
 )
 from ai_infra_backend.utils import derive_short_id, is_valid_short_id, slugify
 
 DATA_DIR = Path(__file__).parent / "data"
+# Facets return the most frequent values only; long-tail authors would otherwise dominate the payload.
+MAX_FACET_VALUES = 50
 
 
 def _resolve_data_path(data_path: Path | None) -> Path:
@@ -41,22 +71,98 @@ def _resolve_data_path(data_path: Path | None) -> Path:
 
 
 class SpecRepository:
+    """In-memory catalog served from an immutable :class:`CatalogSnapshot`.
+
+    Readers take ``self._snapshot`` once and work on it without locking; writers serialize on
+    ``_write_lock``, derive the next snapshot and publish it with one reference assignment.
+    """
+
     def __init__(self, data_path: Path | None = None) -> None:
         self.data_path = _resolve_data_path(data_path)
+        # ETags combine the instance id with the generation, so counters from other workers never collide.
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._generations = itertools.count(1)
+        self._write_lock = threading.Lock()
+        self._snapshot = CatalogSnapshot()
+        # Typo candidates for the snapshot vocabulary; shared across snapshots, see DeletionIndex.
+        self._fuzzy = DeletionIndex()
+        # Precomputed "related specs"; fed the shortIds of every write, refreshed off the request path.
+        self.related = RelatedIndex(
+            self.snapshot,
+            top_k=settings.related_top_k,
+            max_features=settings.related_max_features,
+            interval=settings.related_refresh_interval,
+        )
+        # MinHash LSH over contentMd, kept in step with every write for the upload duplicate check.
+        self.duplicates = DuplicateIndex()
+        self._bootstrap_cache: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+        # shortId -> (spec, UTF-8 body, strong ETag); reused while that exact Spec object is the latest.
+        self._encoded: Dict[str, Tuple[Spec, bytes, str]] = {}
         self._load()
 
+    def snapshot(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    @property
+    def specs(self) -> Mapping[str, Spec]:
+        return self._snapshot.specs
+
+    @property
+    def metadata(self) -> Mapping[str, SpecMetadata]:
+        return self._snapshot.metadata
+
+    @property
+    def generation(self) -> int:
+        """Changes on every published write; anything keyed on it is stale afterwards."""
+
+        return self._snapshot.generation
+
+    def _publish(
+        self,
+        upserts: Iterable[Tuple[Spec, SpecMetadata]] = (),
+        removals: Iterable[str] = (),
+    ) -> CatalogSnapshot:
+        with self._write_lock:
+            return self._replace(upserts, removals)
+
+    def _replace(
+        self,
+        upserts: Iterable[Tuple[Spec, SpecMetadata]] = (),
+        removals: Iterable[str] = (),
+    ) -> CatalogSnapshot:
+        """Derive and publish the next snapshot; the caller holds ``_write_lock``."""
+
+        upserts, removals = list(upserts), list(removals)
+        previous = self._snapshot
+        snapshot = previous.replace(next(self._generations), upserts, removals)
+        # Only words of the specs touched by this write can enter or leave the vocabulary.
+        touched = set()
+        for short_id in itertools.chain((spec.shortId for spec, _ in upserts), removals):
+            old = previous.specs.get(short_id)
+            if old is not None:
+                touched.update(search_terms(old))
+        for spec, _ in upserts:
+            touched.update(search_terms(spec))
+        vocabulary = snapshot.vocabulary
+        # New words are indexed before readers can see them, dropped ones only after.
+        self._fuzzy.update(added=[word for word in touched if word in vocabulary])
+        self._snapshot = snapshot
+        self._fuzzy.update(removed=[word for word in touched if word not in vocabulary])
+        self.related.mark_changed(itertools.chain((spec.shortId for spec, _ in upserts), removals))
+        self.duplicates.update(((spec.shortId, spec.contentMd) for spec, _ in upserts), removals)
+        return snapshot
+
     def _load(self) -> None:
-        self.specs: Dict[str, Spec] = {}
-        self.metadata: Dict[str, SpecMetadata] = {}
+        upserts: List[Tuple[Spec, SpecMetadata]] = []
         if self.data_path.exists():
             with open(self.data_path, "r", encoding="utf-8") as f:
                 raw_specs = json.load(f)
             for raw in raw_specs:
                 spec = self._spec_from_raw(raw)
-                self.specs[spec.shortId] = spec
-                self.metadata[spec.shortId] = self._metadata_from_spec(spec)
+                upserts.append((spec, self._metadata_from_spec(spec)))
         else:
             logging.info("Spec data file %s not found; loading from MongoDB only", self.data_path)
+        self._publish(upserts)
         self._merge_from_mongo()
 
     def _ensure_timezone(self, value: Any) -> datetime:
@@ -161,6 +267,7 @@ class SpecRepository:
             tags=list(normalized["tags"]),
             author=normalized["author"],
             contentMd=normalized["contentMd"],
+            contentHash=normalized.get("contentHash"),
             createdAt=normalized["createdAt"],
             updatedAt=normalized["updatedAt"],
         )
@@ -178,6 +285,7 @@ class SpecRepository:
             updatedAt=version.updatedAt,
             version=version.version,
             contentMd=version.contentMd,
+            contentHash=version.contentHash,
         )
 
     def _spec_from_raw(self, raw: Dict[str, Any]) -> Spec:
@@ -186,29 +294,38 @@ class SpecRepository:
         return self._combine_metadata_and_version(metadata, version)
 
     def _history_item_from_raw(self, raw: Dict[str, Any]) -> SpecHistoryItem:
-        version = self._spec_version_from_raw(raw)
+        # History rows never need the body, so this also accepts documents projected without contentMd.
+        normalized = self._normalize_metadata_fields(raw)
         return SpecHistoryItem(
-            shortId=version.shortId,
-            version=version.version,
-            title=version.title,
-            summary=version.summary,
-            author=version.author,
-            updatedAt=version.updatedAt,
+            shortId=normalized["shortId"],
+            version=normalized["version"],
+            title=normalized["title"],
+            summary=normalized["summary"],
+            author=normalized["author"],
+            updatedAt=normalized["updatedAt"],
         )
 
     def _merge_from_mongo(self) -> None:
+        if not mongo_available():
+            logging.warning("MongoDB unavailable; serving specs from local data until it recovers")
+            return
         try:
             documents = list_spec_documents()
         except pymongo_errors.PyMongoError as exc:
             logging.warning("Failed to load specs from MongoDB: %s", exc)
             return
+        upserts: List[Tuple[Spec, SpecMetadata]] = []
         for document in documents:
             try:
                 metadata = self._metadata_from_raw(document)
             except Exception as exc:  # pragma: no cover - defensive
                 logging.warning("Skipping invalid spec metadata from MongoDB: %s", exc)
                 continue
-            version_document = find_latest_spec_version_document(metadata.shortId)
+            try:
+                version_document = find_latest_spec_version_document(metadata.shortId)
+            except pymongo_errors.PyMongoError as exc:
+                logging.warning("Stopped loading specs from MongoDB: %s", exc)
+                break
             if not version_document:
                 logging.warning("Missing version document for spec %s", metadata.shortId)
                 continue
@@ -217,9 +334,8 @@ class SpecRepository:
             except Exception as exc:  # pragma: no cover - defensive
                 logging.warning("Skipping invalid spec version from MongoDB: %s", exc)
                 continue
-            spec = self._combine_metadata_and_version(metadata, version)
-            self.metadata[spec.shortId] = metadata
-            self.specs[spec.shortId] = spec
+            upserts.append((self._combine_metadata_and_version(metadata, version), metadata))
+        self._publish(upserts)
 
     def list_specs(
         self,
@@ -231,67 +347,188 @@ class SpecRepository:
         search: str | None = None,
         author: str | None = None,
         updated_since: datetime | None = None,
+        facets: Sequence[str] = (),
+        fuzzy: bool = False,
     ) -> PaginatedSpecs:
-        items = list(self.specs.values())
-        if tag:
-            items = [spec for spec in items if tag in spec.tags]
-        if category:
-            items = [spec for spec in items if spec.category == category]
-        if author:
-            normalized_query = author.strip().lstrip("@").lower()
-            if normalized_query:
-                filtered: List[Spec] = []
-                for spec in items:
-                    raw_author = (spec.author or "").strip()
-                    if not raw_author:
-                        continue
-                    candidates = {raw_author.lower()}
-                    stripped = raw_author.lstrip("@")
-                    if stripped:
-                        candidates.add(stripped.lower())
-                    if normalized_query in candidates:
-                        filtered.append(spec)
-                items = filtered
-        if search:
-            lowered = search.lower()
-            items = [
-                spec
-                for spec in items
-                if lowered in spec.title.lower()
-                or lowered in spec.summary.lower()
-                or any(lowered in tag.lower() for tag in spec.tags)
-            ]
-        if updated_since:
-            items = [spec for spec in items if spec.updatedAt >= updated_since]
+        """One page of specs; with ``fuzzy`` the search also matches words within a typo or two of the query's."""
+
+        operation = ("fuzzy_search" if fuzzy else "search") if search else "list"
+        with repository_timer(operation):
+            return self._list_specs(
+                page, page_size, tag, category, order, search, author, updated_since, facets, fuzzy
+            )
+
+    def _list_specs(
+        self,
+        page: int,
+        page_size: int,
+        tag: str | None,
+        category: str | None,
+        order: str,
+        search: str | None,
+        author: str | None,
+        updated_since: datetime | None,
+        facets: Sequence[str],
+        fuzzy: bool,
+    ) -> PaginatedSpecs:
+        snapshot = self._snapshot
         reverse = order.startswith("-")
-        key = order.lstrip("-")
-        if key == "updatedAt":
-            items.sort(key=lambda s: s.updatedAt, reverse=reverse)
+        newest_first = reverse and order.lstrip("-") == "updatedAt"
         start = (page - 1) * page_size
         end = start + page_size
-        summaries = [SpecSummary(**spec.dict()) for spec in items[start:end]]
+        # Structured filters AND slot bitmaps together; ``None`` stands for the whole catalog.
+        matched: int | None = None
+        for field, value in (("tag", tag), ("category", category), ("author", author_key(author or ""))):
+            if value:
+                bits = snapshot.bits(field, value)
+                matched = bits if matched is None else matched & bits
+        if updated_since:
+            bits = snapshot.updated_since_bits(updated_since)
+            matched = bits if matched is None else matched & bits
+        if not search:
+            if matched is None:
+                total = len(snapshot)
+                if newest_first:
+                    items = snapshot.newest(start, end)
+                else:
+                    items = self._ordered(list(snapshot.specs.values()), order)[start:end]
+            else:
+                total = matched.bit_count()
+                if newest_first:
+                    items = snapshot.page(matched, start, end)
+                else:
+                    items = self._ordered(snapshot.select(matched, newest_first=False), order)[start:end]
+        else:
+            if matched is None:
+                # The snapshot keeps specs ordered newest first, so filtering preserves the default sort order.
+                candidates = list(snapshot.iter_newest() if newest_first else snapshot.specs.values())
+            else:
+                candidates = snapshot.select(matched, newest_first)
+            if fuzzy:
+                found = self._fuzzy_matches(snapshot, search, candidates)
+            else:
+                lowered = search.lower()
+                found = [
+                    spec
+                    for spec in candidates
+                    if lowered in spec.title.lower()
+                    or lowered in spec.summary.lower()
+                    or any(lowered in tag.lower() for tag in spec.tags)
+                ]
+            if facets:
+                matched = snapshot.bits_for(spec.shortId for spec in found)
+            total = len(found)
+            items = self._ordered(found, order)[start:end]
+        summaries = [SpecSummary(**spec.dict()) for spec in items]
         return PaginatedSpecs(
-            total=len(items),
+            total=total,
             page=page,
             pageSize=page_size,
             items=summaries,
+            facets=self._facets(snapshot, facets, matched) if facets else None,
         )
 
+    def _fuzzy_matches(
+        self,
+        snapshot: CatalogSnapshot,
+        search: str,
+        candidates: List[Spec],
+    ) -> List[Spec]:
+        """Candidates matching ``search`` as a substring, or containing a word close to every query word.
+
+        Keeps the candidates' order. Query words are expanded through the deletion index, and the
+        expansions are matched against each spec's whole words (:func:`search_terms`), so ``car``
+        found for ``cat`` does not match inside ``scarce``.
+        """
+
+        needle = search.casefold()
+        expansions = [self._fuzzy.lookup(word, snapshot.vocabulary) for word in dict.fromkeys(tokenize(search))]
+        if not expansions or not all(expansions):
+            # Some query word is not close to anything in the catalog; only the plain substring can match.
+            expansions = []
+        matches: List[Spec] = []
+        for spec in candidates:
+            text = "\n".join((spec.title, spec.summary, *spec.tags)).casefold()
+            if needle in text:
+                matches.append(spec)
+            elif expansions:
+                terms = search_terms(spec)
+                if all(not terms.isdisjoint(words) for words in expansions):
+                    matches.append(spec)
+        return matches
+
+    @staticmethod
+    def _ordered(items: List[Spec], order: str) -> List[Spec]:
+        # Newest-first input is already in order; ascending updatedAt re-sorts catalog-ordered input stably.
+        if order == "updatedAt":
+            items.sort(key=lambda s: s.updatedAt)
+        return items
+
+    @staticmethod
+    def _facets(
+        snapshot: CatalogSnapshot,
+        fields: Sequence[str],
+        matched: int | None,
+    ) -> Dict[str, List[FacetValue]]:
+        """The MAX_FACET_VALUES most frequent values per field, counted over ``matched`` (``None`` = whole catalog)."""
+
+        result: Dict[str, List[FacetValue]] = {}
+        for field in fields:
+            postings = snapshot.postings(field)
+            counts: List[Tuple[int, str]] = []
+            for value, bits in postings.items():
+                count = (bits if matched is None else bits & matched).bit_count()
+                if count:
+                    counts.append((count, value))
+            values: List[FacetValue] = []
+            for count, value in heapq.nsmallest(MAX_FACET_VALUES, counts, key=lambda item: (-item[0], item[1].lower())):
+                if field == "author":
+                    # Bitmaps are keyed case-insensitively; show the name as one of its specs spells it.
+                    value = snapshot.specs[snapshot.slot_id(next(iter_slots(postings[value])))].author.strip()
+                values.append(FacetValue(value=value, count=count))
+            result[field] = values
+        return result
+
     def get_spec(self, short_id: str) -> Spec | None:
         return self.specs.get(short_id)
 
+    def get_spec_bytes(self, short_id: str) -> Tuple[Spec, bytes, str] | None:
+        """Latest body as UTF-8 bytes plus its ETag, encoded on first use and reused until the spec changes."""
+
+        spec = self._snapshot.specs.get(short_id)
+        if spec is None:
+            return None
+        cached = self._encoded.get(short_id)
+        if cached is not None and cached[0] is spec:
+            record_cache_lookup("raw", hit=True)
+            return spec, cached[1], cached[2]
+        record_cache_lookup("raw", hit=False)
+        body = spec.contentMd.encode("utf-8")
+        etag = spec.contentHash or hashlib.sha256(body).hexdigest()
+        self._encoded[short_id] = (spec, body, etag)
+        return spec, body, etag
+
+    @repository_timer("version")
     def get_spec_version(self, short_id: str, version: int) -> Spec | None:
-        latest = self.get_spec(short_id)
+        snapshot = self._snapshot
+        latest = snapshot.specs.get(short_id)
         if latest and latest.version == version:
+            record_cache_lookup("version", hit=True)
             return latest
-        metadata = self.metadata.get(short_id)
+        record_cache_lookup("version", hit=False)
+        metadata = snapshot.metadata.get(short_id)
         if metadata is None and latest is not None:
             metadata = self._metadata_from_spec(latest)
-            self.metadata[short_id] = metadata
         if metadata is None:
             logging.warning("Metadata missing for spec %s", short_id)
             return None
-        document = find_spec_version_document(short_id, version)
+        if not mongo_available():
+            return None
+        try:
+            document = find_spec_version_document(short_id, version)
+        except pymongo_errors.PyMongoError as exc:
+            logging.warning("Failed to load version %s of spec %s: %s", version, short_id, exc)
+            return None
         if not document:
             return None
         try:
@@ -301,31 +538,227 @@ class SpecRepository:
             return None
         return self._combine_metadata_and_version(metadata, version_model)
 
-    def list_categories(self) -> List[Category]:
-        counts: Dict[str, int] = {}
-        for spec in self.specs.values():
-            counts[spec.category] = counts.get(spec.category, 0) + 1
+    @staticmethod
+    def _categories_from_counts(counts: Mapping[str, int]) -> List[Category]:
         categories = [Category(name=key.title(), slug=slugify(key), count=value)
                       for key, value in counts.items()]
         categories.sort(key=lambda c: c.name.lower())
         return categories
 
-    def list_tags(self) -> List[Tag]:
-        counts: Dict[str, int] = {}
-        for spec in self.specs.values():
-            for tag in spec.tags:
-                counts[tag] = counts.get(tag, 0) + 1
+    @staticmethod
+    def _tags_from_counts(counts: Mapping[str, int]) -> List[Tag]:
         tags = [Tag(name=key.title(), slug=slugify(key), count=value)
                 for key, value in counts.items()]
         tags.sort(key=lambda t: t.name.lower())
         return tags
 
+    @repository_timer("categories")
+    def list_categories(self) -> List[Category]:
+        return self._categories_from_counts(self._snapshot.category_counts)
+
+    @repository_timer("tags")
+    def list_tags(self) -> List[Tag]:
+        return self._tags_from_counts(self._snapshot.tag_counts)
+
+    @repository_timer("suggest")
+    def suggest(self, query: str, limit: int = 8) -> List[Suggestion]:
+        """Completions of ``query`` over titles, tags, categories and authors; ``@name`` completes authors only."""
+
+        if query.lstrip().startswith("@"):
+            prefix, fields = author_key(query), ("author",)
+        else:
+            prefix, fields = normalize_term(query), SUGGEST_FIELDS
+            if prefix and query[-1].isspace():
+                # "kube " should complete the next word, not everything starting with "kube".
+                prefix += " "
+        if not prefix:
+            return []
+        return [
+            Suggestion(value=value, field=field, count=count)
+            for field, value, count in self._snapshot.suggest(prefix, limit, fields)
+        ]
+
+    @repository_timer("related")
+    def related_specs(self, short_id: str, limit: int = 10) -> List[RelatedSpec] | None:
+        """Precomputed nearest specs still in the catalog; ``None`` while the index is being built."""
+
+        neighbors = self.related.neighbors(short_id)
+        if neighbors is None:
+            return None
+        specs = self._snapshot.specs
+        related: List[RelatedSpec] = []
+        for neighbor_id, score in neighbors:
+            spec = specs.get(neighbor_id)
+            if spec is not None:
+                related.append(RelatedSpec(**spec.dict(), score=score))
+                if len(related) >= limit:
+                    break
+        return related
+
+    @repository_timer("near_duplicates")
+    def near_duplicates(self, content: str, exclude: str | None = None) -> List[NearDuplicate]:
+        """Specs whose body is at least ``settings.duplicate_threshold`` similar to ``content``, closest first."""
+
+        specs = self._snapshot.specs
+        found: List[NearDuplicate] = []
+        for short_id, similarity in self.duplicates.find(content, settings.duplicate_threshold, exclude=exclude):
+            spec = specs.get(short_id)
+            if spec is not None:
+                found.append(
+                    NearDuplicate(shortId=spec.shortId, title=spec.title, author=spec.author, similarity=similarity)
+                )
+        return found
+
+    @repository_timer("bootstrap")
+    def bootstrap(self, page_size: int) -> Tuple[int, Dict[str, Any]]:
+        """Categories, tags and the newest page, all read from one snapshot.
+
+        Returns ``(generation, data)``; the result is reused until the next write bumps the generation.
+        """
+
+        snapshot = self._snapshot
+        generation = snapshot.generation
+        cached = self._bootstrap_cache.get(page_size)
+        if cached is not None and cached[0] == generation:
+            record_cache_lookup("bootstrap", hit=True)
+            return cached
+        record_cache_lookup("bootstrap", hit=False)
+        data: Dict[str, Any] = {
+            "categories": self._categories_from_counts(snapshot.category_counts),
+            "tags": self._tags_from_counts(snapshot.tag_counts),
+            "specs": PaginatedSpecs(
+                total=len(snapshot),
+                page=1,
+                pageSize=page_size,
+                items=[SpecSummary(**spec.dict()) for spec in snapshot.newest(0, page_size)],
+            ),
+        }
+        result = (generation, data)
+        self._bootstrap_cache = {**self._bootstrap_cache, page_size: result}
+        return result
+
+    def export_short_ids(
+        self,
+        tag: str | None = None,
+        category: str | None = None,
+        updated_since: datetime | None = None,
+    ) -> List[str]:
+        short_ids: List[str] = []
+        for short_id, spec in self._snapshot.specs.items():
+            if tag and tag not in spec.tags:
+                continue
+            if category and spec.category != category:
+                continue
+            if updated_since and spec.updatedAt < updated_since:
+                continue
+            short_ids.append(short_id)
+        short_ids.sort()
+        return short_ids
+
+    def iter_export(
+        self,
+        short_ids: List[str],
+        include_versions: bool = False,
+        batch_size: int = 100,
+    ) -> Iterator[Tuple[Spec, bool]]:
+        """Yield ``(spec, is_latest)`` for ``short_ids``, oldest version first when versions are included.
+
+        Only the latest versions live in memory; older ones are read from ``spec_versions``
+        one ``$in`` batch at a time.
+        """
+
+        snapshot = self._snapshot
+        for start in range(0, len(short_ids), batch_size):
+            chunk = short_ids[start : start + batch_size]
+            older: Dict[str, List[SpecVersion]] = {}
+            if include_versions and mongo_available():
+                try:
+                    for documents in iter_spec_version_documents(chunk, batch_size):
+                        for document in documents:
+                            try:
+                                version = self._spec_version_from_raw(document)
+                            except Exception as exc:  # pragma: no cover - defensive
+                                logging.warning("Skipping invalid spec version during export: %s", exc)
+                                continue
+                            older.setdefault(version.shortId, []).append(version)
+                except pymongo_errors.PyMongoError as exc:
+                    logging.warning("Exporting latest versions only; failed to load history: %s", exc)
+            for short_id in chunk:
+                latest = snapshot.specs.get(short_id)
+                if latest is None:
+                    continue
+                metadata = snapshot.metadata.get(short_id) or self._metadata_from_spec(latest)
+                for version in sorted(older.get(short_id, []), key=lambda item: item.version):
+                    if version.version < latest.version:
+                        yield self._combine_metadata_and_version(metadata, version), False
+                yield latest, True
+
     def add_spec(self, spec: Spec) -> None:
-        self.specs[spec.shortId] = spec
-        self.metadata[spec.shortId] = self._metadata_from_spec(spec)
+        self._publish([(spec, self._metadata_from_spec(spec))])
 
+    @repository_timer("history")
     def get_spec_history(self, short_id: str) -> List[SpecHistoryItem]:
-        documents = list_spec_version_documents(short_id)
+        documents: List[Dict[str, Any]] = []
+        if mongo_available():
+            try:
+                documents = list_spec_version_documents(short_id)
+            except pymongo_errors.PyMongoError as exc:
+                logging.warning("Failed to load history for spec %s: %s", short_id, exc)
+        return self._history_from_documents(short_id, documents)
+
+    @repository_timer("history_batch")
+    def get_spec_histories(self, short_ids: List[str]) -> Dict[str, List[SpecHistoryItem]]:
+        documents_by_id: Dict[str, List[Dict[str, Any]]] = {short_id: [] for short_id in short_ids}
+        if short_ids and mongo_available():
+            try:
+                for document in list_spec_history_documents(short_ids):
+                    documents_by_id.setdefault(str(document.get("shortId")), []).append(document)
+            except pymongo_errors.PyMongoError as exc:
+                logging.warning("Failed to load history for %d specs: %s", len(short_ids), exc)
+        return {
+            short_id: self._history_from_documents(short_id, documents_by_id[short_id]) for short_id in short_ids
+        }
+
+    @repository_timer("version_batch")
+    def get_spec_versions(self, requests: List[Tuple[str, int]]) -> Dict[Tuple[str, int], Spec]:
+        """Resolve many (shortId, version) pairs: latest versions from memory, the rest in one query."""
+
+        snapshot = self._snapshot
+        found: Dict[Tuple[str, int], Spec] = {}
+        pending: List[Tuple[str, int]] = []
+        for short_id, version in requests:
+            latest = snapshot.specs.get(short_id)
+            if latest is None:
+                continue
+            if latest.version == version:
+                record_cache_lookup("version", hit=True)
+                found[(short_id, version)] = latest
+            else:
+                record_cache_lookup("version", hit=False)
+                pending.append((short_id, version))
+        if not pending or not mongo_available():
+            return found
+        try:
+            documents = find_spec_version_documents(pending)
+        except pymongo_errors.PyMongoError as exc:
+            logging.warning("Failed to load %d spec versions: %s", len(pending), exc)
+            return found
+        for document in documents:
+            try:
+                version_model = self._spec_version_from_raw(document)
+            except Exception as exc:  # pragma: no cover - defensive
+                logging.warning("Skipping invalid spec version document: %s", exc)
+                continue
+            latest = snapshot.specs.get(version_model.shortId)
+            if latest is None:
+                continue
+            metadata = snapshot.metadata.get(version_model.shortId) or self._metadata_from_spec(latest)
+            found[(version_model.shortId, version_model.version)] = self._combine_metadata_and_version(
+                metadata, version_model
+            )
+        return found
+
+    def _history_from_documents(self, short_id: str, documents: List[Dict[str, Any]]) -> List[SpecHistoryItem]:
         items: List[SpecHistoryItem] = []
         for document in documents:
             try:
@@ -360,29 +793,62 @@ class SpecRepository:
         metadata_document: Dict[str, Any],
         version_document: Dict[str, Any] | None = None,
     ) -> None:
+        entry = self._entry_from_documents(metadata_document, version_document)
+        if entry is not None:
+            self._publish([entry])
+
+    def _entry_from_documents(
+        self,
+        metadata_document: Dict[str, Any],
+        version_document: Dict[str, Any] | None,
+    ) -> Tuple[Spec, SpecMetadata] | None:
         try:
             metadata = self._metadata_from_raw(metadata_document)
         except Exception as exc:  # pragma: no cover - defensive
             logging.warning("Skipping refresh with invalid metadata document: %s", exc)
-            return
+            return None
         if version_document is None:
             candidate = metadata_document if "contentMd" in metadata_document else None
-            version_document = candidate or find_latest_spec_version_document(metadata.shortId)
+            if candidate is None and mongo_available():
+                try:
+                    candidate = find_latest_spec_version_document(metadata.shortId)
+                except pymongo_errors.PyMongoError as exc:
+                    logging.warning("Failed to load latest version of spec %s: %s", metadata.shortId, exc)
+            version_document = candidate
         if not version_document:
             logging.warning("Missing version document while refreshing spec %s", metadata.shortId)
-            return
+            return None
         try:
             version = self._spec_version_from_raw(version_document)
         except Exception as exc:  # pragma: no cover - defensive
             logging.warning("Skipping refresh with invalid version document: %s", exc)
-            return
-        spec = self._combine_metadata_and_version(metadata, version)
-        self.metadata[metadata.shortId] = metadata
-        self.specs[spec.shortId] = spec
+            return None
+        return self._combine_metadata_and_version(metadata, version), metadata
+
+    def reload_spec(self, short_id: str) -> Spec | None:
+        """Re-read one spec from MongoDB, e.g. after another worker won a version race."""
+
+        if not mongo_available():
+            return self.specs.get(short_id)
+        try:
+            document = find_spec_document(short_id)
+        except pymongo_errors.PyMongoError as exc:
+            logging.warning("Failed to reload spec %s: %s", short_id, exc)
+            return self.specs.get(short_id)
+        if document:
+            self.refresh_from_document(document)
+        return self.specs.get(short_id)
+
+    def refresh_from_documents(self, pairs: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+        entries = [self._entry_from_documents(metadata, version) for metadata, version in pairs]
+        self._publish([entry for entry in entries if entry is not None])
 
     def delete_spec(self, short_id: str) -> bool:
-        removed_spec = self.specs.pop(short_id, None)
-        self.metadata.pop(short_id, None)
+        with self._write_lock:
+            removed_spec = self._snapshot.specs.get(short_id)
+            if removed_spec is not None:
+                self._replace(removals=[short_id])
+        self._encoded.pop(short_id, None)
         if removed_spec is not None:
             try:
                 self._persist()
@@ -393,3 +859,10 @@ class SpecRepository:
 
 
 repository = SpecRepository()
+
+
+def _reload_after_mongo_recovery() -> None:
+    repository._merge_from_mongo()
+
+
+add_recovery_listener(_reload_after_mongo_recovery)
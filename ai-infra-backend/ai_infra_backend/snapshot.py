@@ -0,0 +1,554 @@
+from __future__ import annotations
+
+import heapq
+from collections.abc import ItemsView, ValuesView
+from datetime import date, datetime, timezone
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, TypeVar
+
+from ai_infra_backend.fuzzy import tokenize
+from ai_infra_backend.models import Spec, SpecMetadata
+from ai_infra_backend.persistent import MapEditor, PersistentList, PersistentMap, PersistentSortedList
+
+# (updatedAt, -position, slot): ascending order, so iterating backwards yields newest first
+# and, for equal timestamps, the spec that entered the catalog first.
+OrderKey = Tuple[datetime, int, int]
+
+FACET_FIELDS = ("tag", "category", "author")
+SUGGEST_FIELDS = ("title",) + FACET_FIELDS
+# Prefixes matching more terms than this have their ranked completions memoized per snapshot.
+SUGGEST_MEMO_THRESHOLD = 256
+
+# (normalized text, field, key): one completion candidate in the sorted suggestion index.
+Term = Tuple[str, str, str]
+# (position, slot): catalog (insertion) order.
+CatalogKey = Tuple[int, int]
+
+V = TypeVar("V")
+
+
+def author_key(author: str) -> str:
+    """``@Alice`` and ``alice`` are the same author for filtering and facets."""
+
+    return author.strip().lstrip("@").lower()
+
+
+def normalize_term(text: str) -> str:
+    """Case-folded with whitespace collapsed; how titles, tags and categories are matched for suggestions."""
+
+    return " ".join(text.casefold().split())
+
+
+def _order_key(spec: Spec, position: int, slot: int) -> OrderKey:
+    return spec.updatedAt, -position, slot
+
+
+def _facet_values(spec: Spec, field: str) -> Set[str]:
+    if field == "tag":
+        return set(spec.tags)
+    if field == "category":
+        return {spec.category}
+    key = author_key(spec.author or "")
+    return {key} if key else set()
+
+
+def _suggest_labels(spec: Spec) -> Iterator[Tuple[Tuple[str, str], str]]:
+    """``((field, key), label)`` for every term ``spec`` contributes to the suggestion index."""
+
+    title = normalize_term(spec.title)
+    if title:
+        yield ("title", title), spec.title.strip()
+    for tag in set(spec.tags):
+        if normalize_term(tag):
+            yield ("tag", tag), tag
+    if normalize_term(spec.category):
+        yield ("category", spec.category), spec.category
+    author = author_key(spec.author or "")
+    if author:
+        yield ("author", author), spec.author.strip()
+
+
+def search_terms(spec: Spec) -> Set[str]:
+    """Word tokens of the title, summary and tags; the vocabulary fuzzy search expands queries against."""
+
+    terms = set(tokenize(spec.title))
+    terms.update(tokenize(spec.summary))
+    for tag in spec.tags:
+        terms.update(tokenize(tag))
+    return terms
+
+
+def _term(field: str, key: str) -> Term:
+    # Title and author keys are normalized already; tags and categories keep their stored spelling as key.
+    return (key if field in ("title", "author") else normalize_term(key)), field, key
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _month_key(value: datetime) -> int:
+    return value.year * 12 + value.month - 1
+
+
+def iter_slots(bits: int) -> Iterator[int]:
+    """Set bit positions of ``bits``, highest first, in O(k) Python steps for k set bits."""
+
+    text = bin(bits)
+    last = len(text) - 1
+    position = text.find("1", 2)
+    while position != -1:
+        yield last - position
+        position = text.find("1", position + 1)
+
+
+def bits_from_slots(slots: Iterable[int], size: int) -> int:
+    buffer = bytearray((size + 7) // 8)
+    for slot in slots:
+        buffer[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buffer, "little")
+
+
+class _CatalogItems(ItemsView):
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        slots = self._mapping._catalog_slots()
+        return zip(self._mapping._slot_ids.pick(slots), self._mapping._values.pick(slots))
+
+
+class _CatalogValues(ValuesView):
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._mapping._values.pick(self._mapping._catalog_slots()))
+
+
+class CatalogMapping(Mapping[str, V]):
+    """Read-only ``shortId`` mapping over one per-slot list of a snapshot, in catalog (insertion) order."""
+
+    __slots__ = ("_slots", "_slot_ids", "_values", "_catalog")
+
+    def __init__(
+        self,
+        slots: PersistentMap[str, int],
+        slot_ids: PersistentList[Optional[str]],
+        values: PersistentList[V],
+        catalog: PersistentSortedList[CatalogKey],
+    ) -> None:
+        self._slots = slots
+        self._slot_ids = slot_ids
+        self._values = values
+        self._catalog = catalog
+
+    def _catalog_slots(self) -> List[int]:
+        return [slot for _, slot in self._catalog]
+
+    def __getitem__(self, short_id: str) -> V:
+        return self._values[self._slots[short_id]]
+
+    def get(self, short_id: str, default: Any = None) -> Any:
+        slot = self._slots.get(short_id)
+        return default if slot is None else self._values[slot]
+
+    def __contains__(self, short_id: object) -> bool:
+        return short_id in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._slot_ids.pick(self._catalog_slots()))  # type: ignore[arg-type]
+
+    def items(self) -> _CatalogItems:  # type: ignore[override]
+        return _CatalogItems(self)
+
+    def values(self) -> _CatalogValues:  # type: ignore[override]
+        return _CatalogValues(self)
+
+
+class CatalogSnapshot:
+    """Immutable view of the catalog together with the indexes derived from it.
+
+    Writers never modify a published snapshot: :meth:`replace` derives a new one and the
+    repository publishes it with a single reference assignment. A reader that grabbed a
+    snapshot keeps a consistent catalog for as long as it holds on to it, without taking
+    any lock. Every map and list is a :mod:`~ai_infra_backend.persistent` container, so a
+    derived snapshot shares everything a write did not touch with its predecessor and a
+    small write costs about the same at 100k specs as at 1k.
+
+    Every spec owns a dense integer slot, and slots freed by deletes are reused. The spec,
+    its metadata and its catalog position are kept in per-slot lists, and each tag,
+    category and author, each UTC day and month of ``updatedAt`` and the set of live specs
+    is a Python ``int`` bitmap over the slots, so conjunctive filters are ``&``, counts are
+    ``int.bit_count()`` and turning matches back into specs is a list lookup per slot.
+
+    Normalized titles, tags, categories and authors are also kept in one sorted list with a
+    spec count each, so completions for a prefix are a ``bisect`` range (see :meth:`suggest`),
+    and every word of the searchable text is counted in :attr:`vocabulary`.
+    """
+
+    __slots__ = (
+        "generation",
+        "_slots",
+        "_slot_ids",
+        "_slot_specs",
+        "_slot_metadata",
+        "_slot_positions",
+        "_free_slots",
+        "_next_position",
+        "_catalog",
+        "_order",
+        "_live",
+        "_postings",
+        "_days",
+        "_months",
+        "_terms",
+        "_term_counts",
+        "_term_labels",
+        "_suggestions",
+        "_vocabulary",
+        "specs",
+        "metadata",
+        "vocabulary",
+    )
+
+    def __init__(
+        self,
+        generation: int = 0,
+        slots: PersistentMap[str, int] | None = None,
+        slot_ids: PersistentList[Optional[str]] | None = None,
+        slot_specs: PersistentList[Optional[Spec]] | None = None,
+        slot_metadata: PersistentList[Optional[SpecMetadata]] | None = None,
+        slot_positions: PersistentList[int] | None = None,
+        free_slots: Tuple[int, ...] = (),
+        next_position: int = 0,
+        catalog: PersistentSortedList[CatalogKey] | None = None,
+        order: PersistentSortedList[OrderKey] | None = None,
+        live: int = 0,
+        postings: Dict[str, PersistentMap[str, int]] | None = None,
+        days: PersistentMap[int, int] | None = None,
+        months: PersistentMap[int, int] | None = None,
+        terms: PersistentSortedList[Term] | None = None,
+        term_counts: PersistentMap[Tuple[str, str], int] | None = None,
+        term_labels: PersistentMap[Tuple[str, str], str] | None = None,
+        vocabulary: PersistentMap[str, int] | None = None,
+    ) -> None:
+        self.generation = generation
+        self._slots = slots if slots is not None else PersistentMap()
+        self._slot_ids = slot_ids if slot_ids is not None else PersistentList()
+        self._slot_specs = slot_specs if slot_specs is not None else PersistentList()
+        self._slot_metadata = slot_metadata if slot_metadata is not None else PersistentList()
+        self._slot_positions = slot_positions if slot_positions is not None else PersistentList()
+        self._free_slots = free_slots
+        self._next_position = next_position
+        self._catalog = catalog if catalog is not None else PersistentSortedList()
+        self._order = order if order is not None else PersistentSortedList()
+        self._live = live
+        self._postings = postings if postings is not None else {field: PersistentMap() for field in FACET_FIELDS}
+        self._days = days if days is not None else PersistentMap()
+        self._months = months if months is not None else PersistentMap()
+        self._terms = terms if terms is not None else PersistentSortedList()
+        self._term_counts = term_counts if term_counts is not None else PersistentMap()
+        self._term_labels = term_labels if term_labels is not None else PersistentMap()
+        # Memo for broad prefixes. The snapshot never changes, so entries stay valid for its lifetime.
+        self._suggestions: Dict[Tuple[str, Tuple[str, ...], int], List[Tuple[str, str, int]]] = {}
+        self._vocabulary = vocabulary if vocabulary is not None else PersistentMap()
+        self.specs: Mapping[str, Spec] = CatalogMapping(
+            self._slots, self._slot_ids, self._slot_specs, self._catalog  # type: ignore[arg-type]
+        )
+        self.metadata: Mapping[str, SpecMetadata] = CatalogMapping(
+            self._slots, self._slot_ids, self._slot_metadata, self._catalog  # type: ignore[arg-type]
+        )
+        # Search term -> number of specs containing it.
+        self.vocabulary: Mapping[str, int] = self._vocabulary
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def position(self, short_id: str) -> int:
+        """Order in which the spec entered the catalog; breaks ties between equal timestamps."""
+
+        return self._slot_positions[self._slots[short_id]]
+
+    def slot(self, short_id: str) -> int:
+        return self._slots[short_id]
+
+    def slot_id(self, slot: int) -> Optional[str]:
+        return self._slot_ids[slot]
+
+    @property
+    def live(self) -> int:
+        """Bitmap of all occupied slots."""
+
+        return self._live
+
+    def postings(self, field: str) -> Mapping[str, int]:
+        """Bitmap per value of ``field`` (one of :data:`FACET_FIELDS`); authors are keyed by :func:`author_key`."""
+
+        return self._postings[field]
+
+    def bits(self, field: str, value: str) -> int:
+        return self._postings[field].get(value, 0)
+
+    def counts(self, field: str) -> Dict[str, int]:
+        return {value: bits.bit_count() for value, bits in self._postings[field].items()}
+
+    @property
+    def category_counts(self) -> Dict[str, int]:
+        return self.counts("category")
+
+    @property
+    def tag_counts(self) -> Dict[str, int]:
+        return self.counts("tag")
+
+    def updated_since_bits(self, since: datetime) -> int:
+        """Specs with ``updatedAt >= since``; later months and days are ORed, only ``since``'s own day is checked."""
+
+        since = _utc(since)
+        day = since.toordinal()
+        month = _month_key(since)
+        bits = 0
+        for key, month_bits in self._months.items():
+            if key > month:
+                bits |= month_bits
+        next_month = date(since.year + since.month // 12, since.month % 12 + 1, 1).toordinal()
+        days = self._days
+        for key in range(day + 1, next_month):
+            bits |= days.get(key, 0)
+        boundary = days.get(day)
+        if boundary:
+            slots = list(iter_slots(boundary))
+            specs = self._slot_specs.pick(slots)
+            late = (slot for slot, spec in zip(slots, specs) if spec.updatedAt >= since)  # type: ignore[union-attr]
+            bits |= bits_from_slots(late, len(self._slot_ids))
+        return bits
+
+    def bits_for(self, short_ids: Iterable[str]) -> int:
+        return bits_from_slots(self._slots.pick(short_ids), len(self._slot_ids))
+
+    def select(self, bits: int, newest_first: bool = True) -> List[Spec]:
+        """All specs in ``bits``, newest first or in catalog (insertion) order."""
+
+        slots = list(iter_slots(bits))
+        specs = self._slot_specs.pick(slots)
+        positions = self._slot_positions.pick(slots)
+        if newest_first:
+            ranked = sorted(
+                zip([(spec.updatedAt, -position) for spec, position in zip(specs, positions)], specs),  # type: ignore
+                key=itemgetter(0),
+                reverse=True,
+            )
+        else:
+            ranked = sorted(zip(positions, specs), key=itemgetter(0))
+        return [spec for _, spec in ranked]  # type: ignore[misc]
+
+    def page(self, bits: int, start: int, stop: int) -> List[Spec]:
+        """``select(bits)[start:stop]`` without ranking every match."""
+
+        total = bits.bit_count()
+        if start >= total:
+            return []
+        # Walking the newest-first order takes about stop * n / total steps to fill the page,
+        # ranking the matches takes total; pick whichever is smaller.
+        if total * total >= stop * len(self._slots):
+            members = bits.to_bytes((len(self._slot_ids) + 7) // 8, "little")
+            found: List[int] = []
+            for chunk in self._order.chunks(reverse=True):
+                found.extend(slot for _, _, slot in reversed(chunk) if members[slot >> 3] >> (slot & 7) & 1)
+                if len(found) >= stop:
+                    break
+            return self._slot_specs.pick(found[start:stop])  # type: ignore[return-value]
+        slots = list(iter_slots(bits))
+        specs = self._slot_specs.pick(slots)
+        positions = self._slot_positions.pick(slots)
+        keyed = zip([(spec.updatedAt, -position) for spec, position in zip(specs, positions)], specs)  # type: ignore
+        return [spec for _, spec in heapq.nlargest(stop, keyed, key=itemgetter(0))[start:stop]]
+
+    def suggest(
+        self,
+        prefix: str,
+        limit: int,
+        fields: Sequence[str] = SUGGEST_FIELDS,
+    ) -> List[Tuple[str, str, int]]:
+        """Up to ``limit`` ``(field, label, count)`` completions of ``prefix``, most specs first.
+
+        ``prefix`` must already be normalized with :func:`normalize_term` (or :func:`author_key`).
+        Ties go to the shorter, then alphabetically first, term.
+        """
+
+        memo_key = (prefix, tuple(fields), limit)
+        cached = self._suggestions.get(memo_key)
+        if cached is not None:
+            return cached
+        matching = self._terms.irange((prefix,), (prefix + "\U0010ffff",))
+        wanted = set(fields)
+        candidates = [term for term in matching if term[1] in wanted]
+        counts = self._term_counts.pick([term[1:] for term in candidates])
+        # Terms are unique and sorted, so comparing them last breaks ties the way the sorted index does.
+        ranked = [(-count, len(term[0]), term) for count, term in zip(counts, candidates)]
+        best = heapq.nsmallest(limit, ranked)
+        result = [(field, self._term_labels[field, key], -negated) for negated, _, (_, field, key) in best]
+        if len(matching) > SUGGEST_MEMO_THRESHOLD:
+            self._suggestions[memo_key] = result
+        return result
+
+    def iter_newest(self) -> Iterator[Spec]:
+        """All specs, most recently updated first."""
+
+        slot_specs = self._slot_specs
+        for chunk in self._order.chunks(reverse=True):
+            yield from slot_specs.pick([slot for _, _, slot in reversed(chunk)])  # type: ignore[misc]
+
+    def newest(self, start: int, stop: int) -> List[Spec]:
+        return list(islice(self.iter_newest(), start, stop))
+
+    def replace(
+        self,
+        generation: int,
+        upserts: Iterable[Tuple[Spec, SpecMetadata]] = (),
+        removals: Iterable[str] = (),
+    ) -> "CatalogSnapshot":
+        """Return a new snapshot with ``removals`` dropped and ``upserts`` added or replaced.
+
+        Only the buckets and chunks the changes fall into are copied; everything else is
+        shared with this snapshot.
+        """
+
+        slots = self._slots.edit()
+        slot_ids = self._slot_ids.edit()
+        slot_specs = self._slot_specs.edit()
+        slot_metadata = self._slot_metadata.edit()
+        slot_positions = self._slot_positions.edit()
+        free_slots = list(self._free_slots)
+        next_position = self._next_position
+        catalog = self._catalog.edit()
+        order = self._order.edit()
+        # Order keys of specs upserted in this call, and catalog keys of the new ones; both are
+        # inserted together at the end.
+        added: Dict[int, OrderKey] = {}
+        entered: List[CatalogKey] = []
+        # Bit changes per bitmap, last write wins. They are applied once at the end, so a batch
+        # costs one pass per touched bitmap rather than one big-int copy per spec and value.
+        changes: Dict[Tuple[str, Any], Dict[int, bool]] = {}
+        # Net change in spec count per suggestion term; labels follow the most recent spelling.
+        term_deltas: Dict[Tuple[str, str], int] = {}
+        term_labels = self._term_labels.edit()
+        vocabulary = self._vocabulary.edit()
+
+        def mark(spec: Spec, slot: int, present: bool) -> None:
+            step = 1 if present else -1
+            for word in search_terms(spec):
+                count = vocabulary.get(word, 0) + step
+                if count:
+                    vocabulary[word] = count
+                else:
+                    del vocabulary[word]
+            for term_key, label in _suggest_labels(spec):
+                term_deltas[term_key] = term_deltas.get(term_key, 0) + step
+                if present:
+                    term_labels[term_key] = label
+            updated_at = _utc(spec.updatedAt)
+            changes.setdefault(("live", None), {})[slot] = present
+            changes.setdefault(("day", updated_at.toordinal()), {})[slot] = present
+            changes.setdefault(("month", _month_key(updated_at)), {})[slot] = present
+            for field in FACET_FIELDS:
+                for value in _facet_values(spec, field):
+                    changes.setdefault((field, value), {})[slot] = present
+
+        def unindex(slot: int) -> None:
+            spec = slot_specs[slot]
+            if added.pop(slot, None) is None:
+                order.remove(_order_key(spec, slot_positions[slot], slot))  # type: ignore[arg-type]
+            mark(spec, slot, False)  # type: ignore[arg-type]
+
+        for short_id in removals:
+            slot = slots.pop(short_id, None)
+            if slot is None:
+                continue
+            unindex(slot)
+            catalog.remove((slot_positions[slot], slot))
+            slot_ids[slot] = None
+            slot_specs[slot] = None
+            slot_metadata[slot] = None
+            free_slots.append(slot)
+        for spec, spec_metadata in upserts:
+            slot = slots.get(spec.shortId)
+            if slot is not None:
+                unindex(slot)
+            else:
+                if free_slots:
+                    slot = free_slots.pop()
+                    slot_ids[slot] = spec.shortId
+                    slot_positions[slot] = next_position
+                else:
+                    slot = len(slot_ids)
+                    slot_ids.append(spec.shortId)
+                    slot_specs.append(None)
+                    slot_metadata.append(None)
+                    slot_positions.append(next_position)
+                slots[spec.shortId] = slot
+                entered.append((next_position, slot))
+                next_position += 1
+            slot_specs[slot] = spec
+            slot_metadata[slot] = spec_metadata
+            added[slot] = _order_key(spec, slot_positions[slot], slot)
+            mark(spec, slot, True)
+        # A few keys are insorted; a batch the size of the catalog is merged with one sort.
+        catalog.update(entered)
+        order.update(added.values())
+
+        live = self._live
+        postings = dict(self._postings)
+        bitmaps: Dict[str, MapEditor[Any, int]] = {}
+        term_counts = self._term_counts.edit()
+        terms = self._terms.edit()
+        fresh: List[Term] = []
+        for term_key, delta in term_deltas.items():
+            before = term_counts.get(term_key, 0)
+            after = before + delta
+            if after:
+                term_counts[term_key] = after
+                if not before:
+                    fresh.append(_term(*term_key))
+            elif before:
+                del term_counts[term_key]
+                del term_labels[term_key]
+                terms.remove(_term(*term_key))
+        terms.update(fresh)
+        size = len(slot_ids)
+        for (kind, key), bit_changes in changes.items():
+            set_mask = bits_from_slots((slot for slot, present in bit_changes.items() if present), size)
+            clear_mask = bits_from_slots((slot for slot, present in bit_changes.items() if not present), size)
+            if kind == "live":
+                live = (live & ~clear_mask) | set_mask
+                continue
+            target = bitmaps.get(kind)
+            if target is None:
+                source = self._days if kind == "day" else self._months if kind == "month" else self._postings[kind]
+                target = bitmaps[kind] = source.edit()
+            bits = (target.get(key, 0) & ~clear_mask) | set_mask
+            if bits:
+                target[key] = bits
+            else:
+                target.pop(key, None)
+        for field in FACET_FIELDS:
+            if field in bitmaps:
+                postings[field] = bitmaps[field].freeze()
+        return CatalogSnapshot(
+            generation,
+            slots.freeze(),
+            slot_ids.freeze(),
+            slot_specs.freeze(),
+            slot_metadata.freeze(),
+            slot_positions.freeze(),
+            tuple(free_slots),
+            next_position,
+            catalog.freeze(),
+            order.freeze(),
+            live,
+            postings,
+            bitmaps["day"].freeze() if "day" in bitmaps else self._days,
+            bitmaps["month"].freeze() if "month" in bitmaps else self._months,
+            terms.freeze(),
+            term_counts.freeze(),
+            term_labels.freeze(),
+            vocabulary.freeze(),
+        )
@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import json
 import os
+from contextlib import contextmanager
 from pathlib import Path
 import sys
-from typing import Generator
+from typing import Callable, ContextManager, Generator
 
 import pytest
 
@@ -12,12 +13,16 @@ ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+# Keep bcrypt cheap in tests; production cost comes from BCRYPT_ROUNDS.
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
 import importlib
 
 app_module = importlib.import_module("ai_infra_backend.app")
 repository_module = importlib.import_module("ai_infra_backend.repository")
 mongo_module = importlib.import_module("ai_infra_backend.mongo")
 from ai_infra_backend.app import create_app
+from ai_infra_backend.monitoring import CommandTally, command_tally
 from ai_infra_backend.repository import SpecRepository
 
 
@@ -43,6 +48,8 @@ def override_repository(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Gene
     mongo_module._history_collection = mongo_module._InMemorySpecHistoryCollection()
     mongo_module._user_collection = mongo_module._InMemoryUserCollection()
     mongo_module._client = None
+    mongo_module._monitor = None
+    mongo_module.circuit_breaker.record_success()
     repo = SpecRepository(data_path=data_path)
     monkeypatch.setattr(app_module, "repository", repo)
     monkeypatch.setattr(repository_module, "repository", repo)
@@ -55,3 +62,21 @@ def client():
     app.config.update({"TESTING": True})
     with app.test_client() as client:
         yield client
+
+
+@pytest.fixture
+def max_mongo_commands() -> Callable[[int], ContextManager[CommandTally]]:
+    """Fail the test when the wrapped block issues more MongoDB commands than ``limit``.
+
+    Works for both a real MongoDB (driver command events) and the in-memory fallback.
+    """
+
+    @contextmanager
+    def budget(limit: int) -> Generator[CommandTally, None, None]:
+        with command_tally() as tally:
+            yield tally
+        assert tally.count <= limit, (
+            f"expected at most {limit} MongoDB commands, got {tally.count}: {dict(tally.by_command)}"
+        )
+
+    return budget
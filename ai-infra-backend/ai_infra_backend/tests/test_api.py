@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import hashlib
 import io
+import json
+import tarfile
 from datetime import datetime, timezone
 
 from ai_infra_backend.models import BusinessErrorCode
@@ -141,8 +144,7 @@ def test_list_specs_filter_today_handles_naive_documents(client):
     assert body["status_code"] == BusinessErrorCode.SUCCESS
     assert body["data"]["total"] == 1
     assert body["data"]["items"][0]["shortId"] == "B7C8D9E0F1G2H3I4"
-    repo.specs.pop("B7C8D9E0F1G2H3I4", None)
-    repo.metadata.pop("B7C8D9E0F1G2H3I4", None)
+    repo.delete_spec("B7C8D9E0F1G2H3I4")
 
 
 def test_get_spec_detail(client):
@@ -541,3 +543,743 @@ def test_delete_spec_endpoint(client):
     history_collection = mongo_module._history_collection
     assert isinstance(history_collection, mongo_module._InMemorySpecHistoryCollection)
     assert short_id not in history_collection.store
+
+
+def test_auth_returns_retryable_error_when_hasher_busy(client, monkeypatch):
+    from ai_infra_backend.passwords import PasswordHasherBusy, password_hasher
+
+    def busy(*args, **kwargs):
+        raise PasswordHasherBusy("saturated")
+
+    monkeypatch.setattr(password_hasher, "hash", busy)
+    resp = client.post(
+        "/specmarket/v1/auth/register",
+        json={"username": "busy", "password": "Password123!"},
+    )
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert resp.get_json()["status_code"] == BusinessErrorCode.UNAVAILABLE
+
+
+def test_login_rehashes_password_when_cost_changes(client, monkeypatch):
+    from ai_infra_backend.passwords import password_hasher
+
+    registration = _register_user(client, "rehash", "Password123!")
+    user_id = registration.get_json()["data"]["user"]["id"]
+    client.post("/specmarket/v1/auth/logout")
+    original_hash = mongo_module.find_user_document_by_id(user_id)["passwordHash"]
+
+    monkeypatch.setattr(password_hasher, "rounds", password_hasher.rounds + 1)
+    _login_user(client, "rehash", "Password123!")
+
+    rehashed = mongo_module.find_user_document_by_id(user_id)["passwordHash"]
+    assert rehashed != original_hash
+    assert not password_hasher.needs_rehash(rehashed)
+    client.post("/specmarket/v1/auth/logout")
+    _login_user(client, "rehash", "Password123!")
+
+
+def test_metrics_exports_auth_hash_timings(client):
+    _register_user(client, "metrics", "Password123!")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    body = resp.get_data(as_text=True)
+    assert "specmarket_auth_hash_duration_seconds_count" in body
+    assert "specmarket_auth_hash_queue_wait_seconds_count" in body
+
+
+def test_reads_skip_mongo_while_breaker_is_open(client, monkeypatch):
+    def unexpected(*args, **kwargs):
+        raise AssertionError("MongoDB should not be queried while the breaker is open")
+
+    monkeypatch.setattr(mongo_module._history_collection, "find", unexpected)
+    mongo_module.circuit_breaker.trip()
+
+    detail = client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": "A1B2C3D4E5F6G7H8"})
+    assert detail.status_code == 200
+    assert detail.get_json()["data"]["history"]["total"] == 1
+
+    readiness = client.get("/readiness").get_json()["data"]
+    assert readiness["ok"] is False
+    assert readiness["breaker"] == "open"
+
+
+def test_metrics_exports_route_latency_and_repository_timings(client):
+    client.get("/specmarket/v1/listSpecs")
+    client.get("/specmarket/v1/listSpecs", query_string={"q": "test"})
+    client.get("/specmarket/v1/getSpecVersion", query_string={"shortId": "A1B2C3D4E5F6G7H8", "version": 1})
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert (
+        'specmarket_http_request_duration_seconds_count{method="GET",route="/specmarket/v1/listSpecs",status="200"}'
+        in body
+    )
+    assert 'specmarket_repository_operation_seconds_count{operation="search"}' in body
+    assert 'specmarket_repository_operation_seconds_count{operation="history"}' in body
+    assert 'specmarket_repository_cache_lookups_total{cache="version",result="hit"}' in body
+    assert "specmarket_http_requests_in_flight 1.0" in body
+
+
+def test_server_timing_header_breaks_down_stages(client, monkeypatch):
+    from ai_infra_backend.config import settings
+
+    resp = client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": "A1B2C3D4E5F6G7H8"})
+    assert "Server-Timing" not in resp.headers
+
+    monkeypatch.setattr(settings, "server_timing", True)
+    _register_user(client, "timing", "Password123!")
+    resp = client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": "A1B2C3D4E5F6G7H8"})
+    header = resp.headers["Server-Timing"]
+    stages = {entry.split(";")[0] for entry in header.split(", ")}
+    assert {"auth", "repo", "history", "encode", "total", "trace"} <= stages
+    assert f'trace;desc="{resp.headers["X-Trace-Id"]}"' in header
+
+
+def test_profile_hook_writes_rotated_pstats_files(client, monkeypatch, tmp_path):
+    import pstats
+
+    from ai_infra_backend.config import settings
+
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profile_max_files", 1)
+
+    resp = client.get("/specmarket/v1/listSpecs", headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+    assert "X-Profile-Id" not in resp.headers
+
+    headers = {"X-Profile": "1", "X-Admin-Token": settings.admin_token}
+    first = client.get("/specmarket/v1/listSpecs", query_string={"q": "test"}, headers=headers)
+    assert first.headers["X-Profile-Id"] == f"list_specs-{first.headers['X-Trace-Id']}"
+    pstats.Stats(str(tmp_path / f"{first.headers['X-Profile-Id']}.pstats"))
+
+    monkeypatch.setattr(settings, "profile_sample_rate", 1.0)
+    second = client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": "A1B2C3D4E5F6G7H8"})
+    assert second.headers["X-Profile-Id"].startswith("get_spec_detail-")
+    assert [path.name for path in tmp_path.glob("*.pstats")] == [f"{second.headers['X-Profile-Id']}.pstats"]
+
+
+def test_endpoints_stay_within_mongo_command_budget(client, max_mongo_commands):
+    with max_mongo_commands(0):
+        client.get("/specmarket/v1/listSpecs", query_string={"q": "test"})
+        client.get("/specmarket/v1/listCategories")
+        client.get("/specmarket/v1/getSpecRaw", query_string={"shortId": "A1B2C3D4E5F6G7H8"})
+    with max_mongo_commands(1):
+        client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": "A1B2C3D4E5F6G7H8"})
+
+    _register_user(client, "budget", "Password123!")
+    with max_mongo_commands(2) as tally:
+        client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": "A1B2C3D4E5F6G7H8"})
+    assert tally.by_command["find"] == 2
+
+
+def test_slow_mongo_commands_are_logged_with_trace_id(client, monkeypatch, caplog):
+    from ai_infra_backend.config import settings
+
+    monkeypatch.setattr(settings, "mongo_slow_command_ms", 0.000001)
+    with caplog.at_level("WARNING"):
+        resp = client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": "A1B2C3D4E5F6G7H8"})
+    messages = [record.getMessage() for record in caplog.records if "Slow MongoDB command" in record.getMessage()]
+    assert messages
+    assert "memory.spec_versions" in messages[0]
+    assert resp.headers["X-Trace-Id"] in messages[0]
+
+
+def test_import_specs_ndjson_reports_bad_lines_and_keeps_going(client):
+    _register_user(client, "importer", "Password123!")
+    lines = [
+        json.dumps({"title": "Imported One", "contentMd": "# One", "tags": ["bulk", "ai"]}),
+        "{not json",
+        json.dumps({"title": "Missing content"}),
+        json.dumps({"title": "Imported Two", "contentMd": "# Two", "tags": "bulk,ops", "category": "ops"}),
+        json.dumps({"title": "Imported Three", "contentMd": "# Three"}),
+    ]
+    resp = client.post(
+        "/specmarket/v1/importSpecs",
+        query_string={"batchSize": 2},
+        data="\n".join(lines) + "\n",
+        content_type="application/x-ndjson",
+    )
+    assert resp.status_code == 200
+    data = resp.get_json()["data"]
+    assert data["imported"] == 3
+    assert data["failed"] == 2
+    assert data["batches"] == 2
+    assert [error["record"] for error in data["errors"]] == [2, 3]
+
+    listing = client.get("/specmarket/v1/getTagSpecs", query_string={"slug": "bulk"}).get_json()["data"]
+    short_ids = {item["shortId"] for item in listing["items"]}
+    assert len(short_ids) == 2
+    for short_id in short_ids:
+        assert short_id in mongo_module._collection.store
+        assert mongo_module._history_collection.store[short_id][1]["version"] == 1
+
+
+
+def test_import_reports_a_conflict_instead_of_overwriting_a_newer_version(client):
+    _register_user(client, "racer", "Password123!")
+    short_id = _upload_spec(client, title="Raced", summary="s", category="c", tags="t", content="# v1")
+    metadata = dict(mongo_module._collection.store[short_id], version=2, title="Other worker")
+    version = dict(mongo_module._history_collection.store[short_id][1], version=2, title="Other worker")
+    # Another worker moves the spec to version 2; this worker's repository still has version 1.
+    mongo_module.save_spec_with_version(metadata, version, expected_version=1)
+
+    resp = client.post(
+        "/specmarket/v1/importSpecs",
+        data=json.dumps({"shortId": short_id, "title": "Imported", "contentMd": "# import"}) + "\n",
+        content_type="application/x-ndjson",
+    )
+    data = resp.get_json()["data"]
+    assert (data["imported"], data["failed"]) == (0, 1)
+    assert data["errors"][0]["status"] == 409
+    assert mongo_module._collection.store[short_id]["title"] == "Other worker"
+    assert sorted(mongo_module._history_collection.store[short_id]) == [1, 2]
+    spec = client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": short_id}).get_json()["data"]
+    assert (spec["version"], spec["title"]) == (2, "Other worker")
+
+def test_import_specs_tar_archive_with_front_matter(client):
+    _register_user(client, "tarimporter", "Password123!")
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, text in (
+            ("specs/alpha.md", "---\ntitle: Alpha Spec\ntags: tar, bulk\ncategory: archive\n---\n# Heading\nBody"),
+            ("specs/beta.md", "# Beta Heading\nBody"),
+            ("specs/notes.txt", "ignored"),
+        ):
+            payload = text.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(payload)
+            archive.addfile(info, io.BytesIO(payload))
+    resp = client.post(
+        "/specmarket/v1/importSpecs",
+        data=buffer.getvalue(),
+        content_type="application/gzip",
+    )
+    assert resp.status_code == 200
+    data = resp.get_json()["data"]
+    assert data["imported"] == 2
+    assert data["failed"] == 0
+
+    titles = {item["title"]: item for item in client.get("/specmarket/v1/listSpecs").get_json()["data"]["items"]}
+    assert titles["Alpha Spec"]["category"] == "archive"
+    assert titles["Alpha Spec"]["tags"] == ["tar", "bulk"]
+    assert "Beta Heading" in titles
+
+
+def test_import_specs_requires_supported_content_type(client):
+    _register_user(client, "plainimporter", "Password123!")
+    resp = client.post("/specmarket/v1/importSpecs", data="hello", content_type="text/plain")
+    assert resp.status_code == 415
+
+
+def test_export_specs_ndjson_streams_filtered_records_with_versions(client):
+    _register_user(client, "exporter", "Password123!")
+    short_id = _upload_spec(
+        client,
+        title="Exported",
+        summary="first",
+        category="export",
+        tags="stream",
+        content="# v1",
+    )
+    client.put(
+        "/specmarket/v1/updateSpec",
+        json={
+            "shortId": short_id,
+            "title": "Exported",
+            "summary": "second",
+            "category": "export",
+            "tags": ["stream"],
+            "contentMd": "# v2",
+        },
+    )
+
+    resp = client.get("/specmarket/v1/exportSpecs", query_string={"category": "export"})
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    records = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [(record["shortId"], record["version"], record["latest"]) for record in records] == [(short_id, 2, True)]
+
+    resp = client.get(
+        "/specmarket/v1/exportSpecs",
+        query_string={"tag": "stream", "includeVersions": "true"},
+    )
+    records = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [(record["version"], record["contentMd"], record["latest"]) for record in records] == [
+        (1, "# v1", False),
+        (2, "# v2", True),
+    ]
+
+    resp = client.get("/specmarket/v1/exportSpecs", query_string={"updatedSince": "2999-01-01T00:00:00Z"})
+    assert resp.get_data() == b""
+
+
+def test_export_specs_tar_round_trips_through_import(client):
+    resp = client.get("/specmarket/v1/exportSpecs", query_string={"format": "tar"})
+    assert resp.status_code == 200
+    expected = int(resp.headers["X-Export-Count"])
+    with tarfile.open(fileobj=io.BytesIO(resp.get_data()), mode="r:gz") as archive:
+        names = archive.getnames()
+        manifest = json.loads(archive.extractfile("manifest.json").read())
+        first = archive.extractfile(names[0]).read().decode("utf-8")
+    assert names[-1] == "manifest.json"
+    assert manifest["count"] == expected == len(names) - 1
+    assert [entry["path"] for entry in manifest["entries"]] == names[:-1]
+    assert first.startswith("---\ntitle: ")
+
+    _register_user(client, "reimporter", "Password123!")
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=io.BytesIO(resp.get_data()), mode="r:gz") as source:
+        with tarfile.open(fileobj=buffer, mode="w") as target:
+            for member in source:
+                if member.name.endswith(".md"):
+                    text = source.extractfile(member).read().decode("utf-8")
+                    payload = "\n".join(line for line in text.splitlines() if not line.startswith("shortId:"))
+                    payload = payload.encode("utf-8")
+                    member.size = len(payload)
+                    target.addfile(member, io.BytesIO(payload))
+    imported = client.post("/specmarket/v1/importSpecs", data=buffer.getvalue(), content_type="application/x-tar")
+    assert imported.get_json()["data"]["imported"] == expected
+
+
+def test_get_spec_details_batches_lookups(client, max_mongo_commands):
+    _register_user(client, "batcher", "Password123!")
+    short_ids = [
+        _upload_spec(client, title=f"Batch {index}", summary="s", category="batch", tags="b", content=f"# {index}")
+        for index in range(3)
+    ]
+    client.put(
+        "/specmarket/v1/updateSpec",
+        json={
+            "shortId": short_ids[0],
+            "title": "Batch 0",
+            "summary": "s",
+            "category": "batch",
+            "tags": ["b"],
+            "contentMd": "# 0 updated",
+        },
+    )
+    unknown = "Z9Z9Z9Z9Z9Z9Z9Z9"
+    body = {
+        "items": [{"shortId": short_ids[0], "version": 1}, short_ids[1], short_ids[2], unknown],
+        "includeHistory": True,
+    }
+    # Session user, one $in query for the old version and one for every history, whatever the item count.
+    with max_mongo_commands(3):
+        resp = client.post("/specmarket/v1/getSpecDetails", json=body)
+    assert resp.status_code == 200
+    data = resp.get_json()["data"]
+    first = data["items"][0]
+    assert (first["shortId"], first["version"], first["isLatest"]) == (short_ids[0], 1, False)
+    assert first["contentMd"] == "# 0"
+    assert [item["version"] for item in first["history"]["items"]] == [2, 1]
+    assert [item["shortId"] for item in data["items"][1:]] == short_ids[1:]
+    assert data["missing"] == [{"shortId": unknown, "version": None}]
+
+    resp = client.post("/specmarket/v1/getSpecDetails", json={"items": short_ids[1:], "includeContent": False})
+    items = resp.get_json()["data"]["items"]
+    assert all("contentMd" not in item and "history" not in item for item in items)
+
+
+def test_get_spec_details_rejects_oversized_batches(client, monkeypatch):
+    from ai_infra_backend.config import settings
+
+    monkeypatch.setattr(settings, "batch_detail_max_items", 1)
+    resp = client.post("/specmarket/v1/getSpecDetails", json={"items": ["A1B2C3D4E5F6G7H8", "A1B2C3D4E5F6G7H9"]})
+    assert resp.status_code == 400
+    resp = client.post("/specmarket/v1/getSpecDetails", json={"items": ["bad"]})
+    assert resp.status_code == 400
+
+
+def test_bootstrap_returns_catalog_snapshot_with_etag(client):
+    resp = client.get("/specmarket/v1/bootstrap", query_string={"pageSize": 2})
+    assert resp.status_code == 200
+    assert resp.headers["Cache-Control"] == "no-cache"
+    data = resp.get_json()["data"]
+    listing = client.get("/specmarket/v1/listSpecs", query_string={"pageSize": 2}).get_json()["data"]
+    assert data["specs"] == listing
+    assert data["categories"] == client.get("/specmarket/v1/listCategories").get_json()["data"]["items"]
+    assert data["tags"] == client.get("/specmarket/v1/listTags").get_json()["data"]["items"]
+
+    etag = resp.headers["ETag"]
+    cached = client.get("/specmarket/v1/bootstrap", query_string={"pageSize": 2}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+
+    _register_user(client, "bootstrapper", "Password123!")
+    _upload_spec(client, title="Fresh", summary="s", category="fresh", tags="new", content="# fresh")
+    changed = client.get("/specmarket/v1/bootstrap", query_string={"pageSize": 2}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["data"]["specs"]["items"][0]["title"] == "Fresh"
+
+
+def test_bootstrap_validates_and_clamps_page_size(client):
+    assert client.get("/specmarket/v1/bootstrap", query_string={"pageSize": "x"}).status_code == 400
+
+    clamped = client.get("/specmarket/v1/bootstrap", query_string={"pageSize": -5})
+    assert clamped.status_code == 200
+    assert clamped.get_json()["data"]["specs"]["pageSize"] == 1
+    assert clamped.headers["ETag"].endswith('-1"')
+
+    large = client.get("/specmarket/v1/bootstrap", query_string={"pageSize": 500})
+    assert large.get_json()["data"]["specs"]["pageSize"] == 50
+    assert large.headers["ETag"] == client.get("/specmarket/v1/bootstrap", query_string={"pageSize": 50}).headers["ETag"]
+
+
+def test_upload_spec_enforces_size_limit_and_stores_content_hash(client, monkeypatch):
+    from ai_infra_backend.config import settings
+
+    _register_user(client, "uploader", "Password123!")
+    content = "# Hashed\n\nbody"
+    short_id = _upload_spec(client, title="Hashed", summary="s", category="c", tags="t", content=content)
+    stored = mongo_module._history_collection.store[short_id][1]
+    assert stored["contentHash"] == hashlib.sha256(content.encode("utf-8")).hexdigest()
+    detail = client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": short_id}).get_json()["data"]
+    assert detail["contentHash"] == stored["contentHash"]
+
+    monkeypatch.setattr(settings, "upload_max_bytes", 32)
+    resp = client.post(
+        "/specmarket/v1/uploadSpec",
+        data={"title": "Big", "file": (io.BytesIO(b"x" * 33), "big.md")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 413
+    resp = client.post(
+        "/specmarket/v1/uploadSpec",
+        data={"title": "Binary", "file": (io.BytesIO(b"\xff\xfe"), "bin.md")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 400
+
+
+def test_raw_spec_supports_ranges_and_conditional_requests(client):
+    short_id = "A1B2C3D4E5F6G7H8"
+    full = client.get("/specmarket/v1/getSpecRaw", query_string={"shortId": short_id})
+    body = full.get_data()
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert int(full.headers["Content-Length"]) == len(body)
+    etag = full.headers["ETag"]
+
+    partial = client.get(
+        "/specmarket/v1/downloadSpec",
+        query_string={"shortId": short_id},
+        headers={"Range": "bytes=2-9"},
+    )
+    assert partial.status_code == 206
+    assert partial.get_data() == body[2:10]
+    assert partial.headers["Content-Range"] == f"bytes 2-9/{len(body)}"
+    assert partial.headers["Content-Disposition"] == f"attachment; filename={short_id}.md"
+
+    tail = client.get("/specmarket/v1/getSpecRaw", query_string={"shortId": short_id}, headers={"Range": "bytes=-5"})
+    assert tail.get_data() == body[-5:]
+
+    unsatisfiable = client.get(
+        "/specmarket/v1/getSpecRaw",
+        query_string={"shortId": short_id},
+        headers={"Range": f"bytes={len(body) + 10}-"},
+    )
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["Content-Range"] == f"bytes */{len(body)}"
+
+    for ignored in ("items=0-1", "bytes=abc", "bytes=0-1,3-4", "bytes=9-2"):
+        whole = client.get("/specmarket/v1/getSpecRaw", query_string={"shortId": short_id}, headers={"Range": ignored})
+        assert (whole.status_code, whole.get_data()) == (200, body), ignored
+        assert "Content-Range" not in whole.headers
+
+    not_modified = client.get(
+        "/specmarket/v1/getSpecRaw",
+        query_string={"shortId": short_id},
+        headers={"If-None-Match": etag},
+    )
+    assert not_modified.status_code == 304
+
+
+def _update_body(short_id: str, content: str) -> dict:
+    return {
+        "shortId": short_id,
+        "title": "Concurrent",
+        "summary": "s",
+        "category": "c",
+        "tags": ["t"],
+        "contentMd": content,
+    }
+
+
+def test_update_spec_honours_if_match(client):
+    _register_user(client, "ifmatch", "Password123!")
+    short_id = _upload_spec(client, title="Concurrent", summary="s", category="c", tags="t", content="# v1")
+    etag = client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": short_id}).headers["ETag"]
+
+    resp = client.put("/specmarket/v1/updateSpec", json=_update_body(short_id, "# v2"), headers={"If-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+    stale = client.put("/specmarket/v1/updateSpec", json=_update_body(short_id, "# v2b"), headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert stale.get_json()["status_code"] == BusinessErrorCode.CONFLICT
+    assert stale.get_json()["data"]["currentVersion"] == 2
+
+
+def test_update_spec_rebases_after_another_worker_wins(client):
+    from ai_infra_backend.repository import repository
+
+    _register_user(client, "racer", "Password123!")
+    short_id = _upload_spec(client, title="Concurrent", summary="s", category="c", tags="t", content="# v1")
+    # Another worker writes version 2; this worker's in-memory copy still says version 1.
+    metadata = dict(mongo_module._collection.store[short_id], version=2)
+    version = dict(mongo_module._history_collection.store[short_id][1], version=2, contentMd="# other")
+    mongo_module.save_spec_with_version(metadata, version, expected_version=1)
+    assert repository.get_spec(short_id).version == 1
+
+    resp = client.put("/specmarket/v1/updateSpec", json=_update_body(short_id, "# mine"))
+    assert resp.status_code == 200
+    assert resp.get_json()["data"]["version"] == 3
+    stored = mongo_module._history_collection.store[short_id]
+    assert [stored[v]["contentMd"] for v in sorted(stored)] == ["# v1", "# other", "# mine"]
+
+
+def test_update_spec_reports_conflict_when_retries_run_out(client, monkeypatch):
+    import sys
+
+    # ``ai_infra_backend.app`` is shadowed by the Flask object on the package, so patch the module itself.
+    app_module = sys.modules["ai_infra_backend.app"]
+    _register_user(client, "loser", "Password123!")
+    short_id = _upload_spec(client, title="Concurrent", summary="s", category="c", tags="t", content="# v1")
+
+    def always_conflict(metadata, version, expected_version=None):
+        raise mongo_module.SpecVersionConflict(metadata["shortId"], expected_version)
+
+    monkeypatch.setattr(app_module, "save_spec_with_version", always_conflict)
+    resp = client.put("/specmarket/v1/updateSpec", json=_update_body(short_id, "# v2"))
+    assert resp.status_code == 409
+
+
+def test_write_behind_acknowledges_before_mongo_sees_the_write(client, monkeypatch, tmp_path):
+    import sys
+
+    from ai_infra_backend.outbox import SpecOutbox
+
+    box = SpecOutbox(tmp_path / "outbox", fsync=False)
+    box.open()
+    monkeypatch.setattr(sys.modules["ai_infra_backend.app"], "spec_outbox", box)
+    _register_user(client, "behind", "Password123!")
+    short_id = _upload_spec(client, title="Behind", summary="s", category="c", tags="t", content="# v1")
+    resp = client.put("/specmarket/v1/updateSpec", json=_update_body(short_id, "# v2"))
+    assert resp.status_code == 200
+
+    assert short_id not in mongo_module._collection.store
+    detail = client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": short_id}).get_json()["data"]
+    assert detail["version"] == 2
+
+    stats = client.get("/specmarket/v1/admin/outbox", headers={"X-Admin-Token": "dev-admin-token"})
+    assert stats.status_code == 200
+    assert stats.get_json()["data"]["depth"] == 2
+    assert client.get("/specmarket/v1/admin/outbox").status_code == 403
+
+    assert box.drain() == 2
+    assert mongo_module._collection.store[short_id]["version"] == 2
+    assert sorted(mongo_module._history_collection.store[short_id]) == [1, 2]
+
+
+def test_write_behind_delete_records_the_version_current_under_the_lock(client, monkeypatch, tmp_path):
+    import sys
+
+    from ai_infra_backend.outbox import SpecOutbox
+
+    app_module = sys.modules["ai_infra_backend.app"]
+    box = SpecOutbox(tmp_path / "outbox", fsync=False)
+    box.open()
+    monkeypatch.setattr(app_module, "spec_outbox", box)
+    _register_user(client, "deleter", "Password123!")
+    short_id = _upload_spec(client, title="Doomed", summary="s", category="c", tags="t", content="# v1")
+    stale = app_module.repository.get_spec(short_id)
+    assert client.put("/specmarket/v1/updateSpec", json=_update_body(short_id, "# v2")).status_code == 200
+
+    # The handler's first read misses the update, as if it landed just before the lock was taken.
+    reads = iter([stale])
+    get_spec = app_module.repository.get_spec
+    monkeypatch.setattr(app_module.repository, "get_spec", lambda key: next(reads, None) or get_spec(key))
+    assert client.delete("/specmarket/v1/deleteSpec", json={"shortId": short_id}).status_code == 200
+    assert box.pending()[-1]["deletedVersion"] == 2
+
+    assert box.drain() == 3
+    assert short_id not in mongo_module._collection.store
+    assert short_id not in mongo_module._history_collection.store
+
+
+def test_write_behind_import_builds_on_writes_still_in_the_outbox(client, monkeypatch, tmp_path):
+    import sys
+
+    from ai_infra_backend.outbox import SpecOutbox
+
+    box = SpecOutbox(tmp_path / "outbox", fsync=False)
+    box.open()
+    monkeypatch.setattr(sys.modules["ai_infra_backend.app"], "spec_outbox", box)
+    _register_user(client, "queued", "Password123!")
+    short_id = _upload_spec(client, title="Queued", summary="s", category="c", tags="t", content="# v1")
+    assert client.put("/specmarket/v1/updateSpec", json=_update_body(short_id, "# v2")).status_code == 200
+
+    lines = [
+        json.dumps({"shortId": short_id, "title": "Imported", "contentMd": "# v3"}),
+        json.dumps({"title": "Fresh", "contentMd": "# new"}),
+    ]
+    resp = client.post(
+        "/specmarket/v1/importSpecs", data="\n".join(lines) + "\n", content_type="application/x-ndjson"
+    )
+    data = resp.get_json()["data"]
+    assert (data["imported"], data["failed"]) == (2, 0)
+    # Nothing reached MongoDB yet: the import is queued behind the upload and the update.
+    assert short_id not in mongo_module._collection.store
+    assert [entry["op"] for entry in box.pending()] == ["save"] * 4
+    detail = client.get("/specmarket/v1/getSpecDetail", query_string={"shortId": short_id}).get_json()["data"]
+    assert (detail["version"], detail["title"]) == (3, "Imported")
+
+    assert box.drain() == 4
+    assert mongo_module._collection.store[short_id]["version"] == 3
+    assert sorted(mongo_module._history_collection.store[short_id]) == [1, 2, 3]
+
+
+def test_list_specs_facets_count_the_filtered_result_set(client):
+    _register_user(client, "faceter", "Password123!")
+    for title, category, tags in (
+        ("Kernel one", "gpu", "cuda,kernels"),
+        ("Kernel two", "gpu", "cuda"),
+        ("Router", "serving", "cuda,routing"),
+    ):
+        _upload_spec(client, title=title, summary="s", category=category, tags=tags, content="# body")
+
+    resp = client.get("/specmarket/v1/listSpecs", query_string={"tag": "cuda", "facets": "category,tag,author"})
+    data = resp.get_json()["data"]
+    assert data["total"] == 3
+    facets = data["facets"]
+    assert facets["category"] == [{"value": "gpu", "count": 2}, {"value": "serving", "count": 1}]
+    assert facets["tag"][0] == {"value": "cuda", "count": 3}
+    assert {"value": "routing", "count": 1} in facets["tag"]
+    assert facets["author"] == [{"value": "@faceter", "count": 3}]
+
+    searched = client.get("/specmarket/v1/listSpecs", query_string={"q": "kernel", "facets": "category"})
+    assert searched.get_json()["data"]["facets"] == {"category": [{"value": "gpu", "count": 2}]}
+
+    assert "facets" not in client.get("/specmarket/v1/listSpecs").get_json()["data"]
+    bad = client.get("/specmarket/v1/listSpecs", query_string={"facets": "title"})
+    assert bad.status_code == 400
+    assert bad.get_json()["status_code"] == BusinessErrorCode.INVALID_ARG
+
+
+def test_suggest_completes_titles_tags_and_authors_by_frequency(client):
+    _register_user(client, "suggester", "Password123!")
+    uploads = (("Triton kernels", "triton,tensorrt"), ("Triton serving", "triton"), ("TensorRT notes", "tensorrt"))
+    short_ids = {
+        title: _upload_spec(client, title=title, summary="s", category="gpu", tags=tags, content="# body")
+        for title, tags in uploads
+    }
+
+    items = client.get("/specmarket/v1/suggest", query_string={"q": "  TRI"}).get_json()["data"]["items"]
+    assert items[0] == {"value": "triton", "field": "tag", "count": 2}
+    assert {"value": "Triton kernels", "field": "title", "count": 1} in items
+
+    limited = client.get("/specmarket/v1/suggest", query_string={"q": "t", "limit": 2}).get_json()["data"]["items"]
+    assert len(limited) == 2
+    authors = client.get("/specmarket/v1/suggest", query_string={"q": "@sugg"}).get_json()["data"]["items"]
+    assert authors == [{"value": "@suggester", "field": "author", "count": 3}]
+
+    assert client.delete("/specmarket/v1/deleteSpec", json={"shortId": short_ids["Triton serving"]}).status_code == 200
+    items = client.get("/specmarket/v1/suggest", query_string={"q": "triton "}).get_json()["data"]["items"]
+    assert items == [{"value": "Triton kernels", "field": "title", "count": 1}]
+
+    assert client.get("/specmarket/v1/suggest", query_string={"q": " "}).get_json()["data"]["items"] == []
+    assert client.get("/specmarket/v1/suggest", query_string={"q": "t", "limit": "x"}).status_code == 400
+
+
+def test_fuzzy_search_tolerates_typos_and_follows_writes(client):
+    _register_user(client, "fuzzer", "Password123!")
+    torch_id = _upload_spec(
+        client, title="PyTorch distributed training", summary="FSDP recipes", category="ml", tags="pytorch", content="#"
+    )
+    _upload_spec(client, title="Triton kernels", summary="Fused attention", category="ml", tags="triton", content="#")
+
+    def titles(**params):
+        data = client.get("/specmarket/v1/listSpecs", query_string=params).get_json()["data"]
+        return [item["title"] for item in data["items"]]
+
+    assert titles(q="pytroch") == []
+    assert titles(q="pytroch", fuzzy="1") == ["PyTorch distributed training"]
+    assert titles(q="distribted pytorch", fuzzy="1") == ["PyTorch distributed training"]
+    assert titles(q="distribted tritn", fuzzy="1") == []
+    assert titles(q="kernels", fuzzy="1") == ["Triton kernels"]
+
+    # Expansions match whole words: "cat" reaches "car", which must not match inside "scarce".
+    _upload_spec(client, title="Car telemetry", summary="Fleet sensors", category="ml", tags="iot", content="#")
+    _upload_spec(client, title="Scarce GPU budgets", summary="Quota planning", category="ml", tags="gpu", content="#")
+    assert titles(q="cat", fuzzy="1") == ["Car telemetry"]
+
+    assert client.delete("/specmarket/v1/deleteSpec", json={"shortId": torch_id}).status_code == 200
+    assert titles(q="pytroch", fuzzy="1") == []
+
+
+def test_related_specs_come_from_the_precomputed_index(client):
+    _register_user(client, "relator", "Password123!")
+    ids = {
+        title: _upload_spec(client, title=title, summary=summary, category="ml", tags=tags, content=content)
+        for title, summary, tags, content in (
+            ("Flash attention kernels", "Fused attention on GPUs", "cuda,attention", "# Tiling\nwarp shared memory"),
+            ("Paged attention", "KV cache paging for attention", "attention,cuda", "# Blocks\nshared memory warp"),
+            ("Parquet ingestion", "Batch loading into the lake", "data", "# Schema\nlineage partitions"),
+        )
+    }
+    from ai_infra_backend import repository as repository_module
+
+    repository_module.repository.related.refresh()
+
+    resp = client.get("/specmarket/v1/getRelatedSpecs", query_string={"shortId": ids["Flash attention kernels"]})
+    assert resp.status_code == 200
+    items = resp.get_json()["data"]["items"]
+    assert items[0]["shortId"] == ids["Paged attention"]
+    assert 0 < items[0]["score"] <= 1
+    assert ids["Parquet ingestion"] not in {item["shortId"] for item in items}
+
+    missing = client.get("/specmarket/v1/getRelatedSpecs", query_string={"shortId": "Z9Z9Z9Z9Z9Z9Z9Z9"})
+    assert missing.status_code == 404
+    assert client.get("/specmarket/v1/getRelatedSpecs").status_code == 400
+
+
+def test_upload_warns_about_near_duplicates_and_can_reject_them(client):
+    _register_user(client, "copier", "Password123!")
+    body = "# Serving\n" + " ".join(f"step {index} batches requests for the decoder" for index in range(60))
+    original = _upload_spec(client, title="Serving guide", summary="s", category="ml", tags="llm", content=body)
+
+    resp = client.post(
+        "/specmarket/v1/uploadSpec",
+        data={"title": "Copied guide", "file": (io.BytesIO((body + " thanks").encode("utf-8")), "copy.md")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 201
+    duplicates = resp.get_json()["data"]["nearDuplicates"]
+    assert [item["shortId"] for item in duplicates] == [original]
+    assert duplicates[0]["title"] == "Serving guide" and 0.8 <= duplicates[0]["similarity"] <= 1
+
+    rejected = client.post(
+        "/specmarket/v1/uploadSpec",
+        data={"title": "Third copy", "rejectDuplicates": "true", "file": (io.BytesIO(body.encode("utf-8")), "c.md")},
+        content_type="multipart/form-data",
+    )
+    assert rejected.status_code == 409
+    assert original in {item["shortId"] for item in rejected.get_json()["data"]["nearDuplicates"]}
+
+    # A new version is not compared with the spec it replaces; the copy uploaded above still counts.
+    update = client.post(
+        "/specmarket/v1/uploadSpec",
+        data={"shortId": original, "rejectDuplicates": "1", "file": (io.BytesIO(body.encode("utf-8")), "v2.md")},
+        content_type="multipart/form-data",
+    )
+    assert update.status_code == 409
+    assert {item["shortId"] for item in update.get_json()["data"]["nearDuplicates"]} == {
+        resp.get_json()["data"]["shortId"]
+    }
+
+    distinct = client.post(
+        "/specmarket/v1/uploadSpec",
+        data={"title": "Other", "rejectDuplicates": "1", "file": (io.BytesIO(b"# Lakes\nparquet lineage"), "o.md")},
+        content_type="multipart/form-data",
+    )
+    assert distinct.status_code == 201
+    assert "nearDuplicates" not in distinct.get_json()["data"]
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from benchmarks.repository_bench import compare, run_size
+from benchmarks.synthetic import generate_catalog
+
+
+def test_synthetic_catalog_is_deterministic():
+    first = generate_catalog(25, seed=7)
+    second = generate_catalog(25, seed=7)
+    assert first == second
+    metadata, versions = first
+    assert len(metadata) == 25
+    assert len(versions) >= 25
+    assert all(doc["version"] >= 1 for doc in metadata)
+
+
+def test_repository_benchmark_smoke_and_baseline_compare():
+    results = run_size(40, seed=3, repeat=2)
+    assert {"startup", "list_specs[tag+category+author+updatedSince]", "get_spec_history", "write_spec"} <= set(results)
+
+    current = {"results": {"40": {"list_tags": {"medianMs": 2.0}}}}
+    baseline = {"results": {"40": {"list_tags": {"medianMs": 1.0}}}}
+    assert compare(current, baseline, tolerance=0.5) == ["40/list_tags: 1.0ms -> 2.0ms (x2.00)"]
+    assert current["results"]["40"]["list_tags"]["ratio"] == 2.0
+
+
+def test_loadgen_percentiles_and_mix_parsing():
+    from benchmarks.loadgen import parse_mix, percentile
+
+    samples = [float(value) for value in range(1, 101)]
+    assert percentile(samples, 0.50) == 50.0
+    assert percentile(samples, 0.95) == 95.0
+    assert percentile(samples, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+    assert parse_mix("home=3,detail") == {"home": 3.0, "detail": 1.0}
+
+
+def test_loadgen_runs_against_in_process_server():
+    from benchmarks.loadgen import run_load, serve_in_process
+
+    server = serve_in_process(0, threads=4)
+    try:
+        report = run_load(
+            f"http://127.0.0.1:{server.server_port}",
+            {"home": 2, "detail": 1, "raw": 1},
+            concurrency=2,
+            total_requests=12,
+        )
+    finally:
+        server.shutdown()
+    assert report["overall"]["requests"] == 12
+    assert report["overall"]["errors"] == 0
+    assert set(report["endpoints"]) <= {"home", "detail", "raw"}
+
+
+def test_concurrency_stress_finds_no_inconsistencies():
+    from benchmarks.concurrency_bench import run_stress
+
+    report = run_stress(200, readers=3, writers=2, duration=0.5, seed=11)
+    assert report["errors"] == []
+    assert report["reads"] > 0
+    assert report["writes"] > 0
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import random
+
+from ai_infra_backend.duplicates import DuplicateIndex, signature, signatures, similarity
+
+
+def _document(rng: random.Random, words: int = 400) -> str:
+    vocabulary = [f"word{index}" for index in range(3000)]
+    return " ".join(rng.choices(vocabulary, k=words))
+
+
+def test_signature_similarity_tracks_shared_content():
+    rng = random.Random(5)
+    original = _document(rng)
+    words = original.split()
+    # Rewording a handful of spots leaves most 3-word shingles intact.
+    edited = " ".join("changed" if index % 50 == 0 else word for index, word in enumerate(words))
+    unrelated = _document(rng)
+    assert signature(original) == signature(original.upper().replace(" ", "\n"))
+    assert similarity(signature(original), signature(edited)) >= 0.7
+    assert similarity(signature(original), signature(unrelated)) <= 0.1
+    assert signature("") is None and signature(" \n\t") is None
+
+
+def test_index_finds_near_copies_and_forgets_removed_specs():
+    rng = random.Random(9)
+    corpus = {f"spec{index}": _document(rng) for index in range(200)}
+    index = DuplicateIndex()
+    index.update(corpus.items())
+    assert len(index) == 200
+    query = corpus["spec7"] + " one more closing sentence"
+    assert [short_id for short_id, _ in index.find(query, 0.8)] == ["spec7"]
+    assert index.find(query, 0.8, exclude="spec7") == []
+    assert index.find(_document(rng), 0.5) == []
+
+    index.update([("spec7", _document(rng))], removals=["spec8"])
+    assert index.find(query, 0.8) == []
+    assert index.find(corpus["spec8"], 0.8) == []
+    assert len(index) == 199
+
+
+def test_batched_signatures_match_single_ones():
+    rng = random.Random(3)
+    texts = ["", "one", "two words", "  Three  words here ", *(_document(rng, rng.randint(1, 60)) for _ in range(300))]
+    assert signatures(texts) == [signature(text) for text in texts]
+    assert signatures(texts)[:3] == [None, signature("ONE"), signature("two\nwords")]
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import random
+import string
+
+from ai_infra_backend.fuzzy import DeletionIndex, edit_distance, max_edits, tokenize
+
+
+def _reference_distance(left: str, right: str) -> int:
+    rows = [[i + j if i * j == 0 else 0 for j in range(len(right) + 1)] for i in range(len(left) + 1)]
+    for i in range(1, len(left) + 1):
+        for j in range(1, len(right) + 1):
+            rows[i][j] = min(
+                rows[i - 1][j] + 1,
+                rows[i][j - 1] + 1,
+                rows[i - 1][j - 1] + (left[i - 1] != right[j - 1]),
+            )
+            if i > 1 and j > 1 and left[i - 1] == right[j - 2] and left[i - 2] == right[j - 1]:
+                rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[-1][-1]
+
+
+def test_bounded_edit_distance_agrees_with_the_full_table():
+    rng = random.Random(2)
+    for _ in range(500):
+        left = "".join(rng.choices("abcd", k=rng.randint(0, 7)))
+        right = "".join(rng.choices("abcd", k=rng.randint(0, 7)))
+        expected = _reference_distance(left, right)
+        for limit in (0, 1, 2):
+            assert edit_distance(left, right, limit) == min(expected, limit + 1)
+    assert edit_distance("pytroch", "pytorch", 2) == 1
+
+
+def test_lookup_finds_every_term_within_budget_without_false_hits():
+    rng = random.Random(8)
+    vocabulary = {"".join(rng.choices(string.ascii_lowercase[:6], k=rng.randint(1, 9))): 1 for _ in range(400)}
+    index = DeletionIndex()
+    index.update(added=vocabulary)
+    for _ in range(200):
+        query = "".join(rng.choices(string.ascii_lowercase[:6], k=rng.randint(1, 9)))
+        expected = {}
+        for term in vocabulary:
+            limit = min(max_edits(len(query)), max_edits(len(term)))
+            distance = _reference_distance(query, term)
+            if distance <= limit:
+                expected[term] = distance
+        assert index.lookup(query, vocabulary) == expected
+
+
+def test_removed_and_unknown_terms_are_not_returned():
+    index = DeletionIndex()
+    index.update(added=["transformer", "tensorrt", "triton"])
+    assert index.lookup("Transfromer", {"transformer": 1, "tensorrt": 1}) == {"transformer": 1}
+    # A term still indexed but absent from the caller's snapshot vocabulary is filtered out.
+    assert index.lookup("tensorr", {"transformer": 1}) == {}
+    index.update(removed=["transformer"])
+    assert "transformer" not in index and len(index) == 2
+    assert index.lookup("transformer", {"transformer": 1}) == {}
+    assert tokenize("vLLM-serving, Llama_3.1") == ["vllm", "serving", "llama", "3", "1"]
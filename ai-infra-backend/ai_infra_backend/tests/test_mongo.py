@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+from pymongo import errors
+
+from ai_infra_backend import mongo as mongo_module
+from ai_infra_backend.mongo import CircuitBreaker, MongoUnavailableError, SpecVersionConflict
+
+
+def test_circuit_breaker_opens_after_threshold_and_half_opens_after_reset(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(mongo_module.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5)
+
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+    clock[0] += 5
+    assert breaker.allow_request()
+    assert breaker.state == "half_open"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock[0] += 5
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_fails_writes_without_touching_collection(monkeypatch):
+    calls = []
+    monkeypatch.setattr(mongo_module._collection, "update_one", lambda *args, **kwargs: calls.append(args))
+    mongo_module.circuit_breaker.trip()
+    with pytest.raises(MongoUnavailableError):
+        mongo_module.save_spec_document({"shortId": "A1B2C3D4E5F6G7H8"})
+    assert calls == []
+    assert not mongo_module.mongo_available()
+
+
+def test_connection_errors_feed_the_breaker(monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise errors.ServerSelectionTimeoutError("no servers")
+
+    monkeypatch.setattr(mongo_module._history_collection, "find", unreachable)
+    for _ in range(mongo_module.circuit_breaker.failure_threshold):
+        with pytest.raises(errors.ServerSelectionTimeoutError):
+            mongo_module.list_spec_version_documents("A1B2C3D4E5F6G7H8")
+    assert mongo_module.circuit_breaker.state == "open"
+
+
+def test_server_errors_on_a_half_open_trial_close_the_breaker(monkeypatch):
+    def duplicate(*args, **kwargs):
+        raise errors.DuplicateKeyError("E11000 duplicate key")
+
+    monkeypatch.setattr(mongo_module._collection, "update_one", duplicate)
+    mongo_module.circuit_breaker.trip()
+    monkeypatch.setattr(mongo_module.circuit_breaker, "reset_timeout", 0)
+    with pytest.raises(errors.DuplicateKeyError):
+        mongo_module.save_spec_document({"shortId": "A1B2C3D4E5F6G7H8"})
+    assert mongo_module.circuit_breaker.state == "closed"
+
+
+def test_pool_and_command_listeners_record_metrics():
+    from types import SimpleNamespace
+
+    from prometheus_client import REGISTRY
+
+    from ai_infra_backend.monitoring import CommandMetricsListener, PoolMetricsListener
+
+    def sample(name, labels=None):
+        return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+    checkouts_before = sample("specmarket_mongo_pool_checkout_seconds_count")
+    checked_out_before = sample("specmarket_mongo_pool_checked_out")
+    finds_before = sample("specmarket_mongo_command_duration_seconds_count", {"command": "find", "outcome": "success"})
+
+    pool = PoolMetricsListener()
+    event = SimpleNamespace(address=("localhost", 27017), connection_id=1)
+    pool.connection_check_out_started(event)
+    pool.connection_checked_out(event)
+    assert sample("specmarket_mongo_pool_checked_out") == checked_out_before + 1
+    pool.connection_checked_in(event)
+    assert sample("specmarket_mongo_pool_checkout_seconds_count") == checkouts_before + 1
+    assert sample("specmarket_mongo_pool_checked_out") == checked_out_before
+
+    CommandMetricsListener().succeeded(
+        SimpleNamespace(command_name="find", duration_micros=1500, request_id=1, connection_id=("localhost", 27017))
+    )
+    assert (
+        sample("specmarket_mongo_command_duration_seconds_count", {"command": "find", "outcome": "success"})
+        == finds_before + 1
+    )
+
+
+def test_client_options_follow_settings():
+    from types import SimpleNamespace
+
+    from ai_infra_backend.monitoring import client_options
+
+    options = client_options(
+        SimpleNamespace(
+            mongo_server_selection_timeout_ms=1500,
+            mongo_max_pool_size=32,
+            mongo_min_pool_size=4,
+            mongo_max_idle_time_ms=60000,
+            mongo_wait_queue_timeout_ms=0,
+            mongo_compressors="zstd, zlib",
+        )
+    )
+    assert options["maxPoolSize"] == 32
+    assert options["minPoolSize"] == 4
+    assert options["maxIdleTimeMS"] == 60000
+    assert "waitQueueTimeoutMS" not in options
+    assert options["compressors"] == "zstd,zlib"
+    assert len(options["event_listeners"]) == 2
+
+
+class _RecordingCollection:
+    def __init__(self, name, log, fail=False):
+        self.name = name
+        self.log = log
+        self.fail = fail
+
+    def insert_one(self, document, session=None):
+        self.log.append((self.name, session))
+
+    def update_one(self, filter, update, upsert=False, session=None):
+        if self.fail:
+            raise errors.OperationFailure("write failed")
+        self.log.append((self.name, session))
+        return SimpleNamespace(matched_count=1)
+
+
+def _fake_client(topology, log):
+    class Session:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def with_transaction(self, callback):
+            log.append(("begin", None))
+            callback(self)
+            log.append(("commit", None))
+
+    return SimpleNamespace(
+        topology_description=SimpleNamespace(topology_type_name=topology),
+        start_session=Session,
+    )
+
+
+def test_save_spec_with_version_uses_transaction_on_replica_sets(monkeypatch):
+    log = []
+    monkeypatch.setattr(mongo_module, "_client", _fake_client("ReplicaSetWithPrimary", log))
+    monkeypatch.setattr(mongo_module, "_collection", _RecordingCollection("specs", log))
+    monkeypatch.setattr(mongo_module, "_history_collection", _RecordingCollection("spec_versions", log))
+    mongo_module.save_spec_with_version(
+        {"shortId": "A1B2C3D4E5F6G7H8"}, {"shortId": "A1B2C3D4E5F6G7H8", "version": 2}, expected_version=1
+    )
+    assert [entry[0] for entry in log] == ["begin", "spec_versions", "specs", "commit"]
+    assert log[1][1] is not None and log[1][1] is log[2][1]
+
+
+def test_save_spec_with_version_writes_version_first_on_standalone(monkeypatch):
+    log = []
+    monkeypatch.setattr(mongo_module, "_client", _fake_client("Single", log))
+    monkeypatch.setattr(mongo_module, "_collection", _RecordingCollection("specs", log, fail=True))
+    monkeypatch.setattr(mongo_module, "_history_collection", _RecordingCollection("spec_versions", log))
+    with pytest.raises(errors.OperationFailure):
+        mongo_module.save_spec_with_version(
+            {"shortId": "A1B2C3D4E5F6G7H8"}, {"shortId": "A1B2C3D4E5F6G7H8", "version": 2}
+        )
+    # The metadata write failed, so only an unreferenced version exists.
+    assert log == [("spec_versions", None)]
+
+
+def test_save_spec_with_version_in_memory():
+    metadata = {"shortId": "A1B2C3D4E5F6G7H8", "version": 1}
+    version = {"shortId": "A1B2C3D4E5F6G7H8", "version": 1, "contentMd": "# body"}
+    mongo_module.save_spec_with_version(metadata, version)
+    assert mongo_module._collection.store["A1B2C3D4E5F6G7H8"] == metadata
+    assert mongo_module._history_collection.store["A1B2C3D4E5F6G7H8"][1] == version
+
+
+def test_save_spec_with_version_compare_and_set():
+    short_id = "A1B2C3D4E5F6G7H8"
+    mongo_module.save_spec_with_version({"shortId": short_id, "version": 1}, {"shortId": short_id, "version": 1})
+    mongo_module.save_spec_with_version(
+        {"shortId": short_id, "version": 2}, {"shortId": short_id, "version": 2}, expected_version=1
+    )
+    # A second writer that also read version 1 loses on the unique (shortId, version) backstop.
+    with pytest.raises(SpecVersionConflict):
+        mongo_module.save_spec_with_version(
+            {"shortId": short_id, "version": 2, "title": "stale"}, {"shortId": short_id, "version": 2}, expected_version=1
+        )
+    # A writer whose version is free but whose base is stale loses on the metadata check and leaves nothing behind.
+    with pytest.raises(SpecVersionConflict):
+        mongo_module.save_spec_with_version(
+            {"shortId": short_id, "version": 4}, {"shortId": short_id, "version": 4}, expected_version=3
+        )
+    assert sorted(mongo_module._history_collection.store[short_id]) == [1, 2]
+    assert mongo_module._collection.store[short_id] == {"shortId": short_id, "version": 2}
+
+
+def test_bulk_save_spec_versions_compare_and_set():
+    first, second = "A1B2C3D4E5F6G7H8", "Z9Y8X7W6V5U4T3S2"
+
+    def write(short_id, version, expected, title="t"):
+        document = {"shortId": short_id, "version": version, "title": title}
+        return document, dict(document, contentMd=f"# {title}"), expected
+
+    batch = [write(first, 1, None), write(first, 2, 1), write(second, 1, None)]
+    assert mongo_module.bulk_save_spec_versions(batch) == set()
+    # Replaying the same batch (a retry after a dropped connection) is not a conflict.
+    assert mongo_module.bulk_save_spec_versions(batch) == set()
+    # Another writer already holds version 3 of the first spec: that write and the one built on it conflict.
+    mongo_module.save_spec_with_version(*write(first, 3, 2, title="theirs"))
+    conflicts = mongo_module.bulk_save_spec_versions(
+        [write(first, 3, 2, title="mine"), write(first, 4, 3, title="mine"), write(second, 2, 1)]
+    )
+    assert conflicts == {0, 1}
+    assert mongo_module._collection.store[first]["title"] == "theirs"
+    assert sorted(mongo_module._history_collection.store[first]) == [1, 2, 3]
+    assert mongo_module._collection.store[second]["version"] == 2
+    # A stale base with a free version number loses on the metadata check and leaves nothing behind.
+    assert mongo_module.bulk_save_spec_versions([write(second, 5, 4)]) == {0}
+    assert sorted(mongo_module._history_collection.store[second]) == [1, 2]
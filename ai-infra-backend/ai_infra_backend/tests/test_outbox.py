@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import importlib
+
+import pytest
+from bson import json_util
+from pymongo import errors as pymongo_errors
+
+from ai_infra_backend import mongo as mongo_module
+from ai_infra_backend import outbox as outbox_module
+from ai_infra_backend.models import spec_metadata_to_document, spec_version_to_document
+from ai_infra_backend.outbox import SpecOutbox
+
+SHORT_ID = "Q1W2E3R4T5Y6U7I8"
+
+
+def _documents(version: int):
+    metadata = {"shortId": SHORT_ID, "title": f"v{version}", "version": version}
+    return metadata, dict(metadata, contentMd=f"# v{version}")
+
+
+def test_unflushed_entries_are_replayed_by_the_next_process(tmp_path):
+    first = SpecOutbox(tmp_path, fsync=False)
+    assert first.open() == []
+    first.save(*_documents(1))
+    first.save(*_documents(2))
+    assert first.flush_once() == 2
+    first.save(*_documents(3))
+    first.delete(SHORT_ID)
+    first._file.close()  # simulate the worker dying with two writes still pending
+
+    second = SpecOutbox(tmp_path, fsync=False)
+    replayed = second.open()
+    assert [(entry["op"], entry["seq"]) for entry in replayed] == [("save", 3), ("delete", 4)]
+    assert second.save(*_documents(4))["seq"] == 5
+
+
+def test_each_process_claims_its_own_outbox_file(tmp_path):
+    first = SpecOutbox(tmp_path, fsync=False)
+    second = SpecOutbox(tmp_path, fsync=False)
+    first.open()
+    second.open()
+    assert first.path != second.path
+
+
+def test_flush_batches_saves_and_keeps_entries_until_mongo_accepts_them(tmp_path, monkeypatch):
+    box = SpecOutbox(tmp_path, fsync=False)
+    box.open()
+    box.save(*_documents(1))
+    box.save(*_documents(2))
+    box.delete(SHORT_ID)
+
+    def unavailable(pairs):
+        raise pymongo_errors.AutoReconnect("down")
+
+    monkeypatch.setattr(outbox_module, "bulk_save_spec_versions", unavailable)
+    assert box.flush_once() == 0
+    stats = box.stats()
+    assert stats["depth"] == 3
+    assert stats["consecutiveFailures"] == 1
+    assert stats["lastError"] == "down"
+    monkeypatch.undo()
+
+    assert box.flush_once() == 2
+    assert mongo_module._collection.store[SHORT_ID]["version"] == 2
+    assert sorted(mongo_module._history_collection.store[SHORT_ID]) == [1, 2]
+    assert box.flush_once() == 1
+    assert SHORT_ID not in mongo_module._collection.store
+    assert box.stats()["depth"] == 0
+    assert box.path.stat().st_size == 0
+    assert SpecOutbox(tmp_path, fsync=False).open() == []
+
+
+@pytest.mark.parametrize("line", [b"{\"seq\": 1, \"op\"", b"not json"])
+def test_torn_lines_are_skipped_on_replay(tmp_path, line):
+    (tmp_path / "outbox-0.jsonl").write_bytes(line + b"\n")
+    assert SpecOutbox(tmp_path, fsync=False).open() == []
+
+
+def test_orphaned_slot_files_are_adopted_on_startup(tmp_path):
+    first, second = SpecOutbox(tmp_path, fsync=False), SpecOutbox(tmp_path, fsync=False)
+    first.open()
+    second.open()
+    second.save(*_documents(1))
+    second.save(*_documents(2))
+    first._file.close()
+    second._file.close()  # both workers die; only one comes back
+
+    survivor = SpecOutbox(tmp_path, fsync=False)
+    replayed = survivor.open()
+    assert survivor.path == first.path
+    assert [entry["version"]["version"] for entry in replayed] == [1, 2]
+    assert second.path.stat().st_size == 0
+    assert survivor.drain() == 2
+    assert mongo_module._collection.store[SHORT_ID]["version"] == 2
+
+
+def test_lost_races_and_rejected_documents_go_to_the_dead_letter_file(tmp_path, monkeypatch):
+    box = SpecOutbox(tmp_path, fsync=False)
+    box.open()
+    dead = []
+    box.on_dead_letter = dead.extend
+    mongo_module.save_spec_with_version(*_documents(1))
+    theirs = [dict(document, title="theirs") for document in _documents(2)]
+    mongo_module.save_spec_with_version(*theirs, expected_version=1)
+    box.save(*_documents(2))  # built on version 1, but another worker wrote version 2 first
+    box.save(*_documents(3))
+
+    real_bulk_save = outbox_module.bulk_save_spec_versions
+
+    def rejects_version_three(items):
+        if any(version["version"] == 3 for _, version, _ in items):
+            raise pymongo_errors.BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "invalid"}]})
+        return real_bulk_save(items)
+
+    monkeypatch.setattr(outbox_module, "bulk_save_spec_versions", rejects_version_three)
+    assert box.flush_once() == 2
+    assert [entry["version"]["version"] for entry in dead] == [2, 3]
+    assert box.stats()["depth"] == 0 and box.stats()["deadLettered"] == 2
+    lines = box.path.with_suffix(".dead").read_text().splitlines()
+    assert "version conflict" in lines[0] and "invalid" in lines[1]
+    assert mongo_module._history_collection.store[SHORT_ID][2]["title"] == "theirs"
+    assert sorted(mongo_module._history_collection.store[SHORT_ID]) == [1, 2]
+
+
+def test_stale_delete_leaves_a_newer_version_from_another_worker(tmp_path):
+    box = SpecOutbox(tmp_path, fsync=False)
+    box.open()
+    dead = []
+    box.on_dead_letter = dead.extend
+    mongo_module.save_spec_with_version(*_documents(1))
+    box.delete(SHORT_ID, version=1)
+    assert mongo_module.bulk_save_spec_versions([(*_documents(2), 1)]) == set()
+
+    assert box.drain() == 1
+    assert mongo_module._collection.find_one({"shortId": SHORT_ID})["version"] == 2
+    assert sorted(mongo_module._history_collection.store[SHORT_ID]) == [1, 2]
+    assert [entry["op"] for entry in dead] == ["delete"]
+
+    box.delete(SHORT_ID, version=2)
+    assert box.drain() == 1
+    assert mongo_module._collection.find_one({"shortId": SHORT_ID}) is None
+    assert SHORT_ID not in mongo_module._history_collection.store
+
+
+def test_log_is_compacted_past_the_applied_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbox_module, "COMPACT_AFTER", 2)
+    box = SpecOutbox(tmp_path, batch_size=2, fsync=False)
+    box.open()
+    for version in (1, 2, 3):
+        box.save(*_documents(version))
+    assert box.flush_once() == 2
+    assert [json_util.loads(line)["seq"] for line in box.path.read_bytes().splitlines()] == [3]
+    box._file.close()
+    assert [entry["seq"] for entry in SpecOutbox(tmp_path, fsync=False).open()] == [3]
+
+
+def test_replay_skips_entries_the_catalog_has_moved_past():
+    # The package exports the Flask app as ``app``, which shadows the module.
+    app_module = importlib.import_module("ai_infra_backend.app")
+
+    repository = app_module.repository
+    seeded = repository.get_spec("A1B2C3D4E5F6G7H8")
+    metadata = spec_metadata_to_document(seeded)
+    version = spec_version_to_document(seeded)
+    stale = {"op": "save", "shortId": seeded.shortId, "metadata": dict(metadata, title="Old"), "version": version}
+    app_module.apply_outbox_entries([stale, {"op": "delete", "shortId": seeded.shortId, "deletedVersion": 0}])
+    assert repository.get_spec(seeded.shortId).title == seeded.title
+
+    newer = {
+        "op": "save",
+        "shortId": seeded.shortId,
+        "metadata": dict(metadata, title="New", version=2),
+        "version": dict(version, title="New", version=2),
+    }
+    app_module.apply_outbox_entries([newer])
+    assert (repository.get_spec(seeded.shortId).version, repository.get_spec(seeded.shortId).title) == (2, "New")
+    app_module.apply_outbox_entries([{"op": "delete", "shortId": seeded.shortId, "deletedVersion": 2}])
+    assert repository.get_spec(seeded.shortId) is None
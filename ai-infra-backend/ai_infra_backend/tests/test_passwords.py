@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import threading
+
+import bcrypt
+import pytest
+
+from ai_infra_backend.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def test_hash_and_verify_round_trip():
+    hasher = PasswordHasher(rounds=4, max_workers=1, queue_limit=1, timeout=5)
+    hashed = hasher.hash("Password123!")
+    assert hashed.startswith("$2b$04$")
+    assert hasher.verify("Password123!", hashed)
+    assert not hasher.verify("wrong-password", hashed)
+    assert not hasher.needs_rehash(hashed)
+    assert PasswordHasher(rounds=5, max_workers=1, queue_limit=0, timeout=5).needs_rehash(hashed)
+
+
+def test_saturated_queue_rejects_immediately():
+    hasher = PasswordHasher(rounds=4, max_workers=1, queue_limit=0, timeout=5)
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking(*_args):
+        started.set()
+        release.wait(5)
+        return True
+
+    worker = threading.Thread(target=hasher._run, args=("verify", blocking))
+    worker.start()
+    assert started.wait(5)
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            hasher.verify("Password123!", bcrypt.hashpw(b"Password123!", bcrypt.gensalt(4)).decode())
+    finally:
+        release.set()
+        worker.join(5)
+    assert hasher.verify("Password123!", hasher.hash("Password123!"))
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from ai_infra_backend import persistent
+from ai_infra_backend.persistent import PersistentList, PersistentMap, PersistentSortedList
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Tiny buckets and chunks, so a few hundred operations exercise growing and splitting.
+    monkeypatch.setattr(persistent, "BUCKET_LOAD", 2)
+    monkeypatch.setattr(persistent, "LIST_CHUNK_BITS", 2)
+    monkeypatch.setattr(persistent, "SORTED_CHUNK", 4)
+
+
+def test_map_edits_match_a_dict_and_leave_the_base_alone():
+    rng = random.Random(1)
+    current: PersistentMap[int, int] = PersistentMap()
+    expected = {}
+    history = []
+    for _ in range(60):
+        editor = current.edit()
+        for _ in range(rng.randint(1, 8)):
+            key = rng.randrange(120)
+            if key in expected and rng.random() < 0.4:
+                del editor[key]
+                del expected[key]
+            else:
+                editor[key] = expected[key] = rng.random()
+        history.append((current, dict(current.items())))
+        current = editor.freeze()
+        assert dict(current.items()) == expected and len(current) == len(expected)
+        assert current.pick(list(expected)) == list(expected.values())
+    for snapshot, contents in history:
+        assert dict(snapshot.items()) == contents
+
+
+def test_list_edits_match_a_list_and_leave_the_base_alone():
+    base: PersistentList[int] = PersistentList()
+    editor = base.edit()
+    for value in range(10):
+        editor.append(value)
+    first = editor.freeze()
+    editor = first.edit()
+    editor[3] = 30
+    editor.append(10)
+    second = editor.freeze()
+    assert list(first) == list(range(10)) and len(base) == 0
+    assert list(second) == [0, 1, 2, 30, 4, 5, 6, 7, 8, 9, 10]
+    assert second.pick([10, 3, 0]) == [10, 30, 0]
+    with pytest.raises(IndexError):
+        second[11]
+
+
+def test_sorted_list_edits_match_a_sorted_list_and_leave_the_base_alone():
+    rng = random.Random(2)
+    current: PersistentSortedList[int] = PersistentSortedList()
+    expected = []
+    history = []
+    for step in range(80):
+        editor = current.edit()
+        # Mostly small batches that are insorted; every tenth is large enough to be merged with a sort.
+        fresh = rng.sample(range(step * 1000, step * 1000 + 900), 60 if step % 10 == 9 else rng.randint(0, 3))
+        editor.update(fresh)
+        expected.extend(fresh)
+        for key in rng.sample(expected, min(len(expected), rng.randint(0, 2))):
+            editor.remove(key)
+            expected.remove(key)
+        history.append((current, list(current)))
+        current = editor.freeze()
+        expected.sort()
+        assert list(current) == expected and len(current) == len(expected)
+        assert list(reversed(current)) == expected[::-1]
+        low, high = sorted(rng.sample(range(step * 1000 + 1000), 2))
+        assert current.irange(low, high) == [key for key in expected if low <= key < high]
+    for snapshot, contents in history:
+        assert list(snapshot) == contents
+    with pytest.raises(ValueError):
+        current.edit().remove(-1)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from ai_infra_backend.models import Spec, SpecMetadata
+from ai_infra_backend.related import RelatedIndex, term_counts
+from ai_infra_backend.snapshot import CatalogSnapshot
+from ai_infra_backend.utils import derive_short_id
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+TOPICS = {
+    "gpu": "cuda kernel warp occupancy tensor core fused attention",
+    "serving": "router replica autoscale latency batching gateway",
+    "data": "parquet shard pipeline ingestion schema lineage",
+}
+
+
+def _entry(index: int, rng: random.Random, topic: str | None = None):
+    topic = topic or rng.choice(sorted(TOPICS))
+    words = TOPICS[topic].split()
+    spec = Spec(
+        title=f"{topic} note {index}",
+        shortId=derive_short_id(f"related-{index}"),
+        summary=" ".join(rng.sample(words, 3)),
+        category=topic,
+        tags=[topic],
+        author="@qa",
+        createdAt=EPOCH,
+        updatedAt=EPOCH + timedelta(minutes=index),
+        contentMd=" ".join(rng.choices(words, k=40)),
+    )
+    return spec, SpecMetadata(**spec.dict(exclude={"contentMd", "contentHash"}))
+
+
+def _brute_force(index: RelatedIndex, snapshot: CatalogSnapshot):
+    specs = list(snapshot.specs.values())
+    vectors = index._vectors([term_counts(spec) for spec in specs])
+    scores = vectors @ vectors.T
+    np.fill_diagonal(scores, -np.inf)
+    expected = {}
+    for row, spec in enumerate(specs):
+        expected[spec.shortId] = {
+            specs[column].shortId: round(float(score), 4) for column, score in enumerate(scores[row]) if score > 0
+        }
+    return expected
+
+
+def test_incremental_updates_keep_exact_top_k_under_the_fitted_vocabulary():
+    rng = random.Random(4)
+    live = {index: _entry(index, rng) for index in range(80)}
+    state = {"snapshot": CatalogSnapshot().replace(1, live.values())}
+    index = RelatedIndex(lambda: state["snapshot"], top_k=5)
+    assert index.neighbors(live[0][0].shortId) is None
+    index.refresh()
+    assert index.ready
+
+    for step in range(12):
+        if step % 3 == 2:
+            removed = live.pop(rng.choice(sorted(live)))[0].shortId
+            state["snapshot"] = state["snapshot"].replace(step + 2, removals=[removed])
+            index.mark_changed([removed])
+        else:
+            number = rng.randrange(200)
+            live[number] = _entry(number, rng)
+            state["snapshot"] = state["snapshot"].replace(step + 2, [live[number]])
+            index.mark_changed([live[number][0].shortId])
+        index.refresh()
+
+    assert index._changes_since_rebuild == 12  # all applied incrementally, no rebuild
+    expected = _brute_force(index, state["snapshot"])
+    for short_id in state["snapshot"].specs:
+        neighbors = index.neighbors(short_id)
+        assert len(neighbors) == 5
+        assert [score for _, score in neighbors] == sorted(expected[short_id].values(), reverse=True)[:5]
+        assert all(expected[short_id][other] == score for other, score in neighbors)
+
+
+def test_neighbors_share_a_topic_and_deleted_specs_disappear():
+    rng = random.Random(1)
+    entries = [_entry(index, rng, topic) for index, topic in enumerate(sorted(TOPICS) * 4)]
+    state = {"snapshot": CatalogSnapshot().replace(1, entries)}
+    index = RelatedIndex(lambda: state["snapshot"], top_k=3)
+    index.refresh()
+    by_id = {spec.shortId: spec for spec, _ in entries}
+    for spec, _ in entries:
+        assert {by_id[other].category for other, _ in index.neighbors(spec.shortId)} == {spec.category}
+
+    gone = entries[0][0].shortId
+    state["snapshot"] = state["snapshot"].replace(2, removals=[gone])
+    index.mark_changed([gone])
+    index.refresh()
+    assert index.neighbors(gone) == ()
+    assert all(gone not in dict(index.neighbors(short_id)) for short_id in state["snapshot"].specs)
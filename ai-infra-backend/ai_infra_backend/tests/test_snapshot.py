@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ai_infra_backend import persistent
+from ai_infra_backend.models import Spec, SpecMetadata
+from ai_infra_backend.snapshot import CatalogSnapshot
+from ai_infra_backend.utils import derive_short_id
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _entry(index: int, rng: random.Random, version: int = 1):
+    updated_at = EPOCH + timedelta(hours=rng.randint(0, 48))  # plenty of equal timestamps
+    spec = Spec(
+        title=f"Spec {index}",
+        shortId=derive_short_id(f"snapshot-{index}"),
+        summary="s",
+        category=rng.choice(["a", "b", "c"]),
+        tags=rng.sample(["x", "y", "z", "w"], rng.randint(0, 3)),
+        author="@qa",
+        createdAt=EPOCH,
+        updatedAt=updated_at,
+        version=version,
+        contentMd="# body",
+    )
+    metadata = SpecMetadata(**spec.dict(exclude={"contentMd", "contentHash"}))
+    return spec, metadata
+
+
+@pytest.mark.parametrize("tiny", [False, True])
+def test_incremental_replace_matches_a_full_rebuild(monkeypatch, tiny):
+    if tiny:
+        # Splits sorted chunks, grows maps and fills list chunks many times over.
+        monkeypatch.setattr(persistent, "BUCKET_LOAD", 2)
+        monkeypatch.setattr(persistent, "LIST_CHUNK_BITS", 2)
+        monkeypatch.setattr(persistent, "SORTED_CHUNK", 4)
+    rng = random.Random(5)
+    entries = {index: _entry(index, rng) for index in range(60)}
+    snapshot = CatalogSnapshot().replace(1, entries.values())
+    live = dict(entries)
+    for step in range(200):
+        index = rng.randrange(80)
+        if index in live and rng.random() < 0.3:
+            snapshot = snapshot.replace(step + 2, removals=[live.pop(index)[0].shortId])
+        else:
+            live[index] = _entry(index, rng, version=step + 2)
+            snapshot = snapshot.replace(step + 2, [live[index]])
+
+    # Rebuilding in the surviving specs' catalog order must give identical indexes.
+    rebuilt = CatalogSnapshot().replace(
+        0, [(spec, snapshot.metadata[short_id]) for short_id, spec in snapshot.specs.items()]
+    )
+    assert snapshot.specs.keys() == {spec.shortId for spec, _ in live.values()}
+    assert dict(snapshot.category_counts) == dict(rebuilt.category_counts)
+    assert dict(snapshot.tag_counts) == dict(rebuilt.tag_counts)
+    assert [spec.shortId for spec in snapshot.iter_newest()] == [spec.shortId for spec in rebuilt.iter_newest()]
+    assert snapshot.suggest("", 1000) == rebuilt.suggest("", 1000)
+    assert dict(snapshot.vocabulary) == dict(rebuilt.vocabulary)
+    newest = list(snapshot.iter_newest())
+    assert all(a.updatedAt >= b.updatedAt for a, b in zip(newest, newest[1:]))
+    assert 0 not in snapshot.category_counts.values()
+
+
+def test_published_snapshots_are_never_modified():
+    rng = random.Random(9)
+    spec, metadata = _entry(1, rng)
+    first = CatalogSnapshot().replace(1, [(spec, metadata)])
+    second = first.replace(2, removals=[spec.shortId])
+    assert spec.shortId in first.specs and len(first) == 1
+    assert len(second) == 0 and not second.category_counts
+    assert (first.generation, second.generation) == (1, 2)
+
+
+def test_bitmap_filters_and_pages_match_a_scan():
+    rng = random.Random(3)
+    snapshot = CatalogSnapshot().replace(1, [_entry(index, rng) for index in range(300)])
+    specs = list(snapshot.specs.values())
+    since = EPOCH + timedelta(hours=20, minutes=30)
+    bits = snapshot.bits("category", "a") & snapshot.bits("tag", "x") & snapshot.updated_since_bits(since)
+    expected = [spec for spec in specs if spec.category == "a" and "x" in spec.tags and spec.updatedAt >= since]
+    assert bits.bit_count() == len(expected)
+    ordered = snapshot.select(bits)
+    assert {spec.shortId for spec in ordered} == {spec.shortId for spec in expected}
+    expected_ids = {spec.shortId for spec in expected}
+    assert [spec.shortId for spec in ordered] == [
+        spec.shortId for spec in snapshot.iter_newest() if spec.shortId in expected_ids
+    ]
+    # Sparse and dense matches take different paths; both must agree with the full ordering.
+    for sample in (bits, snapshot.bits("category", "b"), snapshot.live):
+        full = snapshot.select(sample)
+        assert snapshot.page(sample, 5, 15) == full[5:15]
+    assert snapshot.updated_since_bits(EPOCH - timedelta(days=1)) == snapshot.live
+    assert snapshot.updated_since_bits(EPOCH + timedelta(days=3)) == 0
+
+
+def test_deleted_slots_are_reused():
+    rng = random.Random(4)
+    entries = [_entry(index, rng) for index in range(10)]
+    snapshot = CatalogSnapshot().replace(1, entries)
+    freed = snapshot.slot(entries[3][0].shortId)
+    snapshot = snapshot.replace(2, removals=[entries[3][0].shortId])
+    assert not snapshot.live >> freed & 1
+    newcomer = _entry(99, rng)
+    snapshot = snapshot.replace(3, [newcomer])
+    assert snapshot.slot(newcomer[0].shortId) == freed
+    assert snapshot.live.bit_count() == 10
+    assert snapshot.bits("category", newcomer[0].category) >> freed & 1
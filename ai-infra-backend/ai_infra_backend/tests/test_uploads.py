@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import hashlib
+import io
+
+import pytest
+
+from ai_infra_backend.uploads import UploadNotUtf8, UploadTooLarge, markdown_from_text, read_markdown_upload
+
+
+def test_read_markdown_upload_decodes_across_chunk_boundaries():
+    text = "# Título\n" + "数据" * 500
+    raw = text.encode("utf-8")
+    upload = read_markdown_upload(io.BytesIO(raw), max_bytes=len(raw), chunk_size=7)
+    assert upload.content == text
+    assert upload.size == len(raw)
+    assert upload.content_hash == hashlib.sha256(raw).hexdigest()
+    assert markdown_from_text(text, len(raw)).content_hash == upload.content_hash
+
+
+def test_read_markdown_upload_stops_at_limit():
+    class Source(io.BytesIO):
+        read_bytes = 0
+
+        def read(self, size=-1):
+            chunk = super().read(size)
+            Source.read_bytes += len(chunk)
+            return chunk
+
+    with pytest.raises(UploadTooLarge):
+        read_markdown_upload(Source(b"x" * 10_000), max_bytes=100, chunk_size=64)
+    assert Source.read_bytes == 128
+
+
+@pytest.mark.parametrize("raw", [b"ok \xff\xfe broken", "truncated é".encode("utf-8")[:-1]])
+def test_read_markdown_upload_rejects_invalid_utf8(raw):
+    with pytest.raises(UploadNotUtf8):
+        read_markdown_upload(io.BytesIO(raw), max_bytes=1024, chunk_size=4)
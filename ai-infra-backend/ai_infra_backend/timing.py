@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from typing import Dict, Optional
+
+from flask import g, has_request_context
+
+logger = logging.getLogger("ai_infra_backend.timing")
+
+
+class span:
+    """Accumulate wall time for a request stage into ``g.timings`` (no-op when timing is off)."""
+
+    __slots__ = ("name", "_timings", "_started_at")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._timings: Optional[Dict[str, float]] = None
+        self._started_at = 0.0
+
+    def __enter__(self) -> "span":
+        if has_request_context():
+            self._timings = g.get("timings")
+        if self._timings is not None:
+            self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._timings is not None:
+            elapsed_ms = (time.perf_counter() - self._started_at) * 1000
+            self._timings[self.name] = self._timings.get(self.name, 0.0) + elapsed_ms
+
+
+def start_request_timing() -> None:
+    g.timings = {}
+
+
+def format_server_timing(timings: Dict[str, float], total_ms: float, trace_id: str) -> str:
+    entries = [f"{name};dur={duration:.2f}" for name, duration in timings.items()]
+    entries.append(f"total;dur={total_ms:.2f}")
+    entries.append(f'trace;desc="{trace_id}"')
+    return ", ".join(entries)
+
+
+def log_server_timing(
+    timings: Dict[str, float], total_ms: float, trace_id: str, method: str, route: str, status: int
+) -> None:
+    logger.info(
+        json.dumps(
+            {
+                "event": "server_timing",
+                "traceId": trace_id,
+                "method": method,
+                "route": route,
+                "status": status,
+                "totalMs": round(total_ms, 3),
+                "stages": {name: round(duration, 3) for name, duration in timings.items()},
+            }
+        )
+    )
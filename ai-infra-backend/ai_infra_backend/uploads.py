@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import codecs
+import hashlib
+from dataclasses import dataclass
+from typing import IO
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Room for multipart boundaries, the other form fields and JSON escaping on top of the Markdown limit.
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """The upload exceeded the configured byte limit; reading stopped at the limit."""
+
+
+class UploadNotUtf8(ValueError):
+    """The upload is not valid UTF-8."""
+
+
+@dataclass(frozen=True)
+class MarkdownUpload:
+    content: str
+    content_hash: str
+    size: int
+
+
+def read_markdown_upload(stream: IO[bytes], max_bytes: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> MarkdownUpload:
+    """Read ``stream`` in chunks, hashing and decoding as it goes.
+
+    At most ``max_bytes + chunk_size`` bytes are ever read, and invalid UTF-8 is
+    rejected at the chunk that contains it instead of after the whole body.
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    digest = hashlib.sha256()
+    parts = []
+    size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+        digest.update(chunk)
+        try:
+            parts.append(decoder.decode(chunk))
+        except UnicodeDecodeError as exc:
+            raise UploadNotUtf8(f"upload is not valid UTF-8 near byte {size - len(chunk) + exc.start}") from exc
+    try:
+        parts.append(decoder.decode(b"", final=True))
+    except UnicodeDecodeError as exc:
+        raise UploadNotUtf8("upload ends in the middle of a UTF-8 sequence") from exc
+    return MarkdownUpload(content="".join(parts), content_hash=digest.hexdigest(), size=size)
+
+
+def markdown_from_text(text: str, max_bytes: int) -> MarkdownUpload:
+    encoded = text.encode("utf-8")
+    if len(encoded) > max_bytes:
+        raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+    return MarkdownUpload(content=text, content_hash=hashlib.sha256(encoded).hexdigest(), size=len(encoded))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,248 @@
+"""Hammer one SpecRepository with reader and writer threads and check every answer.
+
+    python -m benchmarks.concurrency_bench --size 10000 --readers 8 --writers 2 --duration 10
+    python -m benchmarks.concurrency_bench --size 1000 --output stress.json
+
+Readers call the catalog endpoints' repository methods and verify each result is internally
+consistent (counts add up, pages are sorted and sized right); writers keep inserting,
+updating and deleting specs. Any exception or inconsistency is reported and fails the run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Set
+
+from benchmarks.loadgen import percentile
+from benchmarks.synthetic import CATEGORIES, TAGS, build_repository
+from ai_infra_backend.repository import SpecRepository
+from ai_infra_backend.snapshot import CatalogSnapshot
+from ai_infra_backend.utils import derive_short_id
+
+MAX_REPORTED_ERRORS = 20
+
+
+def check_snapshot(snapshot: CatalogSnapshot) -> List[str]:
+    """Problems with a snapshot's derived indexes, compared against its own specs."""
+
+    problems: List[str] = []
+    specs = list(snapshot.specs.values())
+    if sum(snapshot.category_counts.values()) != len(specs):
+        problems.append(f"category counts sum to {sum(snapshot.category_counts.values())}, expected {len(specs)}")
+    if sum(snapshot.tag_counts.values()) != sum(len(set(spec.tags)) for spec in specs):
+        problems.append("tag counts do not match the specs' tags")
+    if snapshot.live.bit_count() != len(specs):
+        problems.append(f"{snapshot.live.bit_count()} live slots for {len(specs)} specs")
+    newest = list(snapshot.iter_newest())
+    if len(newest) != len(specs):
+        problems.append(f"newest-first order has {len(newest)} specs, expected {len(specs)}")
+    if any(earlier.updatedAt < later.updatedAt for earlier, later in zip(newest, newest[1:])):
+        problems.append("newest-first order is not sorted by updatedAt")
+    return problems
+
+
+def _reader_ops(repo: SpecRepository, rng: random.Random) -> List[Callable[[], List[str]]]:
+    def first_page() -> List[str]:
+        page = repo.list_specs(page=1, page_size=20)
+        dates = [item.updatedAt for item in page.items]
+        problems = [] if dates == sorted(dates, reverse=True) else ["first page not sorted"]
+        if len(page.items) != min(20, page.total):
+            problems.append(f"first page has {len(page.items)} items for total {page.total}")
+        return problems
+
+    def filtered_page() -> List[str]:
+        tag = rng.choice(TAGS[:20])
+        page = repo.list_specs(page=1, page_size=50, tag=tag, category=rng.choice(CATEGORIES))
+        return [] if all(tag in item.tags for item in page.items) else [f"page filtered on {tag} has other tags"]
+
+    def categories() -> List[str]:
+        return [] if all(category.count > 0 for category in repo.list_categories()) else ["empty category listed"]
+
+    def tags() -> List[str]:
+        return [] if all(tag.count > 0 for tag in repo.list_tags()) else ["empty tag listed"]
+
+    def bootstrap() -> List[str]:
+        _, data = repo.bootstrap(20)
+        total = sum(category.count for category in data["categories"])
+        return [] if total == data["specs"].total else [f"bootstrap counts {total} specs, page says {data['specs'].total}"]
+
+    def detail() -> List[str]:
+        snapshot = repo.snapshot()
+        if not snapshot.specs:
+            return []
+        short_id = rng.choice(list(snapshot.specs))
+        spec = snapshot.specs[short_id]
+        return [] if spec.shortId == short_id else [f"{short_id} maps to {spec.shortId}"]
+
+    return [first_page, first_page, filtered_page, categories, tags, bootstrap, detail, detail]
+
+
+def _spec_documents(short_id: str, version: int, rng: random.Random) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc) + timedelta(microseconds=rng.randint(0, 999))
+    return {
+        "shortId": short_id,
+        "title": f"Stress {short_id}",
+        "summary": "written by the concurrency benchmark",
+        "category": rng.choice(CATEGORIES),
+        "tags": sorted(rng.sample(TAGS[:40], rng.randint(1, 4))),
+        "author": "@stress",
+        "createdAt": now,
+        "updatedAt": now,
+        "version": version,
+        "contentMd": f"# Stress\n\nversion {version}",
+    }
+
+
+def run_stress(
+    size: int,
+    readers: int,
+    writers: int,
+    duration: float,
+    seed: int = 1234,
+    workdir: Path | None = None,
+) -> Dict[str, Any]:
+    repo = build_repository(size, seed, workdir)
+    stop = threading.Event()
+    lock = threading.Lock()
+    errors: List[str] = []
+    read_latencies: List[float] = []
+    counters = {"reads": 0, "writes": 0}
+    live: Dict[int, Set[str]] = {}
+    deleted: Dict[int, Set[str]] = {}
+
+    def record(problems: List[str]) -> None:
+        if problems:
+            with lock:
+                errors.extend(problems[: MAX_REPORTED_ERRORS - len(errors)])
+
+    def reader(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        ops = _reader_ops(repo, rng)
+        latencies: List[float] = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                problems = rng.choice(ops)()
+            except Exception as exc:  # any exception here is a concurrency bug
+                problems = [f"{type(exc).__name__}: {exc}"]
+            latencies.append((time.perf_counter() - started) * 1000)
+            record(problems)
+        with lock:
+            read_latencies.extend(latencies)
+            counters["reads"] += len(latencies)
+
+    def writer(index: int) -> None:
+        rng = random.Random(seed * 2000 + index)
+        mine: Dict[str, int] = {}
+        gone: Set[str] = set()
+        sequence = 0
+        writes = 0
+        while not stop.is_set():
+            roll = rng.random()
+            try:
+                if roll < 0.4 or not mine:
+                    sequence += 1
+                    short_id = derive_short_id(f"stress-{seed}-{index}-{sequence}")
+                    document = _spec_documents(short_id, 1, rng)
+                    repo.refresh_from_document(document, document)
+                    mine[short_id] = 1
+                    gone.discard(short_id)
+                elif roll < 0.85:
+                    short_id = rng.choice(list(mine))
+                    mine[short_id] += 1
+                    document = _spec_documents(short_id, mine[short_id], rng)
+                    repo.refresh_from_document(document, document)
+                else:
+                    short_id = rng.choice(list(mine))
+                    del mine[short_id]
+                    repo.delete_spec(short_id)
+                    gone.add(short_id)
+            except Exception as exc:
+                record([f"writer {index}: {type(exc).__name__}: {exc}"])
+            writes += 1
+        with lock:
+            counters["writes"] += writes
+            live[index] = set(mine)
+            deleted[index] = gone
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    final = repo.snapshot()
+    record(check_snapshot(final))
+    expected_live = set().union(*live.values()) if live else set()
+    missing = [short_id for short_id in expected_live if short_id not in final.specs]
+    resurrected = [short_id for ids in deleted.values() for short_id in ids if short_id in final.specs]
+    if missing:
+        record([f"{len(missing)} written specs missing from the final snapshot"])
+    if resurrected:
+        record([f"{len(resurrected)} deleted specs still in the final snapshot"])
+    if len(final) != size + len(expected_live):
+        record([f"final catalog has {len(final)} specs, expected {size + len(expected_live)}"])
+
+    read_latencies.sort()
+    return {
+        "size": size,
+        "readers": readers,
+        "writers": writers,
+        "durationSeconds": round(elapsed, 3),
+        "reads": counters["reads"],
+        "writes": counters["writes"],
+        "readsPerSecond": round(counters["reads"] / elapsed, 1),
+        "writesPerSecond": round(counters["writes"] / elapsed, 1),
+        "readP50Ms": round(percentile(read_latencies, 0.50), 4),
+        "readP99Ms": round(percentile(read_latencies, 0.99), 4),
+        "finalGeneration": final.generation,
+        "errors": errors,
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=10000, help="synthetic catalog size")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", type=Path, help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "generatedAt": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": run_stress(args.size, args.readers, args.writers, args.duration, args.seed),
+    }
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n", encoding="utf-8")
+    else:
+        print(rendered)
+    for line in report["results"]["errors"]:
+        print(f"ERROR {line}", file=sys.stderr)
+    return 1 if report["results"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
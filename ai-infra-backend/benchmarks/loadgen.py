@@ -0,0 +1,390 @@
+"""Replay a weighted traffic mix against the Flask app and report latency percentiles.
+
+    # against an already running server
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --duration 30 --concurrency 32
+    # start gunicorn with a given worker/thread layout (uses deploy/gunicorn.conf.py)
+    python -m benchmarks.loadgen --spawn-gunicorn --workers 2 --threads 8 --seed-specs 200
+    # in-process werkzeug server, no gunicorn needed
+    python -m benchmarks.loadgen --in-process --seed-specs 50 --requests 2000
+
+With more than one gunicorn worker, run against a real MongoDB: the in-memory
+fallback is per process, so users and specs created in one worker are invisible
+to the others and show up as errors.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_MIX = "home=50,search=20,detail=15,raw=5,login=5,upload=5"
+SEARCH_TERMS = ("cache", "kernel", "vector", "gpu", "agent", "router", "spec", "latency")
+
+
+class HttpSession:
+    """Keep-alive connection with a cookie jar; one per load thread."""
+
+    def __init__(self, base_url: str, timeout: float) -> None:
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies: Dict[str, str] = {}
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body: bytes | None = None, headers: Dict[str, str] | None = None) -> Tuple[int, bytes]:
+        headers = dict(headers or {})
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{key}={value}" for key, value in self.cookies.items())
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                payload = response.read()
+            except (http.client.HTTPException, OSError):
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+                continue
+            for header, value in response.getheaders():
+                if header.lower() == "set-cookie":
+                    name, _, rest = value.partition("=")
+                    self.cookies[name.strip()] = rest.split(";", 1)[0]
+            if response.getheader("Connection", "").lower() == "close":
+                self._conn.close()
+                self._conn = None
+            return response.status, payload
+        raise RuntimeError("unreachable")
+
+    def json(self, method: str, path: str, payload: Dict[str, Any]) -> Tuple[int, bytes]:
+        return self.request(method, path, json.dumps(payload).encode("utf-8"), {"Content-Type": "application/json"})
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+
+def _multipart(fields: Dict[str, str], file_content: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    chunks: List[bytes] = []
+    for name, value in fields.items():
+        chunks.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8"))
+    chunks.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="load.md"\r\n'
+        "Content-Type: text/markdown\r\n\r\n".encode("utf-8")
+    )
+    chunks.append(file_content + b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(chunks), f"multipart/form-data; boundary={boundary}"
+
+
+class LoadClient:
+    API = "/specmarket/v1"
+
+    def __init__(self, base_url: str, timeout: float, rng: random.Random) -> None:
+        self.session = HttpSession(base_url, timeout)
+        self.rng = rng
+        self.username = f"load{uuid.uuid4().hex[:12]}"
+        self.password = "LoadTest123!"
+
+    def register(self) -> None:
+        status, _ = self.session.json("POST", f"{self.API}/auth/register", {"username": self.username, "password": self.password})
+        if status not in (201, 400):
+            raise RuntimeError(f"register failed with HTTP {status}")
+
+    def upload(self) -> Tuple[int, bytes]:
+        words = " ".join(self.rng.choice(SEARCH_TERMS) for _ in range(200))
+        body, content_type = _multipart(
+            {
+                "title": f"Load {self.rng.choice(SEARCH_TERMS)} {uuid.uuid4().hex[:6]}",
+                "summary": "Generated by benchmarks.loadgen",
+                "category": self.rng.choice(("load", "bench", "perf")),
+                "tags": ",".join(self.rng.sample(SEARCH_TERMS, 2)),
+            },
+            f"## Overview\n{words}\n".encode("utf-8"),
+        )
+        return self.session.request("POST", f"{self.API}/uploadSpec", body, {"Content-Type": content_type})
+
+    def call(self, endpoint: str, short_ids: List[str]) -> Tuple[int, bytes]:
+        short_id = self.rng.choice(short_ids) if short_ids else "0000000000000000"
+        if endpoint == "home":
+            return self.session.request("GET", f"{self.API}/listSpecs?{urlencode({'page': 1, 'pageSize': 6, 'order': '-updatedAt'})}")
+        if endpoint == "search":
+            return self.session.request("GET", f"{self.API}/listSpecs?{urlencode({'q': self.rng.choice(SEARCH_TERMS)})}")
+        if endpoint == "detail":
+            return self.session.request("GET", f"{self.API}/getSpecDetail?{urlencode({'shortId': short_id})}")
+        if endpoint == "raw":
+            return self.session.request("GET", f"{self.API}/getSpecRaw?{urlencode({'shortId': short_id})}")
+        if endpoint == "login":
+            return self.session.json("POST", f"{self.API}/auth/login", {"username": self.username, "password": self.password})
+        if endpoint == "upload":
+            return self.upload()
+        raise ValueError(f"unknown endpoint {endpoint}")
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"home", "search", "detail", "raw", "login", "upload"}
+    if unknown:
+        raise SystemExit(f"unknown endpoints in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    # nearest-rank definition
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def collect_short_ids(base_url: str, timeout: float) -> List[str]:
+    session = HttpSession(base_url, timeout)
+    try:
+        status, body = session.request("GET", f"{LoadClient.API}/listSpecs?pageSize=50")
+    finally:
+        session.close()
+    if status != 200:
+        return []
+    return [item["shortId"] for item in json.loads(body)["data"]["items"]]
+
+
+def seed_specs(base_url: str, count: int, timeout: float) -> None:
+    client = LoadClient(base_url, timeout, random.Random(0))
+    client.register()
+    for _ in range(count):
+        client.upload()
+    client.session.close()
+
+
+def run_load(
+    base_url: str,
+    mix: Dict[str, float],
+    concurrency: int,
+    duration: float | None = None,
+    total_requests: int | None = None,
+    timeout: float = 30.0,
+    seed: int = 42,
+) -> Dict[str, Any]:
+    short_ids = collect_short_ids(base_url, timeout)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+    remaining = [total_requests] if total_requests else None
+    deadline = time.perf_counter() + (duration or 0) if duration else None
+    needs_login = any(name in mix for name in ("login", "upload"))
+
+    def take_ticket() -> bool:
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        if remaining is not None:
+            with lock:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+        return True
+
+    def worker(index: int) -> None:
+        client = LoadClient(base_url, timeout, random.Random(seed + index))
+        local: Dict[str, List[float]] = defaultdict(list)
+        local_errors: Dict[str, int] = defaultdict(int)
+        try:
+            if needs_login:
+                client.register()
+            while take_ticket():
+                endpoint = client.rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    status, _ = client.call(endpoint, short_ids)
+                    failed = status >= 400
+                except (OSError, http.client.HTTPException):
+                    failed = True
+                local[endpoint].append((time.perf_counter() - started) * 1000)
+                if failed:
+                    local_errors[endpoint] += 1
+        finally:
+            client.session.close()
+            with lock:
+                for endpoint, values in local.items():
+                    latencies[endpoint].extend(values)
+                for endpoint, count in local_errors.items():
+                    errors[endpoint] += count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints: Dict[str, Dict[str, float]] = {}
+    all_samples: List[float] = []
+    for endpoint, samples in sorted(latencies.items()):
+        all_samples.extend(samples)
+        endpoints[endpoint] = _summarize(samples, errors.get(endpoint, 0), elapsed)
+    return {
+        "elapsedSeconds": round(elapsed, 3),
+        "overall": _summarize(all_samples, sum(errors.values()), elapsed),
+        "endpoints": endpoints,
+    }
+
+
+def _summarize(samples: List[float], error_count: int, elapsed: float) -> Dict[str, float]:
+    return {
+        "requests": len(samples),
+        "errors": error_count,
+        "throughputRps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "p50Ms": round(percentile(samples, 0.50), 3),
+        "p95Ms": round(percentile(samples, 0.95), 3),
+        "p99Ms": round(percentile(samples, 0.99), 3),
+        "maxMs": round(max(samples), 3) if samples else 0.0,
+    }
+
+
+def _wait_until_ready(base_url: str, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        session = HttpSession(base_url, 2)
+        try:
+            status, _ = session.request("GET", "/healthz")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            session.close()
+        time.sleep(0.2)
+    raise SystemExit(f"server at {base_url} did not become ready")
+
+
+def spawn_gunicorn(port: int, workers: int, threads: int) -> subprocess.Popen:
+    env = {**os.environ, "PORT": str(port), "GUNICORN_WORKERS": str(workers), "GUNICORN_THREADS": str(threads)}
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "deploy/gunicorn.conf.py", "ai_infra_backend.app:app"],
+        cwd=BACKEND_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def serve_in_process(port: int, threads: int) -> Any:
+    from werkzeug.serving import make_server
+
+    from ai_infra_backend.app import create_app
+
+    server = make_server("127.0.0.1", port, create_app(), threaded=threads > 1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def format_table(report: Dict[str, Any]) -> str:
+    lines = [f"{'endpoint':<10} {'reqs':>7} {'errs':>5} {'rps':>9} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9} {'maxms':>9}"]
+    rows = list(report["endpoints"].items()) + [("overall", report["overall"])]
+    for name, stats in rows:
+        lines.append(
+            f"{name:<10} {stats['requests']:>7} {stats['errors']:>5} {stats['throughputRps']:>9.1f} "
+            f"{stats['p50Ms']:>9.2f} {stats['p95Ms']:>9.2f} {stats['p99Ms']:>9.2f} {stats['maxMs']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="base URL of a running server")
+    target.add_argument("--spawn-gunicorn", action="store_true", help="start gunicorn with --workers/--threads")
+    target.add_argument("--in-process", action="store_true", help="serve the app from this process (werkzeug)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers (recorded in the report)")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker (recorded in the report)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted endpoint mix (default {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--seed-specs", type=int, default=0, help="upload this many specs before measuring")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", default="", help="free-form label stored in the report, e.g. a caching mode")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    process: subprocess.Popen | None = None
+    server: Any = None
+    if args.spawn_gunicorn:
+        base_url = f"http://127.0.0.1:{args.port}"
+        process = spawn_gunicorn(args.port, args.workers, args.threads)
+        mode = "gunicorn"
+    elif args.in_process:
+        logging.disable(logging.WARNING)
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = serve_in_process(args.port, args.threads)
+        mode = "in-process"
+    else:
+        base_url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+        mode = "external"
+    try:
+        _wait_until_ready(base_url, 30)
+        if args.seed_specs:
+            seed_specs(base_url, args.seed_specs, args.timeout)
+        report = run_load(
+            base_url,
+            mix,
+            args.concurrency,
+            duration=None if args.requests else args.duration,
+            total_requests=args.requests,
+            timeout=args.timeout,
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+        if server is not None:
+            server.shutdown()
+
+    report["meta"] = {
+        "target": base_url,
+        "mode": mode,
+        # For --url these are whatever the caller says the server runs with.
+        "workers": 1 if mode == "in-process" else args.workers,
+        "threads": args.threads,
+        "concurrency": args.concurrency,
+        "mix": mix,
+        "label": args.label,
+    }
+    print(format_table(report))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
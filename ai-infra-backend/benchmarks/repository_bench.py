@@ -0,0 +1,185 @@
+"""Time SpecRepository operations on synthetic catalogs.
+
+    python -m benchmarks.repository_bench --sizes 1000,10000 --output bench.json
+    python -m benchmarks.repository_bench --sizes 1000 --baseline bench.json --tolerance 0.25
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from benchmarks.synthetic import CATEGORIES, EPOCH, generate_catalog, install_in_memory_collections
+from ai_infra_backend.related import RelatedIndex
+from ai_infra_backend.repository import SpecRepository
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "minMs": round(samples[0], 4),
+        "medianMs": round(statistics.median(samples), 4),
+        "p95Ms": round(samples[min(int(len(samples) * 0.95), len(samples) - 1)], 4),
+        "runs": len(samples),
+    }
+
+
+def _filter_cases(metadata: List[Dict[str, Any]], rng: random.Random) -> Dict[str, Dict[str, Any]]:
+    sample = rng.choice(metadata)
+    tag = sample["tags"][0]
+    author = sample["author"].lstrip("@")
+    since = EPOCH + timedelta(days=180)
+    return {
+        "none": {},
+        "tag": {"tag": tag},
+        "category": {"category": sample["category"]},
+        "author": {"author": author},
+        "updatedSince": {"updated_since": since},
+        "tag+category": {"tag": tag, "category": sample["category"]},
+        "tag+author": {"tag": tag, "author": author},
+        "tag+category+author+updatedSince": {
+            "tag": tag,
+            "category": sample["category"],
+            "author": author,
+            "updated_since": since,
+        },
+        "search": {"search": "cache"},
+        "search+category": {"search": "kernel", "category": rng.choice(CATEGORIES)},
+        "search:miss": {"search": "zzzz-no-such-term"},
+        "search:fuzzy": {"search": "kernal cahce", "fuzzy": True},
+        "page:deep": {"page": 50},
+    }
+
+
+def run_size(size: int, seed: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(seed)
+    metadata_documents, version_documents = generate_catalog(size, seed)
+    install_in_memory_collections(metadata_documents, version_documents)
+    results: Dict[str, Dict[str, float]] = {}
+    data_path = Path("/nonexistent/specs.json")
+    holder: Dict[str, SpecRepository] = {}
+
+    def startup() -> None:
+        holder["repo"] = SpecRepository(data_path=data_path)
+
+    results["startup"] = _measure(startup, max(1, min(repeat // 10, 3)))
+    repo = holder["repo"]
+    for name, kwargs in _filter_cases(metadata_documents, rng).items():
+        results[f"list_specs[{name}]"] = _measure(lambda kwargs=kwargs: repo.list_specs(**kwargs), repeat)
+    results["list_categories"] = _measure(repo.list_categories, repeat)
+    results["list_tags"] = _measure(repo.list_tags, repeat)
+    title = rng.choice(metadata_documents)["title"]
+    queries = {"1char": title[:1], "3chars": title[:3], "title": title[: len(title) // 2], "author": "@author00"}
+    for name, query in queries.items():
+        results[f"suggest[{name}]"] = _measure(lambda query=query: repo.suggest(query), repeat)
+    multi_version = [doc for doc in metadata_documents if doc["version"] > 1] or metadata_documents
+    targets = [rng.choice(multi_version) for _ in range(repeat)]
+    cursor = iter(targets * 2)
+    results["get_spec_history"] = _measure(lambda: repo.get_spec_history(next(cursor)["shortId"]), repeat)
+    cursor = iter(targets * 2)
+    results["get_spec_version[old]"] = _measure(lambda: repo.get_spec_version(next(cursor)["shortId"], 1), repeat)
+    cursor = iter(targets * 2)
+
+    def latest_version() -> None:
+        document = next(cursor)
+        repo.get_spec_version(document["shortId"], document["version"])
+
+    results["get_spec_version[latest]"] = _measure(latest_version, repeat)
+    # The full TF-IDF rebuild runs on a background thread in the server; it is timed here to catch regressions.
+    results["related_index[rebuild]"] = _measure(lambda: RelatedIndex(repo.snapshot).refresh(), 1)
+    repo.related.refresh()
+    cursor = iter(targets * 2)
+    results["related_specs"] = _measure(lambda: repo.related_specs(next(cursor)["shortId"], 5), repeat)
+    cursor = iter(targets * 2)
+    results["near_duplicates"] = _measure(
+        lambda: repo.near_duplicates(repo.specs[next(cursor)["shortId"]].contentMd + " edited"), repeat
+    )
+    # Last, so the read cases above see the generated catalog. Writers derive the next snapshot
+    # under one lock, so this per-write latency caps write throughput and must not grow with size.
+    cursor = iter(targets * 2)
+    written: Dict[str, int] = {}
+
+    def write_spec() -> None:
+        document = next(cursor)
+        version = written.get(document["shortId"], document["version"]) + 1
+        written[document["shortId"]] = version
+        metadata = dict(document, version=version, updatedAt=document["updatedAt"] + timedelta(days=version))
+        repo.refresh_from_document(metadata, dict(metadata, contentMd=f"# {document['title']}\n\nRevision {version}."))
+
+    results["write_spec"] = _measure(write_spec, repeat)
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions: List[str] = []
+    for size, operations in current["results"].items():
+        previous = baseline.get("results", {}).get(size, {})
+        for name, stats in operations.items():
+            before = previous.get(name)
+            if not before or not before.get("medianMs"):
+                continue
+            ratio = stats["medianMs"] / before["medianMs"]
+            stats["baselineMedianMs"] = before["medianMs"]
+            stats["ratio"] = round(ratio, 3)
+            if ratio > 1 + tolerance:
+                regressions.append(f"{size}/{name}: {before['medianMs']}ms -> {stats['medianMs']}ms (x{ratio:.2f})")
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated catalog sizes")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeat", type=int, default=30, help="runs per operation")
+    parser.add_argument("--output", type=Path, help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", type=Path, help="compare medians against a saved results file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed median slowdown before failing")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    report: Dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "generatedAt": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": {},
+    }
+    for size in [int(value) for value in args.sizes.split(",") if value.strip()]:
+        print(f"benchmarking {size} specs...", file=sys.stderr)
+        report["results"][str(size)] = run_size(size, args.seed, args.repeat)
+
+    regressions: List[str] = []
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.tolerance)
+        report["regressions"] = regressions
+
+    rendered = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(rendered + "\n", encoding="utf-8")
+    else:
+        print(rendered)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
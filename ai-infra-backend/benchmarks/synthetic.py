@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from ai_infra_backend import mongo as mongo_module
+from ai_infra_backend.repository import SpecRepository
+from ai_infra_backend.utils import derive_short_id
+
+WORDS = (
+    "vector cache kernel tensor cluster gateway pipeline scheduler adapter shard replica index "
+    "embedding transformer quantized inference training router balancer storage stream batch "
+    "token latency throughput gpu cuda triton onnx llama mistral bert diffusion retrieval agent "
+    "prompt eval benchmark serving autoscale observability tracing logging metrics registry"
+).split()
+CATEGORIES = [f"category-{i:02d}" for i in range(24)]
+TAGS = [f"tag-{i:03d}" for i in range(240)]
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 6))).title()
+
+
+def _body(rng: random.Random, title: str, version: int) -> str:
+    paragraphs = [f"# {title}", f"Revision {version}."]
+    for section in range(rng.randint(3, 8)):
+        paragraphs.append(f"## Section {section + 1}")
+        paragraphs.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))))
+    return "\n\n".join(paragraphs)
+
+
+def generate_catalog(
+    size: int, seed: int = 1234, max_versions: int = 4
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Deterministic metadata and version documents shaped like the ``specs``/``spec_versions`` collections."""
+
+    rng = random.Random(seed)
+    authors = [f"@author{i:04d}" for i in range(max(size // 20, 5))]
+    metadata_documents: List[Dict[str, Any]] = []
+    version_documents: List[Dict[str, Any]] = []
+    for index in range(size):
+        short_id = derive_short_id(f"bench-spec-{index}")
+        created_at = EPOCH + timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        # Skew tags and authors so some values are hot, like a real catalog.
+        tags = sorted({TAGS[min(int(rng.paretovariate(1.2)) - 1, len(TAGS) - 1)] for _ in range(rng.randint(1, 5))})
+        author = authors[min(int(rng.paretovariate(1.1)) - 1, len(authors) - 1)]
+        category = rng.choice(CATEGORIES)
+        versions = rng.randint(1, max_versions)
+        updated_at = created_at
+        title = _title(rng)
+        for version in range(1, versions + 1):
+            updated_at = updated_at + timedelta(hours=rng.randint(1, 24 * 30))
+            version_documents.append(
+                {
+                    "shortId": short_id,
+                    "version": version,
+                    "title": title,
+                    "summary": " ".join(rng.choice(WORDS) for _ in range(12)),
+                    "category": category,
+                    "tags": tags,
+                    "author": author,
+                    "contentMd": _body(rng, title, version),
+                    "createdAt": created_at,
+                    "updatedAt": updated_at,
+                }
+            )
+        latest = version_documents[-1]
+        metadata_documents.append(
+            {
+                "shortId": short_id,
+                "title": latest["title"],
+                "summary": latest["summary"],
+                "category": category,
+                "tags": tags,
+                "author": author,
+                "createdAt": created_at,
+                "updatedAt": updated_at,
+                "version": versions,
+            }
+        )
+    return metadata_documents, version_documents
+
+
+def install_in_memory_collections(
+    metadata_documents: List[Dict[str, Any]], version_documents: List[Dict[str, Any]]
+) -> None:
+    """Point ``ai_infra_backend.mongo`` at fresh in-memory collections holding the catalog."""
+
+    specs = mongo_module._InMemorySpecCollection()
+    history = mongo_module._InMemorySpecHistoryCollection()
+    for document in metadata_documents:
+        specs.store[document["shortId"]] = dict(document)
+    for document in version_documents:
+        history.store.setdefault(document["shortId"], {})[int(document["version"])] = dict(document)
+    mongo_module._client = None
+    mongo_module._monitor = None
+    mongo_module._collection = specs
+    mongo_module._history_collection = history
+    mongo_module._user_collection = mongo_module._InMemoryUserCollection()
+    mongo_module.circuit_breaker.record_success()
+
+
+def build_repository(size: int, seed: int = 1234, workdir: Path | None = None) -> SpecRepository:
+    metadata_documents, version_documents = generate_catalog(size, seed)
+    install_in_memory_collections(metadata_documents, version_documents)
+    data_path = (workdir or Path("/nonexistent")) / "specs.json"
+    return SpecRepository(data_path=data_path)
@@ -0,0 +1,23 @@
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+
+def on_starting(server):
+    # Start every deployment with an empty metrics directory so stale worker files don't leak in.
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,10 +1,12 @@
 import { FormEvent, useEffect, useState } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
+import { useSuggestions } from '../lib/api';
 
 export const SearchBar = () => {
   const [params] = useSearchParams();
   const navigate = useNavigate();
   const [value, setValue] = useState('');
+  const { data: suggestions } = useSuggestions(value);
 
   useEffect(() => {
     const author = params.get('author');
@@ -49,7 +51,15 @@ export const SearchBar = () => {
         value={value}
         onChange={(e) => setValue(e.target.value)}
         aria-label="Search specifications"
+        list="search-suggestions"
       />
+      <datalist id="search-suggestions">
+        {value.trim() &&
+          suggestions?.items.map((item) => {
+            const option = item.field === 'author' ? `@${item.value.replace(/^@+/, '')}` : item.value;
+            return <option key={`${item.field}:${item.value}`} value={option} label={`${item.field} · ${item.count}`} />;
+          })}
+      </datalist>
     </form>
   );
 };
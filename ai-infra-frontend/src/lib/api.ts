@@ -1,6 +1,16 @@
 import { useMutation, useQuery, useQueryClient, UseQueryOptions } from '@tanstack/react-query';
 import { useMemo } from 'react';
-import { ApiResponse, Category, PaginatedSpecs, SpecDetail, Tag } from '../types/spec';
+import {
+  ApiResponse,
+  CatalogBootstrap,
+  Category,
+  NearDuplicate,
+  PaginatedSpecs,
+  RelatedSpec,
+  SpecDetail,
+  Suggestion,
+  Tag,
+} from '../types/spec';
 import { AuthCredentials, AuthResponse, AuthUser } from '../types/auth';
 
 export class ApiRequestError extends Error {
@@ -155,12 +165,16 @@ export type ListSpecParams = {
   q?: string;
   author?: string;
   updatedSince?: string;
+  /** Comma separated FacetField names, e.g. `tag,category`. */
+  facets?: string;
+  /** Also match words within one or two typos of the query's words. */
+  fuzzy?: boolean;
 };
 
 /** List specs with pagination & filters */
 export const useSpecs = (
   params: ListSpecParams,
-  options?: UseQueryOptions<PaginatedSpecs>
+  options?: Partial<UseQueryOptions<PaginatedSpecs>>
 ) => {
   const queryKey = useMemo(() => ['specs', params], [params]);
   return useQuery({
@@ -170,6 +184,26 @@ export const useSpecs = (
   });
 };
 
+/**
+ * Categories, tags and the newest page in one request.
+ * Uses the HTTP cache so an unchanged catalog is revalidated with a 304 via its ETag.
+ * Also seeds the categories/tags queries so those pages render without another request.
+ */
+export const useBootstrap = (pageSize: number, options?: Partial<UseQueryOptions<CatalogBootstrap>>) => {
+  const queryClient = useQueryClient();
+  return useQuery({
+    queryKey: ['bootstrap', pageSize],
+    queryFn: async () => {
+      const response = await fetch(buildUrl('bootstrap', { pageSize }), { credentials: 'include', cache: 'no-cache' });
+      const data = await extractApiData<CatalogBootstrap>(response);
+      queryClient.setQueryData(['categories'], { items: data.categories });
+      queryClient.setQueryData(['tags'], { items: data.tags });
+      return data;
+    },
+    ...options,
+  });
+};
+
 /** Categories */
 export const useCategories = () =>
   useQuery({
@@ -184,6 +218,15 @@ export const useTags = () =>
     queryFn: () => fetchJson<{ items: Tag[] }>('listTags'),
   });
 
+/** Prefix completions for the search box; `@name` completes authors only */
+export const useSuggestions = (q: string, limit = 8) =>
+  useQuery({
+    queryKey: ['suggest', q, limit],
+    queryFn: () => fetchJson<{ items: Suggestion[] }>('suggest', { q, limit }),
+    enabled: q.trim().length > 0,
+    placeholderData: (previous) => previous,
+  });
+
 /** Spec detail by shortId */
 export const useSpecDetail = (shortId: string) =>
   useQuery({
@@ -199,6 +242,14 @@ export const useSpecVersion = (shortId: string, version: number | null) =>
     enabled: Boolean(shortId) && version !== null,
   });
 
+/** Most similar specs, precomputed on the server */
+export const useRelatedSpecs = (shortId: string, limit = 5) =>
+  useQuery({
+    queryKey: ['related', shortId, limit],
+    queryFn: () => fetchJson<{ items: RelatedSpec[] }>('getRelatedSpecs', { shortId, limit }),
+    enabled: Boolean(shortId),
+  });
+
 /** Specs by category */
 export const useSpecsByCategory = (slug: string) =>
   useQuery({
@@ -250,7 +301,7 @@ export const useUploadSpec = () =>
         body: payload.formData,
         cache: 'no-store',
       });
-      return extractApiData<{ shortId: string; version: number }>(response);
+      return extractApiData<{ shortId: string; version: number; nearDuplicates?: NearDuplicate[] }>(response);
     },
   });
 
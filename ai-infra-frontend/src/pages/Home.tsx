@@ -1,6 +1,6 @@
 import { useMemo } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
-import { useSpecs } from '../lib/api';
+import { useBootstrap, useSpecs } from '../lib/api';
 import { GridSkeleton } from '../components/Skeletons';
 import { SpecCard } from '../components/SpecCard';
 import { EmptyState } from '../components/EmptyState';
@@ -13,12 +13,30 @@ export const HomePage = () => {
   const filter = params.get('filter') || undefined;
   const search = params.get('q') || undefined;
   const author = params.get('author') || undefined;
+  const fuzzyRequested = params.get('fuzzy') === '1';
 
   const queryParams = useMemo(
-    () => ({ page, pageSize: 6, order: '-updatedAt', filter, q: search, author }),
-    [page, filter, search, author]
+    () => ({
+      page,
+      pageSize: 6,
+      order: '-updatedAt',
+      filter,
+      q: search,
+      fuzzy: search && fuzzyRequested ? true : undefined,
+      author,
+    }),
+    [page, filter, search, fuzzyRequested, author]
   );
-  const { data, isLoading } = useSpecs(queryParams);
+  // The unfiltered first page comes from the bootstrap payload together with categories and tags.
+  const isLanding = page === 1 && !filter && !search && !author;
+  const bootstrap = useBootstrap(6, { enabled: isLanding });
+  const listing = useSpecs(queryParams, { enabled: !isLanding });
+  // Typo-tolerant matching only runs when the exact search found nothing (or ?fuzzy=1 asked for it).
+  const fallbackParams = useMemo(() => ({ ...queryParams, fuzzy: true }), [queryParams]);
+  const fuzzyFallback = !!search && !fuzzyRequested && listing.data?.total === 0;
+  const fallback = useSpecs(fallbackParams, { enabled: !isLanding && fuzzyFallback });
+  const data = isLanding ? bootstrap.data?.specs : fuzzyFallback ? fallback.data : listing.data;
+  const isLoading = isLanding ? bootstrap.isLoading : listing.isLoading || (fuzzyFallback && fallback.isLoading);
 
   const specs = useMemo(() => data?.items ?? [], [data]);
 
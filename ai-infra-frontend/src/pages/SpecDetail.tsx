@@ -1,6 +1,6 @@
 import { useEffect, useMemo, useState } from 'react';
 import { Link, useLocation, useNavigate, useParams } from 'react-router-dom';
-import { ApiRequestError, useDeleteSpec, useSpecDetail, useSpecVersion } from '../lib/api';
+import { ApiRequestError, buildSpecLink, useDeleteSpec, useRelatedSpecs, useSpecDetail, useSpecVersion } from '../lib/api';
 import { MarkdownView } from '../components/MarkdownView';
 import { CopyMarkdownButton } from '../components/CopyMarkdownButton';
 import { DownloadButton } from '../components/DownloadButton';
@@ -10,6 +10,8 @@ import { Calendar, Clock3, Edit3, Folder, Hash, History, Tag, Trash2, User } fro
 export const SpecDetailPage = () => {
   const { shortId = '' } = useParams();
   const { data, isLoading } = useSpecDetail(shortId);
+  const related = useRelatedSpecs(shortId);
+  const relatedItems = related.data?.items ?? [];
   const navigate = useNavigate();
   const location = useLocation();
   const { user } = useAuth();
@@ -383,6 +385,24 @@ export const SpecDetailPage = () => {
             )}
           </div>
         ) : null}
+        {relatedItems.length > 0 ? (
+          <div className="rounded-3xl border border-muted/20 bg-white/90 p-6 shadow-lg">
+            <h3 className="text-xs font-semibold uppercase tracking-wide text-muted">Related</h3>
+            <ul className="mt-4 space-y-2">
+              {relatedItems.map((item) => (
+                <li key={item.shortId}>
+                  <Link
+                    to={buildSpecLink(item.shortId)}
+                    className="flex flex-col gap-1 rounded-2xl border border-muted/20 bg-white/80 p-3 shadow-sm transition hover:border-primary/40"
+                  >
+                    <span className="text-sm font-medium text-text">{item.title}</span>
+                    <span className="text-[0.65rem] text-muted/80">{item.summary || 'No summary'}</span>
+                  </Link>
+                </li>
+              ))}
+            </ul>
+          </div>
+        ) : null}
       </aside>
     </section>
   );
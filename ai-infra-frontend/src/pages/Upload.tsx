@@ -1,8 +1,9 @@
 import { FormEvent, useEffect, useMemo, useRef, useState } from 'react';
-import { useLocation, useNavigate } from 'react-router-dom';
+import { Link, useLocation, useNavigate } from 'react-router-dom';
 
-import { ApiRequestError, useUploadSpec } from '../lib/api';
+import { ApiRequestError, buildSpecLink, useUploadSpec } from '../lib/api';
 import { useAuth } from '../lib/auth';
+import { NearDuplicate } from '../types/spec';
 
 export const UploadPage = () => {
   const { user, isLoading } = useAuth();
@@ -10,6 +11,7 @@ export const UploadPage = () => {
   const location = useLocation();
   const [message, setMessage] = useState<string | null>(null);
   const [uploadedShortId, setUploadedShortId] = useState<string | null>(null);
+  const [nearDuplicates, setNearDuplicates] = useState<NearDuplicate[]>([]);
   const [contentValue, setContentValue] = useState('');
   const [inputMode, setInputMode] = useState<'text' | 'file' | null>(null);
   const fileInputRef = useRef<HTMLInputElement | null>(null);
@@ -38,6 +40,7 @@ export const UploadPage = () => {
     event.preventDefault();
     setMessage(null);
     setUploadedShortId(null);
+    setNearDuplicates([]);
     const formElement = event.currentTarget;
     const fileInput = formElement.elements.namedItem('file') as HTMLInputElement | null;
     const selectedFile = fileInput?.files?.[0] ?? null;
@@ -55,6 +58,7 @@ export const UploadPage = () => {
       const result = await mutation.mutateAsync({ formData });
       setMessage('Upload successful.');
       setUploadedShortId(result.shortId);
+      setNearDuplicates(result.nearDuplicates ?? []);
       formElement.reset();
       setContentValue('');
       setInputMode(null);
@@ -154,6 +158,23 @@ export const UploadPage = () => {
           </div>
         </form>
         {message && <p className="text-sm text-muted">{message}</p>}
+        {nearDuplicates.length > 0 && (
+          <div className="space-y-2 rounded-2xl border border-amber-200 bg-amber-50 p-4 text-sm text-amber-800">
+            <p>This content closely matches existing specs:</p>
+            <ul className="space-y-1">
+              {nearDuplicates.map((item) => (
+                <li key={item.shortId}>
+                  <Link to={buildSpecLink(item.shortId)} className="font-medium text-primary hover:underline">
+                    {item.title}
+                  </Link>{' '}
+                  <span className="text-xs text-muted">
+                    by {item.author}, {Math.round(item.similarity * 100)}% similar
+                  </span>
+                </li>
+              ))}
+            </ul>
+          </div>
+        )}
         {uploadedShortId && (
           <div className="flex flex-wrap items-center gap-2 text-sm text-muted">
             <span>Short ID:</span>
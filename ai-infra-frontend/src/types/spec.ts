@@ -11,6 +11,19 @@ export type SpecSummary = {
   version: number;
 };
 
+export type RelatedSpec = SpecSummary & {
+  /** Cosine similarity of the two specs' TF-IDF vectors, in (0, 1]. */
+  score: number;
+};
+
+export type NearDuplicate = {
+  shortId: string;
+  title: string;
+  author: string;
+  /** Estimated share of 3-word shingles the two bodies have in common, in [0, 1]. */
+  similarity: number;
+};
+
 export type SpecHistoryItem = {
   shortId: string;
   version: number;
@@ -32,11 +45,27 @@ export type SpecDetail = SpecSummary & {
   history: SpecHistory;
 };
 
+export type FacetField = 'tag' | 'category' | 'author';
+
+export type FacetValue = {
+  value: string;
+  count: number;
+};
+
 export type PaginatedSpecs = {
   total: number;
   page: number;
   pageSize: number;
   items: SpecSummary[];
+  /** Only present when listSpecs was called with `facets=`; counts cover the filtered result set. */
+  facets?: Partial<Record<FacetField, FacetValue[]>>;
+};
+
+export type Suggestion = {
+  value: string;
+  field: 'title' | FacetField;
+  /** Number of specs carrying this title, tag, category or author. */
+  count: number;
 };
 
 export type Category = {
@@ -47,6 +76,12 @@ export type Category = {
 
 export type Tag = Category;
 
+export type CatalogBootstrap = {
+  categories: Category[];
+  tags: Tag[];
+  specs: PaginatedSpecs;
+};
+
 export type ApiResponse<T> = {
   status_code: number;
   status_msg: string;